@@ -0,0 +1,71 @@
+"""
+Benchmarks of the requests against the local mock Tilores instance.
+
+Run them using `make bench`, see the Makefile for storing and comparing baselines.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from tilores.auth import TokenManager
+
+pytest.importorskip('pytest_benchmark')
+
+SELECTION = (('id',), ('first_name',), ('last_name',), ('email',))
+PARAMS = {'first_name': 'Sophia', 'last_name': 'Müller'}
+
+def test_search_latency(benchmark, server):
+    with server.api() as api:
+        api.search(SELECTION, PARAMS)
+        result = benchmark(api.search, SELECTION, PARAMS)
+    assert len(result['data']['search']['entities']) == 1
+
+@pytest.mark.parametrize('threads', [1, 8, 32])
+def test_search_throughput(benchmark, slow_server, threads):
+    searches = 64
+    with slow_server.api(pool_maxsize=threads) as api:
+        api.search(SELECTION, PARAMS)
+        def run():
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(lambda _: api.search(SELECTION, PARAMS), range(searches)))
+        benchmark.pedantic(run, rounds=3, warmup_rounds=1)
+    if benchmark.stats:
+        benchmark.extra_info['searches_per_second'] = searches / benchmark.stats.stats.mean
+
+@pytest.mark.parametrize('concurrency', [1, 8, 32])
+def test_search_many_throughput(benchmark, slow_server, concurrency):
+    pytest.importorskip('httpx')
+    from tilores import AsyncTiloresAPI
+    searches = 64
+    async def run():
+        async with AsyncTiloresAPI(api_url=slow_server.api_url, token_url=slow_server.token_url, client_id='id', client_secret='secret') as api:
+            async for _ in api.search_many(SELECTION, [PARAMS] * searches, concurrency=concurrency):
+                pass
+    benchmark.pedantic(lambda: asyncio.run(run()), rounds=3, warmup_rounds=1)
+    if benchmark.stats:
+        benchmark.extra_info['searches_per_second'] = searches / benchmark.stats.stats.mean
+
+def test_large_search(benchmark, large_server):
+    with large_server.api() as api:
+        api.search(SELECTION, PARAMS)
+        result = benchmark(api.search, SELECTION, PARAMS)
+    assert len(result['data']['search']['entities']) == 50
+
+def test_token_refresh_contention(benchmark, slow_server):
+    """32 threads requesting a token at the moment it expired, only one of them refreshes it."""
+    api = slow_server.api()
+    tokens = TokenManager(api.fetch_access_token)
+    threads = 32
+    tokens.get()
+    def run():
+        tokens.invalidate(tokens.access_token)
+        barrier = threading.Barrier(threads)
+        def get():
+            barrier.wait()
+            return tokens.get()
+        before = slow_server.token_requests
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            assert len(set(executor.map(lambda _: get(), range(threads)))) == 1
+        assert slow_server.token_requests - before == 1
+    benchmark.pedantic(run, rounds=5)
+    api.close()
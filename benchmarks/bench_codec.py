@@ -0,0 +1,118 @@
+"""
+Benchmarks of the client side work: rendering queries, decoding responses and generating models.
+"""
+import io
+import json
+import pytest
+import importlib.util
+from pydantic import BaseModel
+from tilores.codec import json_loads, iter_items, orjson
+from tilores.helpers import PydanticFactory, StructFactory
+from tilores.operations import DocumentCache, search_operation, search_batch_operation
+from tests.mock_server import MockTilores
+from tests.support import load_schema
+
+pytest.importorskip('pytest_benchmark')
+
+SELECTION = (('id',), ('first_name',), ('last_name',), ('email',), ('city',), ('zip',))
+
+@pytest.fixture(scope='module')
+def large_response():
+    """A search response of 50 entities with 100 records each."""
+    with MockTilores(entities=50, records=100) as server, server.api() as api:
+        result = api.search(SELECTION + (('source',), ('dob',)), {'first_name': 'Sophia'})
+    return json.dumps(result).encode('utf-8')
+
+def test_render_search(benchmark):
+    benchmark(lambda: search_operation(SELECTION).render())
+
+def test_render_search_batch(benchmark):
+    benchmark(lambda: search_batch_operation(SELECTION, 50).render())
+
+def test_render_search_cached(benchmark):
+    documents = DocumentCache()
+    benchmark(documents.get, 'search', SELECTION)
+
+@pytest.mark.parametrize('backend', ['json', 'orjson'])
+def test_decode(benchmark, large_response, backend):
+    if backend == 'orjson' and orjson is None:
+        pytest.skip('requires orjson')
+    loads = json_loads(backend)
+    benchmark(loads, large_response)
+    benchmark.extra_info['bytes'] = len(large_response)
+
+def test_decode_stream(benchmark, large_response):
+    if importlib.util.find_spec('ijson') is None:
+        pytest.skip('requires ijson')
+    benchmark(lambda: sum(1 for _ in iter_items(io.BytesIO(large_response), 'data.search.entities')))
+
+def test_decode_structs(benchmark, large_response):
+    decode = StructFactory(load_schema()).decoder('Entity')
+    entities = json.loads(large_response)['data']['search']['entities']
+    benchmark(lambda: [decode(entity) for entity in entities])
+
+@pytest.mark.parametrize('schema', ['schema', 'complex_schema'])
+def test_pydantic_factory_generate(benchmark, schema):
+    schema = load_schema(schema)
+    benchmark(lambda: PydanticFactory(schema).generate())
+
+@pytest.mark.parametrize('schema', ['schema', 'complex_schema'])
+def test_generated_models_import(benchmark, schema):
+    from tilores.codegen import ModuleGenerator
+    code = compile(ModuleGenerator(load_schema(schema)).generate(), 'models.py', 'exec')
+    benchmark(lambda: exec(code, {'__name__': 'models'}))
+
+def test_option_model_to_selection(benchmark):
+    from tilores.conversion import option_model_to_selection, pydantic_model_to_option_model
+    option_model = pydantic_model_to_option_model(PydanticFactory(load_schema('schema')).generate()['Record'])
+    options = option_model(**{name: True for name in option_model.model_fields})
+    benchmark(lambda: option_model_to_selection(options))
+
+def test_arrow_table(benchmark, large_response):
+    pytest.importorskip('pyarrow')
+    from tilores.columnar import ArrowAdapter
+    adapter = ArrowAdapter(load_schema('schema'), SELECTION + (('source',), ('dob',)))
+    entities = json.loads(large_response)['data']['search']['entities']
+    benchmark(lambda: adapter.table(entities))
+
+def test_validate_search_params(benchmark):
+    from tilores.schema import search_params_of
+    from tilores.validation import SearchParamsValidator
+    validate = SearchParamsValidator(search_params_of(load_schema()), date_fields=['dob'])
+    params = [{'first_name': f' Sophia{i} ', 'last_name': 'Müller', 'dob': '15.04.1990', 'city': 'Berlin'} for i in range(1000)]
+    benchmark(lambda: list(validate.validate_many(params)))
+
+@pytest.mark.parametrize('encoding', ['gzip', 'zstd', 'br'])
+def test_compress_request(benchmark, large_response, encoding):
+    from tilores.compression import Compression
+    try:
+        compression = Compression(encoding)
+    except ImportError:
+        pytest.skip(f'requires the {encoding} compressor')
+    records = [record for entity in json.loads(large_response)['data']['search']['entities'] for record in entity['records']]
+    data = json.dumps({'query': 'mutation submit($records: [RecordInput!]!) { submit(input: {records: $records}) { recordsAdded } }',
+        'variables': {'records': records[:1000]}}).encode('utf-8')
+    body, _ = benchmark(compression.encode, data)
+    benchmark.extra_info['ratio'] = len(data) / len(body)
+
+def legacy_dumps(value):
+    """The former path: convert models recursively, then let requests encode with the standard json module."""
+    def to_serializable(val):
+        if isinstance(val, BaseModel):
+            return val.model_dump()
+        elif isinstance(val, dict):
+            return {k: to_serializable(v) for k, v in val.items()}
+        elif isinstance(val, list):
+            return [to_serializable(v) for v in val]
+        return val
+    return json.dumps(to_serializable(value), allow_nan=False).encode('utf-8')
+
+@pytest.mark.parametrize('backend', ['legacy', 'json', 'orjson'])
+def test_encode_variables(benchmark, large_response, backend):
+    from tilores.codec import json_dumps
+    if backend == 'orjson' and orjson is None:
+        pytest.skip('requires orjson')
+    records = [record for entity in json.loads(large_response)['data']['search']['entities'] for record in entity['records']]
+    variables = {'records': records[:1000], **{f'params_{i}': {'first_name': f'Sophia{i}', 'city': 'Berlin'} for i in range(50)}}
+    dumps = legacy_dumps if backend == 'legacy' else json_dumps(backend)
+    benchmark(dumps, variables)
@@ -0,0 +1,20 @@
+import pytest
+from tests.mock_server import MockTilores
+
+@pytest.fixture(scope='module')
+def server():
+    """A mock Tilores instance returning one entity of 10 records per search."""
+    with MockTilores(entities=1, records=10) as server:
+        yield server
+
+@pytest.fixture(scope='module')
+def slow_server():
+    """A mock Tilores instance answering after 5ms, to measure concurrency."""
+    with MockTilores(entities=1, records=10, latency=0.005, token_latency=0.02) as server:
+        yield server
+
+@pytest.fixture(scope='module')
+def large_server():
+    """A mock Tilores instance returning 50 entities of 100 records per search."""
+    with MockTilores(entities=50, records=100) as server:
+        yield server
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import unittest
+from tests.support import fake_async_api, httpx
+from tilores.resilience import RetryPolicy
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class AsyncTiloresAPITest(unittest.IsolatedAsyncioTestCase):
+    async def test_gql(self):
+        """
+        Test that concurrent queries share a single access token.
+        """
+        api, token_requests = fake_async_api(lambda request: (200, {'data': json.loads(request.content)['variables']}))
+        results = await asyncio.gather(*[api.gql('query($a: Int) { a }', {'a': i}) for i in range(5)])
+        self.assertEqual([r['data']['a'] for r in results], list(range(5)))
+        self.assertEqual(len(token_requests), 1)
+        await api.close()
+
+    async def test_reauthenticate(self):
+        """
+        Test that a request rejected with 401 is retried once with a new access token.
+        """
+        statuses = iter([401, 200, 401, 401])
+        api, token_requests = fake_async_api(lambda request: (next(statuses), {'data': {'token': request.headers['Authorization']}}))
+        result = await api.gql('{ token }')
+        self.assertEqual(result['data']['token'], 'Bearer token-2')
+        with self.assertRaises(httpx.HTTPStatusError):
+            await api.gql('{ token }')
+        self.assertEqual(len(token_requests), 3)
+        await api.close()
+
+    async def test_transport_retries(self):
+        """
+        Test that network errors are retried, but protocol errors after the request was written are not.
+        """
+        errors = iter([httpx.ConnectError('refused'), httpx.ReadTimeout('slow'), None, httpx.RemoteProtocolError('broken')])
+        attempts = []
+        def handler(request):
+            attempts.append(request)
+            error = next(errors)
+            if error is not None:
+                raise error
+            return 200, {'data': {'ok': True}}
+        api, _ = fake_async_api(handler, retry=RetryPolicy(backoff=0))
+        self.assertEqual(await api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(len(attempts), 3)
+        with self.assertRaises(httpx.RemoteProtocolError):
+            await api.gql('{ ok }')
+        self.assertEqual(len(attempts), 4)
+        await api.close()
+
+    async def test_mutation_retries(self):
+        """
+        Test that a mutation is sent once on a read timeout, but retried if the connection was refused.
+        """
+        errors = iter([httpx.ReadTimeout('slow'), httpx.ConnectError('refused'), None])
+        attempts = []
+        def handler(request):
+            attempts.append(request)
+            error = next(errors)
+            if error is not None:
+                raise error
+            return 200, {'data': {'submit': {'recordsAdded': 0}}}
+        api, _ = fake_async_api(handler, retry=RetryPolicy(backoff=0))
+        mutation = 'mutation { submit(input: {records: []}) { recordsAdded } }'
+        with self.assertRaises(httpx.ReadTimeout):
+            await api.gql(mutation)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(await api.gql(mutation), {'data': {'submit': {'recordsAdded': 0}}})
+        self.assertEqual(len(attempts), 3)
+        await api.close()
+
+    async def test_search_many(self):
+        """
+        Test that search_many keeps at most `concurrency` searches in flight.
+        """
+        in_flight = 0
+        max_in_flight = 0
+        api, _ = fake_async_api()
+        async def search(recordFieldsToQuery, searchParams):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01 * (searchParams['n'] % 3))
+            in_flight -= 1
+            if searchParams['n'] == 7:
+                raise ValueError('failed')
+            return {'n': searchParams['n']}
+        api.search = search
+
+        results = [item async for item in api.search_many(None, ({'n': n} for n in range(20)), concurrency=4, return_exceptions=True)]
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(max_in_flight, 4)
+        self.assertIsInstance(dict((p['n'], r) for p, r in results)[7], ValueError)
+        self.assertEqual(sorted(p['n'] for p, r in results if not isinstance(r, Exception)), [n for n in range(20) if n != 7])
+
+        with self.assertRaises(ValueError):
+            [item async for item in api.search_many(None, ({'n': n} for n in range(20)), concurrency=4)]
+
+if __name__ == '__main__':
+    unittest.main()
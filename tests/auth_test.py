@@ -0,0 +1,88 @@
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from tilores.auth import TokenManager, FileTokenStore
+from tests.support import fake_api
+
+class TokenManagerTest(unittest.TestCase):
+    def counting_fetch(self, lifetime=3600, delay=0):
+        calls = []
+        def fetch():
+            calls.append(1)
+            time.sleep(delay)
+            return (f'token-{len(calls)}', lifetime)
+        return fetch, calls
+
+    def test_single_flight(self):
+        """
+        Test that concurrent threads wait for a single refresh.
+        """
+        fetch, calls = self.counting_fetch(delay=0.05)
+        tokens = TokenManager(fetch)
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda _: tokens.get(), range(64)))
+        self.assertEqual(set(results), {'token-1'})
+        self.assertEqual(len(calls), 1)
+
+    def test_refresh_skew(self):
+        """
+        Test that tokens are refreshed before they expire and after they were rejected.
+        """
+        fetch, calls = self.counting_fetch(lifetime=30)
+        tokens = TokenManager(fetch, refresh_skew=60)
+        self.assertEqual(tokens.get(), 'token-1')
+        self.assertEqual(tokens.get(), 'token-2')
+
+        tokens = TokenManager(fetch, refresh_skew=10)
+        self.assertEqual(tokens.get(), 'token-3')
+        tokens.invalidate('token-0')
+        self.assertEqual(tokens.get(), 'token-3')
+        tokens.invalidate('token-3')
+        self.assertEqual(tokens.get(), 'token-4')
+
+    def test_background_refresh(self):
+        """
+        Test that the background thread refreshes the token before it expires.
+        """
+        fetch, calls = self.counting_fetch(lifetime=0.4)
+        tokens = TokenManager(fetch, refresh_skew=0.1, background_refresh=True)
+        time.sleep(0.5)
+        tokens.close()
+        self.assertGreaterEqual(len(calls), 2)
+        self.assertTrue(tokens.is_fresh(tokens.expires_at, skew=0))
+
+    def test_file_token_store(self):
+        """
+        Test that managers share tokens through the FileTokenStore.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            fetch, calls = self.counting_fetch()
+            key = TokenManager.key_for('https://auth', 'id', ['b', 'a'])
+            first = TokenManager(fetch, store=FileTokenStore(directory), key=key)
+            second = TokenManager(fetch, store=FileTokenStore(directory), key=key)
+            self.assertEqual(first.get(), 'token-1')
+            self.assertEqual(second.get(), 'token-1')
+            self.assertEqual(len(calls), 1)
+            second.invalidate('token-1')
+            self.assertEqual(second.get(), 'token-2')
+
+    def test_unauthorized_retry(self):
+        """
+        Test that a request rejected with 401 is retried once with a new token.
+        """
+        def handler(request):
+            if request.headers['Authorization'] == 'Bearer token-1':
+                return 401, {}
+            return 200, {'data': {'ok': True}}
+        api, adapter = fake_api(handler)
+        self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(adapter.token_requests, 2)
+
+        api, adapter = fake_api(lambda request: (401, {}))
+        with self.assertRaises(Exception):
+            api.gql('{ ok }')
+        self.assertEqual(adapter.token_requests, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import create_model
+from tilores.cache import ResultCache, CacheBackend
+from tilores.conversion import pydantic_model_to_option_model
+from tests.support import fake_api, load_schema, request_json
+
+def search_result(entity_id, record_id):
+    return {'data': {'search': {'entities': [{'id': entity_id, 'records': [{'id': record_id}]}]}}}
+
+class MemoryBackend(CacheBackend):
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl):
+        self.values[key] = value
+
+    def delete(self, keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+class ResultCacheTest(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        cache = ResultCache(maxsize=2, ttl=0.05)
+        for key in 'abc':
+            cache.set(key, search_result(key, key))
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('b'))
+
+    def test_single_flight(self):
+        """
+        Test that concurrent identical searches are coalesced.
+        """
+        calls = []
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return search_result('e1', 'r1')
+        cache = ResultCache()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: cache.get_or_compute('key', compute), range(8)))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(cache.cache_info()['misses'], 1)
+
+    def test_invalidation(self):
+        backend = MemoryBackend()
+        cache = ResultCache(backend=backend)
+        cache.set('a', search_result('e1', 'r1'), {'email': 'Sophia@example.com'})
+        cache.set('b', search_result('e2', 'r2'), {'email': 'max@example.com'})
+        cache.set('c', search_result('e3', 'r3'), {'email': 'anna@example.com'})
+        cache.set('d', {'data': {'search': {'entities': []}}}, {'email': 'none@example.com'})
+
+        cache.invalidate_submitted([{'id': 'r1', 'first_name': 'Sophia'}, {'id': 'r9', 'email': 'max@EXAMPLE.com'}])
+        self.assertEqual(backend.values.keys(), {'c', 'd'})
+        cache.invalidate_entities(['e3'])
+        self.assertIsNone(cache.get('c'))
+        self.assertIsNotNone(cache.get('d'))
+
+        cache = ResultCache(invalidate_on_submit='all')
+        cache.set('a', search_result('e1', 'r1'))
+        cache.invalidate_submitted([{'id': 'r9'}])
+        self.assertIsNone(cache.get('a'))
+
+    def test_search(self):
+        """
+        Test that searches are cached by selection and normalized parameters and invalidated on submit.
+        """
+        def handler(request):
+            data = request_json(request)
+            if 'submit' in data['query']:
+                return 200, {'data': {'submit': {'recordsAdded': 1}}}
+            return 200, search_result('e1', 'r1')
+        api, adapter = fake_api(handler, result_cache=ResultCache())
+        api.schema = load_schema()
+        option_model = pydantic_model_to_option_model(create_model('Record', id=(str, ...), name=(str, ...)))
+        api.search(option_model(id=True), {'name': 'a', 'city': 'b'})
+        api.search(option_model(id=True, name=False), {'city': 'b', 'name': 'a'})
+        api.search(option_model(id=True, name=True), {'name': 'a', 'city': 'b'})
+        self.assertEqual(len(adapter.requests), 3)
+
+        api.submit([{'id': 'r1'}])
+        api.search(option_model(id=True), {'name': 'a', 'city': 'b'})
+        self.assertEqual(len(adapter.requests), 5)
+
+    def test_search_during_submit(self):
+        """
+        Test that results of searches running while records are submitted are not served afterwards.
+        """
+        state = {'name': 'old'}
+        def handler(request):
+            data = request_json(request)
+            if 'submit' in data['query']:
+                # a search that starts while the mutation is in flight gets the old state
+                self.assertEqual(api.search((('name',),), {'name': 'a'})['data']['search']['entities'][0]['records'][0]['name'], 'old')
+                state['name'] = 'new'
+                return 200, {'data': {'submit': {'recordsAdded': 1}}}
+            return 200, {'data': {'search': {'entities': [{'id': 'e1', 'records': [{'id': 'r1', 'name': state['name']}]}]}}}
+        api, adapter = fake_api(handler, result_cache=ResultCache(ttl=600))
+        api.schema = load_schema()
+        api.search((('name',),), {'name': 'a'})
+        api.submit([{'id': 'r1'}])
+        self.assertEqual(api.search((('name',),), {'name': 'a'})['data']['search']['entities'][0]['records'][0]['name'], 'new')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import datetime
+import decimal
+import enum
+import importlib.util
+import io
+import json
+import unittest
+from pydantic import BaseModel, create_model
+from tilores.codec import json_loads, json_dumps, iter_items, GraphQLResponseError
+from tilores.conversion import pydantic_model_to_option_model
+from tests.support import fake_api, request_json
+
+class Season(str, enum.Enum):
+    SUMMER = 'SUMMER'
+
+class Address(BaseModel):
+    city: str
+    since: datetime.date
+
+class Person(BaseModel):
+    name: str
+    born: datetime.date | None = None
+    address: Address | None = None
+
+RESPONSE = {
+    'data': {'search': {'entities': [
+        {'id': 'e1', 'hits': {}, 'records': [{'id': 'r1', 'lat': 1.5}, {'id': 'r2', 'lat': None}]},
+        {'id': 'e2', 'hits': {}, 'records': [{'id': 'r3', 'lat': 2.0}]},
+    ]}},
+}
+
+class CodecTest(unittest.TestCase):
+    def test_json_loads(self):
+        for backend in (None, 'json'):
+            self.assertEqual(json_loads(backend)(b'{"a": [1, 2.5]}'), {'a': [1, 2.5]})
+        with self.assertRaises(NotImplementedError):
+            json_loads('unknown')
+
+    def test_json_dumps(self):
+        """
+        Test encoding variables with models, dates and times, enums and decimals alike with every backend.
+        """
+        utc = datetime.timezone.utc
+        variables = {'params': Person(name='Sophia', born=datetime.date(1990, 4, 15),
+            address=Address(city='Berlin', since=datetime.date(2020, 1, 1))),
+            'records': [{'seen': datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=utc), 'at': datetime.time(10, 11),
+                'season': Season.SUMMER, 'score': decimal.Decimal('1.5'), 'tags': ('a', 'b'), 'name': 'Müller', 'none': None}]}
+        expected = {'params': {'name': 'Sophia', 'born': '1990-04-15', 'address': {'city': 'Berlin', 'since': '2020-01-01'}},
+            'records': [{'seen': '2024-01-02T03:04:05+00:00', 'at': '10:11:00', 'season': 'SUMMER', 'score': '1.5',
+                'tags': ['a', 'b'], 'name': 'Müller', 'none': None}]}
+        backends = [backend for backend in ('json', 'orjson', 'msgspec') if backend == 'json' or importlib.util.find_spec(backend)]
+        for backend in backends:
+            with self.subTest(backend=backend):
+                body = json_dumps(backend)(variables)
+                self.assertIsInstance(body, bytes)
+                decoded = json.loads(body)
+                if backend == 'msgspec':
+                    # msgspec encodes UTC as Z
+                    decoded['records'][0]['seen'] = decoded['records'][0]['seen'].replace('Z', '+00:00')
+                self.assertEqual(decoded, expected)
+        with self.assertRaises(TypeError):
+            json_dumps('json')({'a': object()})
+        with self.assertRaises(NotImplementedError):
+            json_dumps('unknown')
+
+    def test_gql_variables(self):
+        """
+        Test that a model passed as search parameters is sent as JSON.
+        """
+        api, adapter = fake_api(lambda request: (200, {'data': {'search': {'entities': []}}}))
+        api.search((('id',),), Person(name='Sophia', born=datetime.date(1990, 4, 15)))
+        self.assertEqual(request_json(adapter.requests[-1])['variables'], {'params': {'name': 'Sophia', 'born': '1990-04-15', 'address': None}})
+
+    @unittest.skipIf(importlib.util.find_spec('ijson') is None, 'ijson is not installed')
+    def test_iter_items(self):
+        """
+        Test incrementally parsing entities and records.
+        """
+        body = json.dumps(RESPONSE).encode('utf-8')
+        entities = list(iter_items(io.BytesIO(body), 'data.search.entities'))
+        self.assertEqual(entities, RESPONSE['data']['search']['entities'])
+
+        records = list(iter_items(io.BytesIO(body), 'data.search.entities.item.records', id_path='data.search.entities.item.id'))
+        self.assertEqual(records, [('e1', {'id': 'r1', 'lat': 1.5}), ('e1', {'id': 'r2', 'lat': None}), ('e2', {'id': 'r3', 'lat': 2.0})])
+
+        Record = create_model('Record', id=(str, ...), lat=(float | None, None))
+        records = list(iter_items(io.BytesIO(body), 'data.search.entities.item.records', model=Record))
+        self.assertEqual(records[0], Record(id='r1', lat=1.5))
+
+        body = json.dumps({**RESPONSE, 'errors': [{'message': 'partial'}]}).encode('utf-8')
+        items = iter_items(io.BytesIO(body), 'data.search.entities')
+        self.assertEqual(next(items)['id'], 'e1')
+        with self.assertRaises(GraphQLResponseError) as context:
+            list(items)
+        self.assertEqual(context.exception.errors, [{'message': 'partial'}])
+
+    @unittest.skipIf(importlib.util.find_spec('ijson') is None, 'ijson is not installed')
+    def test_search_stream(self):
+        api, _ = fake_api(lambda request: (200, RESPONSE))
+        option_model = pydantic_model_to_option_model(create_model('Record', id=(str, ...)))
+        entities = api.search_stream(option_model(id=True), {'name': 'a'})
+        self.assertEqual([e['id'] for e in entities], ['e1', 'e2'])
+        records = api.search_stream(option_model(id=True), {'name': 'a'}, records=True)
+        self.assertEqual([(e, r['id']) for e, r in records], [('e1', 'r1'), ('e1', 'r2'), ('e2', 'r3')])
+
+if __name__ == '__main__':
+    unittest.main()
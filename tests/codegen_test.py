@@ -0,0 +1,99 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+import graphql
+from tilores.cli import main
+from tilores.codegen import ModuleGenerator, load_schema
+from tilores.conversion import option_model_to_graphql_fields, option_model_to_selection
+from tests.mock_server import MockTilores
+
+def import_file(path):
+    spec = importlib.util.spec_from_file_location('generated_models', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def import_source(source):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'models.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        return import_file(path)
+
+class CodegenTest(unittest.TestCase):
+    def test_generate(self):
+        """
+        Test generating a module with static models from a complex GraphQL schema.
+        """
+        models = import_source(ModuleGenerator(load_schema('tests/fixtures/complex_schema.graphql')).generate())
+        self.assertEqual(set(models.MODELS), {'Record', 'RecordInput', 'SearchParams', 'Address', 'Animal', 'Discount', 'Coupon'})
+        self.assertIsNotNone(models.Record.__doc__)
+        self.assertIsNotNone(models.SeasonEnum.__doc__)
+        record = models.Record.model_validate({
+            'id': '1',
+            'bool': True,
+            'required_bool': False,
+            'required_number': 1,
+            'required_floaty_number': 1.5,
+            'required_string': 'a',
+            'required_enum': 'SPRING',
+            'required_union': {'code': 'X', 'amount': 5},
+            'required_custom_object': {'address_line1': 'Main St', 'postal_code': 12345, 'city': 'Berlin'},
+        })
+        self.assertIs(record.bool, True)
+        self.assertEqual(record.required_enum, models.SeasonEnum.SPRING)
+        self.assertIsInstance(record.required_union, models.Coupon)
+        self.assertIsInstance(record.required_custom_object, models.Address)
+        self.assertIn('zip', models.SEARCH_PARAM_NAMES)
+        self.assertIn(('union', '__typename'), models.RECORD_SELECTION)
+        self.assertIn(('custom_object', 'city'), models.RECORD_SELECTION)
+
+        options = models.RecordOptions(id=True, custom_object=models.AddressOptions(city=True))
+        self.assertEqual(option_model_to_selection(options), (('id',), ('custom_object', 'city')))
+        fields = option_model_to_graphql_fields(options)
+        self.assertEqual((fields[0], fields[1].name, fields[1].fields), ('id', 'custom_object', ['city']))
+
+    def test_generate_names(self):
+        """
+        Test generating models for fields named like keywords and the types they refer to.
+        """
+        schema = graphql.build_schema('''
+            type Record { id: ID! from: String bool: Boolean flag: Boolean typing: [String] person: Person }
+            type Person { name: String friends: [Person] }
+            input RecordInput { id: ID! }
+            input SearchParams { name: String }
+            type Query { search(searchParams: SearchParams!): [Record] }
+        ''')
+        models = import_source(ModuleGenerator(schema).generate())
+        record = models.Record.model_validate({'id': '1', 'from': 'a', 'bool': True, 'flag': False, 'typing': ['b']})
+        self.assertEqual((record.from_, record.bool, record.flag, record.typing), ('a', True, False, ['b']))
+        person = models.Person.model_validate({'name': 'a', 'friends': [{'name': 'b'}]})
+        self.assertEqual(person.friends[0].name, 'b')
+        self.assertIs(models.PersonOptions.model_fields['friends'].annotation, models.PersonOptions)
+        self.assertEqual(models.RECORD_SELECTION[-1], ('person', 'name'))
+
+    def test_cli(self):
+        """
+        Test generating the module with the command line interface from a file and a live instance.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'models.py')
+            self.assertEqual(main(['codegen', '--schema', 'tests/fixtures/schema.graphql', '-o', path]), 0)
+            from_file = import_file(path)
+
+            with MockTilores() as server:
+                environ = {'TILORES_API_URL': server.api_url, 'TILORES_TOKEN_URL': server.token_url,
+                    'TILORES_CLIENT_ID': 'id', 'TILORES_CLIENT_SECRET': 'secret'}
+                with mock.patch.dict(os.environ, environ):
+                    self.assertEqual(main(['codegen', '-o', path]), 0)
+                with server.api() as api:
+                    fingerprint = api.schema_fingerprint()
+            live = import_file(path)
+        self.assertEqual(from_file.SCHEMA_FINGERPRINT, live.SCHEMA_FINGERPRINT)
+        self.assertEqual(live.SCHEMA_FINGERPRINT, fingerprint)
+        self.assertEqual(from_file.RECORD_SELECTION, live.RECORD_SELECTION)
+
+if __name__ == '__main__':
+    unittest.main()
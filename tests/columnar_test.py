@@ -0,0 +1,111 @@
+import datetime
+import importlib.util
+import unittest
+import graphql
+from tests.mock_server import MockTilores
+
+SCHEMA = '''
+type Record {
+  id: ID!
+  born: Date
+  seen: DateTime
+  at: Time
+  count: Int!
+  score: Float
+  active: Boolean
+  season: Season
+  tags: [String]
+  address: Address
+  offer: Offer
+  pets: [Pet!]
+  extra: Any
+}
+type Address { city: String }
+type Pet { name: String }
+type Coupon { code: String }
+union Offer = Coupon
+enum Season { SUMMER WINTER }
+scalar Date
+scalar DateTime
+scalar Time
+scalar Any
+type Query { record: Record }
+'''
+
+ENTITIES = [
+    {'id': 'e1', 'hits': {'r1': ['R1', 'R2']}, 'records': [
+        {'id': 'r1', 'born': '1990-04-15', 'seen': '2024-01-02T03:04:05Z', 'at': '10:11:12', 'count': 1, 'score': 1,
+            'active': True, 'season': 'SUMMER', 'tags': ['a', None], 'address': {'city': 'Berlin'},
+            'offer': {'__typename': 'Coupon'}, 'pets': [{'name': 'Rex'}, {'name': None}], 'extra': {'a': 1}},
+        {'id': 'r2', 'born': None, 'seen': '2024-01-02T03:04:05', 'at': None, 'count': 2, 'score': 2.5,
+            'active': None, 'season': None, 'tags': None, 'address': None, 'offer': None, 'pets': None, 'extra': None},
+    ]},
+    {'id': 'e2', 'hits': {}, 'records': [
+        {'id': 'r3', 'born': None, 'seen': None, 'at': None, 'count': 3, 'score': None,
+            'active': False, 'season': 'WINTER', 'tags': [], 'address': {'city': None}, 'offer': None, 'pets': [], 'extra': None},
+    ]},
+]
+
+SELECTION = (('id',), ('born',), ('seen',), ('at',), ('count',), ('score',), ('active',), ('season',), ('tags',),
+    ('address', 'city'), ('offer', '__typename'), ('pets', 'name'), ('extra',))
+
+@unittest.skipIf(importlib.util.find_spec('pyarrow') is None, 'requires pyarrow')
+class ArrowAdapterTest(unittest.TestCase):
+    def test_table(self):
+        """
+        Test flattening entities into a typed Arrow table with one row per record.
+        """
+        import pyarrow
+        from tilores.columnar import ArrowAdapter
+        adapter = ArrowAdapter(graphql.build_schema(SCHEMA), SELECTION)
+        table = adapter.table(ENTITIES)
+        self.assertEqual(table.column_names, ['entity_id', 'hits', 'id', 'born', 'seen', 'at', 'count', 'score', 'active',
+            'season', 'tags', 'address.city', 'offer.__typename', 'pets.name', 'extra'])
+        types = dict(zip(table.column_names, table.schema.types))
+        self.assertEqual(types['born'], pyarrow.date32())
+        self.assertEqual(types['seen'], pyarrow.timestamp('us', tz='UTC'))
+        self.assertEqual(types['count'], pyarrow.int64())
+        self.assertEqual(types['season'], pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+        self.assertEqual(types['pets.name'], pyarrow.list_(pyarrow.string()))
+
+        rows = table.to_pylist()
+        utc = datetime.timezone.utc
+        self.assertEqual([row['entity_id'] for row in rows], ['e1', 'e1', 'e2'])
+        self.assertEqual([row['hits'] for row in rows], [['R1', 'R2'], None, None])
+        self.assertEqual(rows[0]['born'], datetime.date(1990, 4, 15))
+        self.assertEqual([row['seen'] for row in rows], [datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=utc)] * 2 + [None])
+        self.assertEqual(rows[0]['at'], datetime.time(10, 11, 12))
+        self.assertEqual([row['score'] for row in rows], [1.0, 2.5, None])
+        self.assertEqual([row['season'] for row in rows], ['SUMMER', None, 'WINTER'])
+        self.assertEqual([row['address.city'] for row in rows], ['Berlin', None, None])
+        self.assertEqual([row['pets.name'] for row in rows], [['Rex', None], None, []])
+        self.assertEqual(rows[0]['extra'], '{"a":1}')
+
+    def test_record_batches(self):
+        """
+        Test flattening entities incrementally into record batches of a maximum size.
+        """
+        from tilores.columnar import ArrowAdapter
+        adapter = ArrowAdapter(graphql.build_schema(SCHEMA), (('id',), ('count',)), batch_size=2)
+        batches = list(adapter.record_batches(iter(ENTITIES)))
+        self.assertEqual([batch.num_rows for batch in batches], [2, 1])
+        self.assertEqual(batches[1].to_pylist(), [{'entity_id': 'e2', 'hits': None, 'id': 'r3', 'count': 3}])
+        self.assertEqual(adapter.table([]).num_rows, 0)
+
+    @unittest.skipIf(importlib.util.find_spec('ijson') is None, 'requires ijson')
+    def test_search(self):
+        """
+        Test searching into an Arrow table and streaming record batches.
+        """
+        with MockTilores(entities=3, records=5) as server, server.api() as api:
+            selection = (('id',), ('first_name',))
+            table = api.search_arrow(selection, {'name': 'Sophia'})
+            self.assertIs(api.arrow_adapter(selection), api.arrow_adapter(selection))
+            batches = list(api.search_record_batches(selection, {'name': 'Sophia'}, batch_size=4))
+        self.assertEqual(table.num_rows, 15)
+        self.assertEqual(table.column_names, ['entity_id', 'hits', 'id', 'first_name'])
+        self.assertEqual([batch.num_rows for batch in batches], [4, 4, 4, 3])
+        self.assertEqual([value for batch in batches for value in batch.column('id').to_pylist()], table.column('id').to_pylist())
+
+if __name__ == '__main__':
+    unittest.main()
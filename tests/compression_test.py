@@ -0,0 +1,103 @@
+import gzip
+import importlib.util
+import json
+import unittest
+from unittest import mock
+from tests.mock_server import MockTilores
+from tests.support import fake_async_api, httpx
+from tilores.compression import Compression, decodable_encodings
+from tilores.instrumentation import MetricsCollector
+
+class CompressionTest(unittest.TestCase):
+    def test_encode(self):
+        """
+        Test that only request bodies above the threshold are compressed.
+        """
+        compression = Compression(threshold=100)
+        body, headers = compression.encode(b'{"query":"query { a }"}')
+        self.assertEqual(body, b'{"query":"query { a }"}')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertIn('gzip', headers['Accept-Encoding'])
+
+        data = json.dumps({'variables': {'records': [{'id': str(i), 'name': 'Sophia Müller'} for i in range(100)]}}).encode('utf-8')
+        body, headers = compression.encode(data)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertLess(len(body) * 5, len(data))
+        self.assertEqual(gzip.decompress(body), data)
+
+    def test_options(self):
+        """
+        Test rejecting unknown encodings and disabling compressed responses.
+        """
+        with self.assertRaises(AssertionError):
+            Compression('deflate')
+        _, headers = Compression(None, accept_encodings=()).encode(b'{}')
+        self.assertEqual(headers['Accept-Encoding'], 'identity')
+
+    def test_decodable_encodings(self):
+        """
+        Test that only content codings the HTTP client has a decoder for are accepted.
+        """
+        import urllib3.util.request
+        with mock.patch.object(urllib3.util.request, 'ACCEPT_ENCODING', 'gzip,deflate,br'):
+            # e.g. urllib3 1.26, which cannot decode zstd even if zstandard is installed
+            self.assertEqual(decodable_encodings(), ('gzip', 'deflate', 'br'))
+            self.assertEqual(Compression().accept_encoding(), 'gzip, deflate, br')
+        if httpx is not None:
+            installed = {'zstandard', 'brotli'}
+            with mock.patch('importlib.util.find_spec', lambda name: object() if name in installed else None):
+                with mock.patch.object(httpx, '__version__', '0.28.1'):
+                    self.assertEqual(Compression().accept_encoding('httpx'), 'gzip, deflate, zstd, br')
+                with mock.patch.object(httpx, '__version__', '0.27.0'):
+                    self.assertEqual(decodable_encodings('httpx'), ('gzip', 'deflate', 'br'))
+
+    @unittest.skipIf(importlib.util.find_spec('zstandard') is not None, 'requires zstandard to be missing')
+    def test_missing_compressor(self):
+        """
+        Test that a missing compressor fails when configuring the client, not on the first request.
+        """
+        with self.assertRaisesRegex(ImportError, 'tilores-sdk\\[compression\\]'):
+            Compression('zstd')
+
+    def test_search(self):
+        """
+        Test compressing requests and decompressing responses against a server, recording the sizes on the wire.
+        """
+        metrics = MetricsCollector()
+        with MockTilores(entities=5, records=50, gzip_responses=True) as server, \
+                server.api(compression=Compression(threshold=0), hooks=metrics) as api:
+            result = api.search((('id',),), {'name': 'Sophia'})
+            streamed = list(api.search_stream((('id',),), {'name': 'Sophia'})) if importlib.util.find_spec('ijson') else None
+        self.assertEqual(len(result['data']['search']['entities']), 5)
+        if streamed is not None:
+            self.assertEqual(streamed, result['data']['search']['entities'])
+        self.assertEqual(server.request_encodings[-1], 'gzip')
+        snapshot = metrics.snapshot()
+        response = snapshot['compression']['search.response']
+        self.assertEqual(response['count'], 1)
+        self.assertGreater(response['ratio'], 5)
+        # the streamed response is as large as the other one, its Content-Length is the compressed size
+        self.assertEqual(snapshot['response_bytes']['search']['sum'], response['encoded_bytes'] * (1 if streamed is None else 2))
+        self.assertEqual(snapshot['compression']['search.request']['count'], 2)
+
+    @unittest.skipIf(httpx is None, 'httpx is not installed')
+    def test_async(self):
+        """
+        Test compressing the request bodies of the asyncio client.
+        """
+        import asyncio
+        encodings = []
+        def handler(request):
+            encodings.append(request.headers.get('Content-Encoding'))
+            return 200, {'data': json.loads(gzip.decompress(request.content))['variables']}
+        async def run():
+            api, _ = fake_async_api(handler, compression=Compression(threshold=0))
+            try:
+                return await api.gql('query($a: Int) { a }', {'a': 1})
+            finally:
+                await api.close()
+        self.assertEqual(asyncio.run(run()), {'data': {'a': 1}})
+        self.assertEqual(encodings, ['gzip'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -84,4 +84,62 @@ class ConvertModelTest(unittest.TestCase):
       "age"
     ]
 
-    self.assertEqual(expected, actual)
\ No newline at end of file
+    self.assertEqual(expected, actual)
+
+  def test_option_model_to_selection(self):
+    graphqlModel = create_model(
+      "Record",
+      id=(str, ...),
+      firstName=(str, ...),
+      addr=(create_model(
+        "Address",
+        street=(str, ...),
+        city=(str, ...)
+      ), ...)
+    )
+    optionModel = pydantic_model_to_option_model(graphqlModel)
+    options = optionModel(id=True, addr={"city": True})
+    selection = option_model_to_selection(options)
+
+    self.assertEqual((("id",), ("addr", "city")), selection)
+    self.assertEqual(option_model_to_graphql_fields(options), selection_to_graphql_fields(selection))
+    self.assertEqual(selection, option_model_to_selection(optionModel(addr={"city": True}, id=True)))
+    self.assertEqual((("id",),), option_model_to_selection(optionModel(id=True)))
+
+class ConversionCacheTest(unittest.TestCase):
+  def test_cached_conversions(self):
+    """
+    Test that the option models and graphql fields are built once per model and selection.
+    """
+    address = create_model("Address", city=(str, ...))
+    graphqlModel = create_model("Record", id=(str, ...), addr=(address, ...))
+    optionModel = pydantic_model_to_option_model(graphqlModel)
+
+    self.assertIs(optionModel, pydantic_model_to_option_model(graphqlModel))
+    self.assertIs(optionModel.model_fields["addr"].annotation, pydantic_model_to_option_model(address))
+
+    selection = option_model_to_selection(optionModel(id=True, addr={"city": True}))
+    fields = selection_to_graphql_fields(selection)
+    self.assertEqual(["id", Field(name="addr", fields=["city"])], fields)
+    self.assertIs(fields[1], selection_to_graphql_fields(selection)[1])
+    fields.append("name")
+    self.assertEqual(2, len(selection_to_graphql_fields(selection)))
+
+  def test_records_definition(self):
+    """
+    Test selecting all record fields, including required objects and unions.
+    """
+    from graphql import build_schema
+    from tilores.schema import record_selection_of, records_definition_of
+    schema = build_schema('''
+      type Record { id: ID! addr: Address! offer: Offer }
+      type Address { city: String }
+      type Coupon { code: String }
+      union Offer = Coupon
+      type Query { search: [Record] }
+    ''')
+    selection = record_selection_of(schema)
+
+    self.assertEqual((("id",), ("addr", "city"), ("offer", "__typename")), selection)
+    self.assertIs(selection, record_selection_of(schema))
+    self.assertEqual(Field(name="records", fields=selection_to_graphql_fields(selection)), records_definition_of(schema))
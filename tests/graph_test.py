@@ -0,0 +1,78 @@
+import unittest
+import importlib.util
+from tilores.graph import EntityGraph
+from tests.support import fake_api, request_json
+
+ENTITIES = {
+    'e1': ['r1:r2:R1', 'r2:r3:R2', 'r3:r4:R1', 'r1:r2:R2'],
+    'e2': ['r5:r6:R3'],
+}
+RECORD_ENTITIES = {record_id: entity_id for entity_id, edges in ENTITIES.items() for edge in edges for record_id in edge.split(':')[:2]}
+
+def handler(request):
+    body = request_json(request)
+    by_record = 'entityByRecord' in body['query']
+    data = {}
+    for name, ID in body['variables'].items():
+        entity_id = RECORD_ENTITIES.get(ID) if by_record else ID
+        entity = {'id': entity_id, 'edges': ENTITIES[entity_id]} if entity_id in ENTITIES else None
+        data[name.replace('id_', 'entity_')] = {'entity': entity}
+    return 200, {'data': data}
+
+class EntityGraphTest(unittest.TestCase):
+    def test_graph(self):
+        """
+        Test that edges are interned and traversed through the CSR adjacency.
+        """
+        graph = EntityGraph()
+        for entity_id, edges in ENTITIES.items():
+            graph.add_entity(entity_id, edges)
+
+        self.assertEqual(graph.num_nodes, 6)
+        self.assertEqual(graph.num_edges, 5)
+        self.assertEqual(graph.rules, ['R1', 'R2', 'R3'])
+        self.assertEqual(graph.neighbors('r2'), ['r1', 'r3'])
+        self.assertEqual(graph.bfs(['r1']), {'r1': 0, 'r2': 1, 'r3': 2, 'r4': 3})
+        self.assertEqual(graph.bfs(['r1', 'r5'], max_depth=1), {'r1': 0, 'r5': 0, 'r2': 1, 'r6': 1})
+        self.assertEqual(list(graph.bfs(['r1'], max_nodes=3)), ['r1', 'r2', 'r3'])
+        self.assertEqual(graph.subgraph(['r1', 'r2']).edge_list(), [('r1', 'r2', 'R1'), ('r1', 'r2', 'R2')])
+        self.assertEqual(graph.edge_list()[4], ('r5', 'r6', 'R3'))
+        with self.assertRaises(AssertionError):
+            graph.add_entity('e3', ['r7-r8'])
+
+    @unittest.skipIf(importlib.util.find_spec('numpy') is None, 'requires numpy')
+    def test_to_numpy(self):
+        """
+        Test that the graph is exported as NumPy arrays.
+        """
+        graph = EntityGraph()
+        graph.add_entity('e2', ENTITIES['e2'])
+        arrays = graph.to_numpy()
+        self.assertEqual(arrays['edges'].tolist(), [[0, 1]])
+        self.assertEqual(arrays['indptr'].tolist(), [0, 1, 2])
+        self.assertEqual(arrays['indices'].tolist(), [1, 0])
+
+    def test_entity_graph(self):
+        """
+        Test that the edges of many entities are fetched in batches of aliased entity queries.
+        """
+        api, adapter = fake_api(handler)
+        graph = api.entity_graph(['e1', 'e2', 'missing'], batch_size=2, concurrency=2)
+
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertIn(2, [len(request_json(r)['variables']) for r in adapter.requests[1:]])
+        self.assertEqual(sorted(graph.entities), ['e1', 'e2'])
+        self.assertEqual(graph.num_edges, 5)
+
+    def test_record_graph(self):
+        """
+        Test that the graph around records is traversed to the maximum depth.
+        """
+        api, adapter = fake_api(handler)
+        graph = api.record_graph(['r2', 'r6'], max_depth=1)
+
+        self.assertIn('entityByRecord(', request_json(adapter.requests[1])['query'])
+        self.assertEqual(sorted(graph.edge_list()), [('r1', 'r2', 'R1'), ('r1', 'r2', 'R2'), ('r2', 'r3', 'R2'), ('r5', 'r6', 'R3')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
-from tilores.helpers import PydanticFactory
+from tilores.helpers import PydanticFactory, StructFactory
+import datetime
 import graphql
 
 class GraphQLModelFactoryTest(unittest.TestCase):
@@ -38,6 +39,38 @@ class GraphQLModelFactoryTest(unittest.TestCase):
         # Interfaces
         assert 'Animal' in references
 
+    def test_struct_factory(self):
+        """
+        Test decoding responses into the compact classes generated from a GraphQL schema.
+        """
+        with open('tests/fixtures/complex_schema.graphql') as f:
+            schema = graphql.build_schema(f.read() + 'extend type Record { born: Date }\nscalar Date')
+        factory = StructFactory(schema)
+        references = factory.generate()
+        assert 'Record' in references
+        assert 'Entity' in references
+        assert references['SeasonEnum'].__doc__ is not None
+
+        record = factory.decode('Record', {
+            'id': '1',
+            'born': '1990-04-15',
+            'floaty_number': 1,
+            'enum': 'SPRING',
+            'custom_object': {'city': 'Berlin'},
+            'union': {'__typename': 'Coupon'},
+            'interface': {'id': '2', 'name': 'Rex'},
+        })
+        self.assertEqual(record.id, '1')
+        self.assertEqual(record.born, datetime.date(1990, 4, 15))
+        self.assertIsInstance(record.floaty_number, float)
+        self.assertIs(record.enum, references['SeasonEnum'].SPRING)
+        self.assertEqual(record.custom_object.city, 'Berlin')
+        self.assertIsInstance(record.union, references['Coupon'])
+        self.assertIsInstance(record.interface, references['Animal'])
+        self.assertIsNone(record.source)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record, factory.decode('Record', record.to_dict() | {'born': '1990-04-15', 'enum': 'SPRING', 'custom_object': {'city': 'Berlin'}, 'union': {'__typename': 'Coupon'}, 'interface': {'id': '2', 'name': 'Rex'}}))
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# Dependencies that must only be imported once a feature needs them.
+LAZY_DEPENDENCIES = ['graphql', 'graphql_query', 'pydantic', 'httpx', 'asyncio', 'numpy', 'ijson', 'prometheus_client', 'opentelemetry', 'pyarrow']
+
+# The seconds `from tilores import TiloresAPI` may take in a fresh interpreter.
+IMPORT_BUDGET = float(os.environ.get('TILORES_IMPORT_BUDGET', '0.4'))
+
+def run_python(code):
+    """Run the code in a fresh interpreter and decode the JSON it printed."""
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(result.stdout)
+
+class ImportTest(unittest.TestCase):
+    def test_lazy_dependencies(self):
+        """
+        Test that importing the package and creating a client does not import the heavy dependencies.
+        """
+        loaded = run_python(f'''
+import json, sys
+import tilores
+from tilores import TiloresAPI
+TiloresAPI(api_url='http://localhost/graphql', token_url='http://localhost/token', client_id='id', client_secret='secret')
+print(json.dumps([name for name in {LAZY_DEPENDENCIES!r} if name in sys.modules]))
+''')
+        self.assertEqual(loaded, [])
+        self.assertEqual(run_python('import json, sys, tilores; print(json.dumps("requests" in sys.modules))'), False)
+
+    def test_import_time(self):
+        """
+        Test that importing the client stays within the import time budget.
+        """
+        duration = min(run_python('''
+import json, time
+started = time.perf_counter()
+from tilores import TiloresAPI
+print(json.dumps(time.perf_counter() - started))
+''') for _ in range(3))
+        self.assertLess(duration, IMPORT_BUDGET, f'from tilores import TiloresAPI took {duration:.3f}s, '
+            f'check python -X importtime -c "from tilores import TiloresAPI" for the slow imports')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import unittest
+from unittest import mock
+from tilores import RecordInsights
+from tilores.insights import RecordInsightsEvaluator, numpy, parse_time
+from tilores.record_insights import ASC
+
+with open('tests/fixtures/integration.jsonl') as f:
+    RECORDS = [json.loads(line) for line in f][:6]
+
+# The results of the Tilores API for RECORDS, an entity of the integration test data.
+INSIGHTS = (RecordInsights()
+    .frequency_distribution('first_name', alias='first_name')
+    .frequency_distribution('city', alias='cities', top=2, direction=ASC)
+    .frequency_distribution('phone', alias='phones', top=10)
+    .newest('receivedDate', alias='newest', fields=['id', 'email'])
+    .oldest('receivedDate', alias='oldest', fields=['id', 'city'])
+    .values('email', alias='emails')
+    .values_distinct('city', alias='distinct_cities')
+    .values('name', alias='names'))
+EXPECTED = {
+    'first_name': [{'value': 'Alexander'}],
+    'cities': [{'value': 'New York'}, {'value': 'San Francisco'}],
+    'phones': [{'value': '2125551234'}, {'value': '4155559876'}],
+    'newest': {'id': 'aa001001-0010-4000-a000-000000000010', 'email': 'thompson.alex@university.edu'},
+    'oldest': {'id': 'aa001001-0001-4000-a000-000000000001', 'city': 'New York'},
+    'emails': ['alex.thompson@email.com', 'a.thompson@company.com', 'a.thompson@finance.com', 'thompson.alex@university.edu'],
+    'distinct_cities': ['New York', 'San Francisco'],
+    'names': [],
+}
+
+class RecordInsightsModelTest(unittest.TestCase):
+    def test_instantiate(self):
+        """
+        Test that RecordInsights can be instantiated and rendered, which requires its pydantic model to be rebuilt.
+        """
+        insights = RecordInsights(alias='golden').values('email', alias='emails').newest('receivedDate', alias='newest', fields=['id'])
+        self.assertTrue(insights.render().startswith('golden: recordInsights {\n  emails: values(\n    field: "email"'))
+
+class RecordInsightsParityTest(unittest.TestCase):
+    """
+    Test that the local evaluation matches the results of the Tilores API.
+    """
+
+    def evaluators(self, records):
+        yield RecordInsightsEvaluator(records, use_numpy=False)
+        if numpy is not None:
+            yield RecordInsightsEvaluator(records, use_numpy=True)
+
+    def test_evaluate(self):
+        for evaluator in self.evaluators(RECORDS):
+            with self.subTest(use_numpy=evaluator.use_numpy):
+                self.assertEqual(evaluator.evaluate(INSIGHTS), EXPECTED)
+        self.assertEqual(INSIGHTS.evaluate(RECORDS), EXPECTED)
+
+    def test_frequency_distribution(self):
+        records = RECORDS + [{'city': 'new york'}, {'city': None}]
+        for evaluator in self.evaluators(records):
+            with self.subTest(use_numpy=evaluator.use_numpy):
+                self.assertEqual(evaluator.frequency_distribution('city'), [
+                    {'value': 'New York', 'frequency': 4, 'percentage': 4/7},
+                    {'value': 'San Francisco', 'frequency': 3, 'percentage': 3/7},
+                ])
+                self.assertEqual([e['frequency'] for e in evaluator.frequency_distribution('city', case_sensitive=True)], [3, 3, 1])
+                self.assertEqual(evaluator.frequency_distribution('name'), [])
+
+    def test_values_distinct(self):
+        records = RECORDS + [{'city': 'SAN FRANCISCO'}, {'city': 'Berlin'}]
+        for evaluator in self.evaluators(records):
+            with self.subTest(use_numpy=evaluator.use_numpy):
+                self.assertEqual(evaluator.values_distinct('city'), ['New York', 'San Francisco', 'Berlin'])
+                self.assertEqual(evaluator.values_distinct('city', case_sensitive=True), ['New York', 'San Francisco', 'SAN FRANCISCO', 'Berlin'])
+
+    def test_newest_oldest(self):
+        records = [{'id': 'a', 'receivedDate': '2024-07-23T08:00:00-04:00'}, {'id': 'b', 'receivedDate': '2024-07-23T13:00:00Z'}, {'id': 'c'}]
+        for evaluator in self.evaluators(records):
+            with self.subTest(use_numpy=evaluator.use_numpy):
+                self.assertEqual(evaluator.newest('receivedDate')['id'], 'b')
+                self.assertEqual(evaluator.oldest('receivedDate')['id'], 'a')
+                self.assertIsNone(evaluator.newest('dob'))
+
+    def test_columns_derived_once(self):
+        records = [{'id': 'a', 'receivedDate': '2024-07-23T13:00:00Z', 'tags': ['x', 'y']},
+            {'id': 'b', 'receivedDate': '2024-07-23T13:00:00Z', 'tags': ['z', 'w']}]
+        for evaluator in self.evaluators(records):
+            with self.subTest(use_numpy=evaluator.use_numpy):
+                with mock.patch('tilores.insights.parse_time', wraps=parse_time) as parse:
+                    self.assertEqual(evaluator.newest('receivedDate')['id'], 'a')
+                    self.assertEqual(evaluator.oldest('receivedDate')['id'], 'a')
+                self.assertEqual(parse.call_count, 1)
+                self.assertIs(evaluator.non_null('id'), evaluator.non_null('id'))
+                self.assertEqual(evaluator.values('tags'), [['x', 'y'], ['z', 'w']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+from tilores.cache import ResultCache
+import importlib.util
+from tilores.instrumentation import MetricsCollector, PrometheusHooks, OpenTelemetryHooks, Hooks, Histogram
+from tilores.operations import operation_name_of
+from tests.support import fake_api
+
+class InstrumentationTest(unittest.TestCase):
+    def test_operation_name_of(self):
+        """
+        Test that operations are named after the GraphQL operation of the document.
+        """
+        self.assertEqual(operation_name_of('query search($params: SearchParams!) { search }'), 'search')
+        self.assertEqual(operation_name_of('\n  mutation submit { submit }'), 'submit')
+        self.assertEqual(operation_name_of('{ ok }'), 'gql')
+
+    def test_entity_edges_operation(self):
+        """
+        Test that single and batched entity edges are recorded under the same operation.
+        """
+        metrics = MetricsCollector()
+        def handler(request):
+            return 200, {'data': {'entity': {'entity': {'id': 'e1', 'edges': []}}, 'entity_0': {'entity': {'id': 'e1', 'edges': []}}}}
+        api, _ = fake_api(handler, hooks=[metrics])
+        api.entity_edges('e1')
+        list(api.iter_entity_edges(['e1']))
+        self.assertEqual(metrics.snapshot()['latency']['entity_edges']['count'], 2)
+
+    def test_metrics_collector(self):
+        """
+        Test that requests, retries, token refreshes, phases and cache lookups are collected.
+        """
+        responses = iter([(503, {}), (200, {'data': {'search': {'entities': []}}})])
+        metrics = MetricsCollector()
+        api, _ = fake_api(lambda request: next(responses), hooks=[metrics], result_cache=ResultCache())
+        with mock.patch('tilores.tilores_api.time.sleep'):
+            for _ in range(2):
+                api.search((('id',),), {'name': 'x'})
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot['latency']['search']['count'], 2)
+        self.assertEqual(snapshot['statuses'], {'search.503': 1, 'search.200': 1})
+        self.assertEqual(snapshot['retries'], {'search': 1})
+        self.assertEqual(snapshot['in_flight'], {'search': 0})
+        self.assertGreater(snapshot['response_bytes']['search']['sum'], 0)
+        self.assertEqual(snapshot['token_refreshes']['count'], 1)
+        self.assertEqual(snapshot['cache'], {'search': {'hits': 1, 'misses': 1, 'hit_rate': 0.5}})
+        self.assertEqual({name: h['count'] for name, h in snapshot['phases'].items()},
+            {'search.render': 2, 'search.serialize': 1, 'search.decode': 1})
+
+    def test_histogram_quantile(self):
+        """
+        Test estimating quantiles by interpolating within the buckets.
+        """
+        histogram = Histogram((0.1, 0.2, 0.4))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.05, 0.15, 0.15, 0.3, 1.0):
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.2), 0.1)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.175)
+        self.assertEqual(histogram.quantile(0.99), 0.4)
+
+    @unittest.skipIf(importlib.util.find_spec('prometheus_client') is None, 'requires prometheus_client')
+    def test_prometheus(self):
+        """
+        Test that the Prometheus hooks export to the given registry.
+        """
+        import prometheus_client
+        registry = prometheus_client.CollectorRegistry()
+        api, _ = fake_api(lambda request: (200, {'data': {}}), hooks=[PrometheusHooks(registry=registry), Hooks()])
+        api.gql('query entity_edges { ok }')
+        self.assertEqual(registry.get_sample_value('tilores_request_duration_seconds_count', {'operation': 'entity_edges', 'status': '200'}), 1)
+        self.assertEqual(registry.get_sample_value('tilores_token_refresh_duration_seconds_count', {'result': 'ok'}), 1)
+
+    @unittest.skipIf(importlib.util.find_spec('opentelemetry') is None, 'requires opentelemetry')
+    def test_opentelemetry(self):
+        """
+        Test that each request is traced as a client span.
+        """
+        try:
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+            from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        except ImportError:
+            self.skipTest('requires opentelemetry-sdk')
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        api, _ = fake_api(lambda request: (200, {'data': {}}), hooks=OpenTelemetryHooks(tracer_provider=provider))
+        api.gql('{ ok }')
+        spans = exporter.get_finished_spans()
+        self.assertEqual([span.name for span in spans], ['tilores gql'])
+        self.assertEqual(spans[0].attributes['http.response.status_code'], 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from tests.mock_server import MockTilores
+from tilores.cli import main
+from tilores.match import MatchJob, read_rows
+
+ROWS = [
+    {'ref': 'a', 'First_Name': 'Sophia', 'city': 'Berlin', 'note': 'x'},
+    {'ref': 'b', 'First_Name': '', 'city': '', 'note': 'y'},
+    {'ref': 'c', 'First_Name': 'Liam', 'city': 'Hamburg', 'note': 'z'},
+] * 4
+
+class Interrupted(Exception):
+    pass
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+class MatchJobTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, 'input.csv')
+        self.output = os.path.join(self.directory.name, 'output.jsonl')
+        write_csv(self.input, ROWS)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_match(self):
+        """
+        Test matching a CSV file into JSON lines in input order, mapping the columns by name.
+        """
+        reports = []
+        with MockTilores(entities=2, records=1, latency=0.01) as server, server.api() as api:
+            report = api.match_file(self.input, self.output, id_column='ref', concurrency=4, progress=reports.append)
+        lines = read_jsonl(self.output)
+        self.assertEqual([line['row'] for line in lines], list(range(12)))
+        self.assertEqual([line['id'] for line in lines], ['a', 'b', 'c'] * 4)
+        self.assertEqual(lines[0]['entityIDs'], ['entity-0', 'entity-1'])
+        self.assertEqual(lines[1], {'row': 1, 'id': 'b', 'entityIDs': [], 'error': 'No search parameters'})
+        self.assertEqual((report.rows, report.matched, report.errors, report.resumed), (12, 8, 4, 0))
+        self.assertEqual(reports[-1], report)
+        self.assertIsNotNone(report.latency['p50'])
+        self.assertLessEqual(report.latency['p50'], report.latency['p99'])
+
+    def test_columns(self):
+        """
+        Test mapping explicit columns onto search parameters and writing CSV.
+        """
+        output = os.path.join(self.directory.name, 'output.csv')
+        with MockTilores(entities=1, records=1) as server, server.api() as api:
+            api.match_file(self.input, output, columns={'note': 'name'})
+            with self.assertRaises(AssertionError):
+                api.match_file(self.input, output, columns={'note': 'unknown'}, resume=False)
+        with open(output, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['row', 'entity_ids', 'error'])
+        self.assertEqual(rows[1:3], [['0', 'entity-0', ''], ['1', 'entity-0', '']])
+        self.assertEqual(len(rows), 13)
+
+    def test_resume(self):
+        """
+        Test resuming an interrupted job from its checkpoint, without searching the matched rows again.
+        """
+        def interrupt(report):
+            if report.rows >= 5:
+                raise Interrupted()
+        with MockTilores(entities=1, records=1) as server, server.api() as api:
+            with self.assertRaises(Interrupted):
+                MatchJob(api, self.input, self.output, id_column='ref', concurrency=2, progress=interrupt, report_interval=0).run()
+            with open(self.output, 'ab') as f:
+                # a partial line written after the checkpoint, e.g. by a killed process
+                f.write(b'{"row": 5, "entity')
+            searches = server.requests
+            report = api.match_file(self.input, self.output, id_column='ref', concurrency=2)
+            resumed_searches = server.requests - searches
+            self.assertEqual(api.match_file(self.input, self.output, id_column='ref').rows, 12)
+            self.assertEqual(server.requests - searches, resumed_searches)
+        self.assertEqual(report.resumed, 5)
+        self.assertEqual((report.rows, report.matched, report.errors), (12, 8, 4))
+        self.assertEqual(resumed_searches, 5)
+        lines = read_jsonl(self.output)
+        self.assertEqual([line['row'] for line in lines], list(range(12)))
+        self.assertEqual([line['id'] for line in lines], ['a', 'b', 'c'] * 4)
+
+    def test_resume_failed(self):
+        """
+        Test that rows whose search failed are written with their error and searched again by the next run.
+        """
+        with MockTilores(entities=1, records=1) as server, server.api() as api:
+            search = api.search
+            calls = 0
+            def fail_once(*args):
+                nonlocal calls
+                calls += 1
+                if calls == 3:
+                    raise TimeoutError('timed out')
+                return search(*args)
+            with mock.patch.object(api, 'search', fail_once):
+                report = api.match_file(self.input, self.output, concurrency=1)
+            self.assertEqual((report.rows, report.matched, report.errors), (12, 7, 5))
+            self.assertEqual(read_jsonl(self.output)[3], {'row': 3, 'entityIDs': [], 'error': 'TimeoutError: timed out'})
+            searches = server.requests
+            report = api.match_file(self.input, self.output, concurrency=1)
+            resumed_searches = server.requests - searches
+        self.assertEqual(report.resumed, 3)
+        self.assertEqual((report.rows, report.matched, report.errors), (12, 8, 4))
+        self.assertEqual(resumed_searches, 6)
+        lines = read_jsonl(self.output)
+        self.assertEqual([line['row'] for line in lines], list(range(12)))
+        self.assertEqual(lines[3], {'row': 3, 'entityIDs': ['entity-0']})
+
+    def test_jsonl_columns(self):
+        """
+        Test that the columns of JSON lines are mapped per row, including those missing in the first row.
+        """
+        path = os.path.join(self.directory.name, 'input.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"ref": "a"}\n{"ref": "b", "First_Name": "Sophia"}\n')
+        with MockTilores(entities=1, records=1) as server, server.api() as api:
+            report = api.match_file(path, self.output, id_column='ref')
+        self.assertEqual((report.rows, report.matched, report.errors), (2, 1, 1))
+        self.assertEqual(read_jsonl(self.output)[1], {'row': 1, 'id': 'b', 'entityIDs': ['entity-0']})
+
+    def test_read_rows(self):
+        """
+        Test reading rows from JSON lines and rejecting unknown formats.
+        """
+        path = os.path.join(self.directory.name, 'input.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"name": "Sophia"}\n\n{"name": "Liam"}\n')
+        self.assertEqual(list(read_rows(path)), [{'name': 'Sophia'}, {'name': 'Liam'}])
+        with self.assertRaises(AssertionError):
+            list(read_rows('input.xlsx'))
+
+    def test_cli(self):
+        """
+        Test matching a file with the command line interface.
+        """
+        with MockTilores(entities=1, records=1) as server:
+            environ = {'TILORES_API_URL': server.api_url, 'TILORES_TOKEN_URL': server.token_url,
+                'TILORES_CLIENT_ID': 'id', 'TILORES_CLIENT_SECRET': 'secret'}
+            with mock.patch.dict(os.environ, environ), mock.patch('sys.stderr'):
+                self.assertEqual(main(['match', self.input, self.output, '-c', 'First_Name=first_name', '--concurrency', '2']), 0)
+        lines = read_jsonl(self.output)
+        self.assertEqual(len(lines), 12)
+        self.assertEqual(lines[1]['error'], 'No search parameters')
+
+if __name__ == '__main__':
+    unittest.main()
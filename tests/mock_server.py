@@ -0,0 +1,159 @@
+import gzip
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import graphql
+from tilores import TiloresAPI
+from tests.support import load_schema, executable_schema
+
+class MockTilores:
+    """
+    A local stand-in for a Tilores instance, serving a fixture schema over HTTP.
+
+    GraphQL requests are executed against the schema, including introspection.
+    Searches return `entities` synthetic entities of `records` records each,
+    whose edges chain the records. All other values are derived from the
+    field names and types, so that responses are deterministic. `latency`
+    and `token_latency` delay the responses to simulate the network.
+    gzip compressed request bodies are accepted and, with `gzip_responses`,
+    responses are gzip compressed if the client accepts it.
+
+    Usage:
+        with MockTilores(records=100) as server:
+            api = server.api()
+    """
+
+    def __init__(self, schema='schema', entities=1, records=10, latency=0.0, token_latency=0.0, expires_in=3600, gzip_responses=False):
+        self.schema = executable_schema(load_schema(schema))
+        self.entities = entities
+        self.records = records
+        self.latency = latency
+        self.token_latency = token_latency
+        self.expires_in = expires_in
+        self.gzip_responses = gzip_responses
+        self.request_encodings = []
+        self.requests = 0
+        self.token_requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    @property
+    def api_url(self):
+        return f'{self.url}/graphql'
+
+    @property
+    def token_url(self):
+        return f'{self.url}/oauth2/token'
+
+    def start(self):
+        mock = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                encoding = self.headers.get('Content-Encoding')
+                mock.request_encodings.append(encoding)
+                if encoding == 'gzip':
+                    body = gzip.decompress(body)
+                status, response = mock.handle(self.path, body)
+                content = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if mock.gzip_responses and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    content = gzip.compress(content)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='mock-tilores', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def api(self, **kwargs):
+        """Create a TiloresAPI for the server."""
+        return TiloresAPI(api_url=self.api_url, token_url=self.token_url, client_id='id', client_secret='secret', **kwargs)
+
+    def handle(self, path, body):
+        if path == '/oauth2/token':
+            with self._lock:
+                self.token_requests += 1
+                token_requests = self.token_requests
+            time.sleep(self.token_latency)
+            return 200, {'access_token': f'token-{token_requests}', 'expires_in': self.expires_in}
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        data = json.loads(body)
+        result = graphql.graphql_sync(self.schema, data['query'], variable_values=data.get('variables'), field_resolver=self.resolve)
+        return 200, result.formatted
+
+    def resolve(self, source, info, **args):
+        if isinstance(source, dict) and info.field_name in source:
+            return source[info.field_name]
+        match info.field_name:
+            case 'search':
+                return {'entities': [self.entity(f'entity-{i}') for i in range(self.entities)]}
+            case 'entity':
+                return {'entity': self.entity(args['input']['id'])}
+            case 'entityByRecord':
+                return {'entity': self.entity(f'entity-of-{args["input"]["id"]}')}
+            case 'submit':
+                return {'recordsAdded': len(args['input']['records'])}
+        return self.synthesize(info.return_type, info.field_name, source)
+
+    def entity(self, entity_id):
+        records = [{'id': f'{entity_id}-record-{i}'} for i in range(self.records)]
+        edges = [f'{a["id"]}:{b["id"]}:R{i % 3 + 1}' for i, (a, b) in enumerate(zip(records, records[1:]))]
+        hits = {record['id']: ['R1'] for record in records}
+        return {'id': entity_id, 'records': records, 'edges': edges, 'hits': hits, 'duplicates': {}}
+
+    def synthesize(self, graphql_type, name, source):
+        """Derive a value of the type from the field name and its parent."""
+        graphql_type = graphql.get_nullable_type(graphql_type)
+        seed = zlib.crc32(f'{name}:{source.get("id", "") if isinstance(source, dict) else ""}'.encode('utf-8'))
+        if isinstance(graphql_type, graphql.GraphQLList):
+            return [self.synthesize(graphql_type.of_type, name, source)]
+        if isinstance(graphql_type, graphql.GraphQLObjectType):
+            return {}
+        if isinstance(graphql_type, (graphql.GraphQLInterfaceType, graphql.GraphQLUnionType)):
+            types = self.schema.get_possible_types(graphql_type)
+            return {'__typename': types[seed % len(types)].name}
+        if isinstance(graphql_type, graphql.GraphQLEnumType):
+            return list(graphql_type.values.values())[seed % len(graphql_type.values)].value
+        match graphql_type.name:
+            case 'Int':
+                return seed % 100
+            case 'Float':
+                return (seed % 1000) / 1000
+            case 'Boolean':
+                return seed % 2 == 0
+            case 'Time' | 'DateTime':
+                return f'2024-01-{seed % 28 + 1:02d}T12:00:00Z'
+            case 'Date':
+                return f'2024-01-{seed % 28 + 1:02d}'
+            case 'ID' | 'String' | 'Any':
+                return f'{name}-{seed % 10000}'
+        return {}
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import pickle
+import unittest
+from tests.mock_server import MockTilores
+from tilores.compression import Compression
+from tilores.instrumentation import MetricsCollector
+from tilores.multiprocess import current_client
+
+def count_records(result):
+    """A post-processing function, which has to be defined at module level to be picklable."""
+    entities = result['data']['search']['entities']
+    return current_client().search_params is not None and sum(len(entity['records']) for entity in entities)
+
+def fail_on_unknown(result):
+    if result.get('errors'):
+        raise ValueError(result['errors'][0]['message'])
+    return len(result['data']['search']['entities'])
+
+class MultiprocessTest(unittest.TestCase):
+    def test_pickle(self):
+        """
+        Test that a pickled client is restored with its configuration and schema, but its own connections and token.
+        """
+        with MockTilores() as server, server.api(compression=Compression(threshold=0), hooks=MetricsCollector()) as api:
+            api.search((('id',),), {'name': 'Sophia'})
+            restored = pickle.loads(pickle.dumps(api))
+            self.assertIsNone(restored.__dict__.get('introspection'))
+            self.assertEqual((restored.api_url, restored.client_id), (api.api_url, api.client_id))
+            self.assertEqual(restored.compression.request_encoding, 'gzip')
+            self.assertIsNot(restored.session, api.session)
+            self.assertIsNone(restored.tokens.token)
+            self.assertIsNone(restored.hooks)
+            self.assertEqual(restored.search((('id',),), {'name': 'Sophia'})['data'], api.search((('id',),), {'name': 'Sophia'})['data'])
+
+            requests = server.requests
+            restored = pickle.loads(pickle.dumps(api.snapshot(introspection=True)))
+            self.assertEqual(restored.client().search_param_names, api.search_param_names)
+            self.assertEqual(server.requests, requests + 1)
+            restored.client().close()
+
+    def test_map_search(self):
+        """
+        Test searching and post-processing in worker processes, which share the schema of the parent.
+        """
+        params = [{'name': f'Sophia {i}'} for i in range(20)]
+        with MockTilores(entities=2, records=3) as server, server.api() as api:
+            results = list(api.map_search((('id',),), iter(params), processes=2, postprocess=count_records, chunksize=3))
+            # a single introspection and one request per search
+            self.assertEqual(server.requests, 1 + len(params))
+            self.assertEqual(results, [6] * len(params))
+
+            results = list(api.map_search((('id',),), [{'name': 'Sophia'}, {'unknown': 'x'}], processes=1,
+                postprocess=fail_on_unknown, return_exceptions=True))
+            self.assertEqual(results[0], 2)
+            self.assertIsInstance(results[1], ValueError)
+            with self.assertRaises(ValueError):
+                list(api.map_search((('id',),), [{'unknown': 'x'}], processes=1, postprocess=fail_on_unknown))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_fork(self):
+        """
+        Test that a forked child renews the connections of an inherited client and keeps its token, but not of closed ones.
+        """
+        with MockTilores() as server, server.api() as api:
+            api.search((('id',),), {'name': 'Sophia'})
+            token = api.access_token
+            session = api.session
+            closed = server.api()
+            closed.close()
+            closed_session = closed.session
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    session_renewed = api.session is not session and api.access_token == token and closed.session is closed_session
+                    result = api.search((('id',),), {'name': 'Sophia'})
+                    writer.send((session_renewed, len(result['data']['search']['entities'])))
+                finally:
+                    os._exit(0)
+            child = reader.recv()
+            os.waitpid(pid, 0)
+            self.assertEqual(child, (True, 1))
+            self.assertEqual(server.token_requests, 1)
+
+if __name__ == '__main__':
+    unittest.main()
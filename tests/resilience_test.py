@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from unittest import mock
+import requests
+import urllib3
+from tilores.instrumentation import Hooks
+from tilores.resilience import RetryPolicy, RateLimiter, CircuitBreaker, CircuitOpenError, NO_RETRY, is_retryable, retry_after_of
+from tests.support import fake_api
+
+class ResilienceTest(unittest.TestCase):
+    def test_retry_policy(self):
+        """
+        Test that delays are jittered, capped and overridden by Retry-After.
+        """
+        policy = RetryPolicy(backoff=1, max_backoff=3, max_retry_after=10)
+        self.assertTrue(all(0 <= policy.delay(1) <= 1 for _ in range(100)))
+        self.assertTrue(all(0 <= policy.delay(5) <= 3 for _ in range(100)))
+        self.assertEqual(policy.delay(1, retry_after=7), 7)
+        self.assertEqual(policy.delay(1, retry_after=60), 10)
+
+        response = requests.Response()
+        response.headers['Retry-After'] = '2'
+        self.assertEqual(retry_after_of(response), 2)
+        response.headers['Retry-After'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        self.assertEqual(retry_after_of(response), 0)
+        self.assertIsNone(retry_after_of(None))
+
+    def test_rate_limiter(self):
+        """
+        Test that the token bucket allows the burst and then reserves at the rate.
+        """
+        limiter = RateLimiter(rate=10, burst=2)
+        with mock.patch('tilores.resilience.time.monotonic', return_value=100.0):
+            limiter._updated = 100.0
+            self.assertEqual([limiter.reserve() for _ in range(2)], [0, 0])
+            self.assertAlmostEqual(limiter.reserve(), 0.1)
+            self.assertAlmostEqual(limiter.reserve(), 0.2)
+        with mock.patch('tilores.resilience.time.monotonic', return_value=101.0):
+            self.assertEqual(limiter.reserve(), 0)
+
+        async def acquire_all():
+            limiter = RateLimiter(rate=1000)
+            await asyncio.gather(*[limiter.acquire_async() for _ in range(1100)])
+        asyncio.run(asyncio.wait_for(acquire_all(), timeout=5))
+
+    def test_circuit_breaker(self):
+        """
+        Test that the circuit opens after consecutive failures and closes after a successful trial.
+        """
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        with mock.patch('tilores.resilience.time.monotonic', return_value=0.0):
+            breaker.allow()
+            breaker.record(False)
+            breaker.allow()
+            breaker.record(False)
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            with self.assertRaises(CircuitOpenError):
+                breaker.allow()
+        with mock.patch('tilores.resilience.time.monotonic', return_value=31.0):
+            breaker.allow()
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            with self.assertRaises(CircuitOpenError):
+                breaker.allow()
+            breaker.record(True)
+            self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gql_retry(self):
+        """
+        Test that gql retries throttled requests after the time requested by Retry-After.
+        """
+        responses = iter([(429, {}, {'Retry-After': '3'}), (503, {}), (200, {'data': {'ok': True}})])
+        api, adapter = fake_api(lambda request: next(responses))
+        with mock.patch('tilores.tilores_api.time.sleep') as sleep:
+            self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(len(adapter.requests), 4)
+        self.assertEqual(sleep.call_args_list[0].args, (3.0,))
+
+        api, adapter = fake_api(lambda request: (503, {}))
+        with self.assertRaises(requests.HTTPError):
+            api.gql('{ ok }', retry=NO_RETRY)
+        self.assertEqual(len(adapter.requests), 2)
+
+    def test_gql_circuit_breaker(self):
+        """
+        Test that gql fails fast once the circuit breaker opened.
+        """
+        api, adapter = fake_api(lambda request: (500, {}), retry=NO_RETRY, circuit_breaker=CircuitBreaker(failure_threshold=2))
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                api.gql('{ ok }')
+        with self.assertRaises(CircuitOpenError):
+            api.gql('{ ok }')
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_gql_mutation_retry(self):
+        """
+        Test that mutations are sent once on server errors and read timeouts, but retried if they were not processed.
+        """
+        mutation = 'mutation { submit(input: {records: []}) { recordsAdded } }'
+        api, adapter = fake_api(lambda request: (500, {}))
+        with mock.patch('tilores.tilores_api.time.sleep'), self.assertRaises(requests.HTTPError):
+            api.gql(mutation)
+        self.assertEqual(len(adapter.requests), 2)
+
+        def timeout(request):
+            raise requests.ReadTimeout('slow')
+        api, adapter = fake_api(timeout)
+        with mock.patch('tilores.tilores_api.time.sleep'), self.assertRaises(requests.ReadTimeout):
+            api.gql(mutation)
+        self.assertEqual(len(adapter.requests), 2)
+
+        responses = iter([(503, {}), (200, {'data': {'submit': {'recordsAdded': 0}}})])
+        api, adapter = fake_api(lambda request: next(responses))
+        with mock.patch('tilores.tilores_api.time.sleep'):
+            self.assertEqual(api.gql(mutation), {'data': {'submit': {'recordsAdded': 0}}})
+        self.assertEqual(len(adapter.requests), 3)
+
+        refused = requests.ConnectionError(urllib3.exceptions.MaxRetryError(None, '/',
+            urllib3.exceptions.NewConnectionError(None, 'refused')))
+        self.assertTrue(is_retryable(refused, idempotent=False))
+        self.assertFalse(is_retryable(requests.ConnectionError('reset'), idempotent=False))
+        self.assertTrue(is_retryable(requests.ConnectionError('reset')))
+
+        for document in ('# submit the records\n' + mutation, 'fragment F on Record { id }\nmutation { submit { ...F } }'):
+            api, adapter = fake_api(lambda request: (500, {}))
+            with mock.patch('tilores.tilores_api.time.sleep'), self.assertRaises(requests.HTTPError):
+                api.gql(document)
+            self.assertEqual(len(adapter.requests), 2)
+
+    def test_gql_circuit_breaker_trial(self):
+        """
+        Test that a half-open trial failing before the request is sent does not keep the circuit open.
+        """
+        class FailingHooks(Hooks):
+            def before_request(self, operation):
+                raise RuntimeError('hook failed')
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        api, adapter = fake_api(lambda request: (200, {'data': {'ok': True}}), circuit_breaker=breaker, hooks=FailingHooks())
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(RuntimeError):
+            api.gql('{ ok }')
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        api.hooks = None
+        self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
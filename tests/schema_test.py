@@ -0,0 +1,47 @@
+import graphql
+import tempfile
+import unittest
+from tests.support import API_URL, fake_api, load_schema, request_json, schema_handler
+
+class SchemaCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def queries(self, adapter):
+        return [request_json(r)['query'].split('{')[0].strip() for r in adapter.requests if r.url == API_URL]
+
+    def test_schema_cache(self):
+        """
+        Test that the introspection result is stored and served from disk.
+        """
+        schema = load_schema()
+        api, adapter = fake_api(schema_handler(schema), schema_cache_dir=self.directory.name)
+        self.assertIn('Record', api.schema.type_map)
+        self.assertEqual(self.queries(adapter), ['query fingerprint', 'query IntrospectionQuery'])
+
+        api, adapter = fake_api(schema_handler(schema), schema_cache_dir=self.directory.name)
+        self.assertEqual([x for x, _ in api.search_params][:2], ['first_name', 'last_name'])
+        self.assertEqual(adapter.requests, [])
+
+    def test_schema_cache_revalidation(self):
+        """
+        Test that expired entries are revalidated using the fingerprint.
+        """
+        schema = load_schema()
+        api, _ = fake_api(schema_handler(schema), schema_cache_dir=self.directory.name, schema_cache_ttl=0)
+        api.schema
+        fetched_at = api.schema_cache.load(api.api_url)['fetched_at']
+
+        api, adapter = fake_api(schema_handler(schema), schema_cache_dir=self.directory.name, schema_cache_ttl=0)
+        api.schema
+        self.assertEqual(self.queries(adapter), ['query fingerprint'])
+        self.assertGreater(api.schema_cache.load(api.api_url)['fetched_at'], fetched_at)
+
+        changed_schema = graphql.extend_schema(schema, graphql.parse('extend type Record { nickname: String }'))
+        api, adapter = fake_api(schema_handler(changed_schema), schema_cache_dir=self.directory.name, schema_cache_ttl=0)
+        self.assertIn('nickname', api.schema.get_type('Record').fields)
+        self.assertEqual(self.queries(adapter), ['query fingerprint', 'query IntrospectionQuery'])
+
+if __name__ == '__main__':
+    unittest.main()
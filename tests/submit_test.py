@@ -0,0 +1,70 @@
+import threading
+import unittest
+from unittest import mock
+from tilores.submit import chunk_records, read_jsonl
+from tests.support import fake_api, load_schema, request_json
+
+class SubmitTest(unittest.TestCase):
+    def test_chunk_records(self):
+        """
+        Test that chunks are limited by record count and JSON size.
+        """
+        records = [{'id': str(i), 'name': 'x' * 10} for i in range(10)]
+        self.assertEqual([len(c) for c in chunk_records(records, max_records=4)], [4, 4, 2])
+        self.assertEqual([len(c) for c in chunk_records(records, max_bytes=70)], [2, 2, 2, 2, 2])
+        self.assertEqual([len(c) for c in chunk_records(records, max_bytes=1)], [1] * 10)
+
+    def test_submit(self):
+        """
+        Test submitting a JSON lines file with throttled and failing chunks.
+        """
+        records = list(read_jsonl('tests/fixtures/integration.jsonl'))
+        throttled = records[0]['id']
+        invalid = records[20]['id']
+        lock = threading.Lock()
+        in_flight = 0
+        max_in_flight = 0
+        attempts = {}
+        def handler(request):
+            nonlocal in_flight, max_in_flight
+            records = request_json(request)['variables']['records']
+            first = records[0]['id']
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                attempts[first] = attempts.get(first, 0) + 1
+            threading.Event().wait(0.01)
+            with lock:
+                in_flight -= 1
+            if first == throttled and attempts[first] == 1:
+                return 429, {}
+            if first == invalid:
+                return 400, {}
+            return 200, {'data': {'submit': {'recordsAdded': len(records)}}}
+        api, _ = fake_api(handler)
+        api.schema = load_schema()
+
+        with mock.patch('tilores.submit.time.sleep'):
+            results = api.submit('tests/fixtures/integration.jsonl', max_records=10, concurrency=3)
+
+        self.assertEqual([r.index for r in results], list(range(15)))
+        self.assertEqual(sum(r.records for r in results), len(records))
+        self.assertLessEqual(max_in_flight, 3)
+        self.assertEqual([r.attempts for r in results][:2], [2, 1])
+        failed = [r for r in results if not r.ok]
+        self.assertEqual([r.index for r in failed], [2])
+        self.assertEqual(failed[0].errors[0].response.status_code, 400)
+
+    def test_submit_validation(self):
+        """
+        Test that records are validated against the RecordInput type.
+        """
+        api, _ = fake_api()
+        api.schema = load_schema()
+        with self.assertRaises(AssertionError):
+            api.submit([{'id': '1', 'does_not_exist': 'x'}])
+        with self.assertRaises(AssertionError):
+            api.submit([{'first_name': 'Sophia'}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import io
+import json
+import graphql
+import requests
+import urllib3
+from requests.adapters import BaseAdapter
+from tilores import TiloresAPI, AsyncTiloresAPI
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+API_URL = 'https://tilores.test/graphql'
+TOKEN_URL = 'https://auth.tilores.test/oauth2/token'
+
+class FakeAdapter(BaseAdapter):
+    """
+    A requests adapter answering requests with a handler instead of the network.
+
+    The handler receives the prepared request and returns a tuple of the status
+    code, the JSON body and optionally the headers. Token requests are answered
+    automatically.
+    """
+
+    def __init__(self, handler=None):
+        super().__init__()
+        self.handler = handler or (lambda request: (200, {'data': {}}))
+        self.requests = []
+        self.token_requests = 0
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        if request.url == TOKEN_URL:
+            self.token_requests += 1
+            return self.build_response(request, 200, {'access_token': f'token-{self.token_requests}', 'expires_in': 3600})
+        return self.build_response(request, *self.handler(request))
+
+    def build_response(self, request, status, body, headers=None):
+        response = requests.Response()
+        response.status_code = status
+        response.request = request
+        response.url = request.url
+        response.raw = urllib3.HTTPResponse(body=io.BytesIO(json.dumps(body).encode('utf-8')), preload_content=False)
+        response.headers.update(headers or {})
+        response.headers.setdefault('Content-Type', 'application/json')
+        return response
+
+    def close(self):
+        pass
+
+def fake_api(handler=None, **kwargs):
+    """Create a TiloresAPI which sends its requests to a FakeAdapter."""
+    adapter = FakeAdapter(handler)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    api = TiloresAPI(api_url=API_URL, token_url=TOKEN_URL, client_id='id', client_secret='secret', session=session, **kwargs)
+    return api, adapter
+
+def request_json(request):
+    """Decode the JSON body of a prepared request."""
+    return json.loads(request.body)
+
+def fake_async_api(handler=None, **kwargs):
+    """
+    Create an AsyncTiloresAPI which answers its requests with a handler.
+
+    The handler works like the one of the FakeAdapter, but receives a httpx
+    request. Token requests are answered automatically.
+    """
+    handler = handler or (lambda request: (200, {'data': {}}))
+    token_requests = []
+    def transport_handler(request):
+        if str(request.url) == TOKEN_URL:
+            token_requests.append(request)
+            return httpx.Response(200, json={'access_token': f'token-{len(token_requests)}', 'expires_in': 3600})
+        status, body = handler(request)
+        return httpx.Response(status, json=body)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(transport_handler))
+    api = AsyncTiloresAPI(api_url=API_URL, token_url=TOKEN_URL, client_id='id', client_secret='secret', client=client, **kwargs)
+    return api, token_requests
+
+def load_schema(name='schema'):
+    """Build the GraphQL schema from a fixture file."""
+    with open(f'tests/fixtures/{name}.graphql') as f:
+        return graphql.build_schema(f.read())
+
+def executable_schema(schema):
+    """Remove the incremental delivery directives, which graphql-core refuses to execute."""
+    kwargs = schema.to_kwargs()
+    kwargs['directives'] = [d for d in kwargs['directives'] if d.name not in ('defer', 'stream')]
+    return graphql.GraphQLSchema(**kwargs)
+
+def schema_handler(schema):
+    """Build a FakeAdapter handler which executes the GraphQL requests against a schema without resolvers."""
+    schema = executable_schema(schema)
+    def handler(request):
+        data = request_json(request)
+        result = graphql.graphql_sync(schema, data['query'], variable_values=data.get('variables'))
+        return 200, result.formatted
+    return handler
@@ -1,13 +1,177 @@
 import unittest
-from tilores import TiloresAPI
+from unittest import mock
+from pydantic import create_model
+from tilores import TiloresAPI, RecordInsights
+from tilores.conversion import pydantic_model_to_option_model
+from tests.mock_server import MockTilores
+from tests.support import fake_api, request_json
 
 class TiloresAPITest(unittest.TestCase):
     def test_search_query(self):
         """
-        Test the TiloresAPI search functionality.
+        Test the TiloresAPI search functionality against the mock server.
         """
-        assert True
+        with MockTilores(entities=2, records=3) as server, server.api() as api:
+            result = api.search((('id',), ('first_name',)), {'first_name': 'Sophia'})
+        entities = result['data']['search']['entities']
+        self.assertEqual([entity['id'] for entity in entities], ['entity-0', 'entity-1'])
+        self.assertEqual([record['id'] for record in entities[0]['records']], ['entity-0-record-0', 'entity-0-record-1', 'entity-0-record-2'])
+        self.assertEqual((server.token_requests, server.requests), (1, 1))
+
+    def test_session_is_reused(self):
+        """
+        Test that token and GraphQL requests share the pooled session.
+        """
+        api, adapter = fake_api(lambda request: (200, {'data': {'ok': True}}))
+        for _ in range(3):
+            self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(adapter.token_requests, 1)
+        self.assertEqual(len(adapter.requests), 4)
+        self.assertEqual(request_json(adapter.requests[-1]), {'query': '{ ok }'})
+        self.assertEqual(adapter.requests[-1].headers['Authorization'], 'Bearer token-1')
+
+    def test_timeout(self):
+        """
+        Test that the configured timeout is passed on every request.
+        """
+        api, adapter = fake_api(timeout=(1, 5))
+        with mock.patch.object(adapter, 'send', wraps=adapter.send) as send:
+            api.gql('{ ok }')
+        self.assertTrue(all(call.kwargs['timeout'] == (1, 5) for call in send.call_args_list))
+
+    def test_close(self):
+        """
+        Test that only sessions owned by the client are closed.
+        """
+        api, _ = fake_api()
+        with mock.patch.object(api.session, 'close') as close:
+            with api:
+                pass
+        close.assert_not_called()
+
+        api = TiloresAPI(api_url='', token_url='', client_id='', client_secret='', pool_maxsize=4)
+        self.assertEqual(api.session.get_adapter('https://tilores.test')._pool_maxsize, 4)
+        with mock.patch.object(api.session, 'close') as close:
+            with api:
+                pass
+        close.assert_called_once()
+
+    def test_search_batch(self):
+        """
+        Test that search_batch sends aliased searches and splits the results in input order.
+        """
+        def handler(request):
+            variables = request_json(request)['variables']
+            data = {}
+            errors = []
+            for name, params in variables.items():
+                alias = name.replace('params_', 'search_')
+                if params['name'] == 'fail':
+                    data[alias] = None
+                    errors.append({'message': 'failed', 'path': [alias]})
+                else:
+                    data[alias] = {'entities': [{'id': params['name']}]}
+            return 200, {'data': data, 'errors': errors}
+        api, adapter = fake_api(handler)
+        option_model = pydantic_model_to_option_model(create_model('Record', id=(str, ...)))
+        names = ['a', 'b', 'fail', 'c', 'd']
+        results = api.search_batch(option_model(id=True), [{'name': name} for name in names], batch_size=2)
+
+        self.assertEqual(len(adapter.requests), 4)
+        query = request_json(adapter.requests[1])['query']
+        self.assertIn('search_1: search(', query)
+        self.assertIn('$params_1: SearchParams!', query)
+        self.assertEqual(len(results), len(names))
+        for name, result in zip(names, results):
+            if name == 'fail':
+                self.assertIsNone(result['data']['search'])
+                self.assertEqual(result['errors'], [{'message': 'failed', 'path': ['search_0']}])
+            else:
+                self.assertEqual(result['data']['search']['entities'][0]['id'], name)
+                self.assertNotIn('errors', result)
+
+    def test_document_cache(self):
+        """
+        Test that documents are rendered once per selection.
+        """
+        api, adapter = fake_api(document_cache_size=2)
+        option_model = pydantic_model_to_option_model(create_model('Record', id=(str, ...), name=(str, ...)))
+        api.search(option_model(id=True), {'name': 'a'})
+        api.search(option_model(id=True, name=False), {'name': 'b'})
+        api.search(option_model(id=True, name=True), {'name': 'c'})
+        info = api.documents.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+        self.assertEqual(request_json(adapter.requests[1])['query'], request_json(adapter.requests[2])['query'])
+        self.assertIn('name', request_json(adapter.requests[3])['query'])
+
+    def test_persisted_queries(self):
+        """
+        Test that the document is only sent if the instance does not know its hash.
+        """
+        known = set()
+        def handler(request):
+            data = request_json(request)
+            sha256 = data['extensions']['persistedQuery']['sha256Hash']
+            if 'query' in data:
+                known.add(sha256)
+            elif sha256 not in known:
+                return 200, {'errors': [{'message': 'PersistedQueryNotFound'}]}
+            return 200, {'data': {'ok': True}}
+        api, adapter = fake_api(handler, persisted_queries=True)
+        self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(api.gql('{ ok }'), {'data': {'ok': True}})
+        self.assertEqual(['query' in request_json(r) for r in adapter.requests[1:]], [False, True, False])
+
+    def test_golden_records(self):
+        """
+        Test that golden records are fetched in batches of aliased entity queries and cached.
+        """
+        def handler(request):
+            data = {}
+            for name, entity_id in request_json(request)['variables'].items():
+                entity = None if entity_id == 'missing' else {'id': entity_id, 'golden': {'name': [f'name of {entity_id}']}}
+                data[name.replace('id_', 'entity_')] = {'entity': entity}
+            return 200, {'data': data}
+        api, adapter = fake_api(handler)
+        insights = RecordInsights(alias='golden').values('name')
+        entity_ids = [f'e{i}' for i in range(7)] + ['missing']
+        golden_records = api.golden_records(entity_ids, insights, batch_size=3, concurrency=2)
+
+        self.assertEqual(len(adapter.requests), 4)
+        self.assertIn('entity_2: entity(', request_json(adapter.requests[1])['query'])
+        self.assertEqual(golden_records['e5'], {'name': ['name of e5']})
+        self.assertIsNone(golden_records['missing'])
+        self.assertEqual(len(golden_records), 8)
+
+        self.assertEqual(api.golden_records(['e1', 'e8'], insights)['e8'], {'name': ['name of e8']})
+        self.assertEqual(request_json(adapter.requests[-1])['variables'], {'id_0': 'e8'})
+
+        def cached_ids():
+            yield from entity_ids
+            raise AssertionError('consumed past the first batches of cached entities')
+        golden_records = api.iter_golden_records(cached_ids(), insights, batch_size=3, concurrency=1)
+        self.assertEqual(next(golden_records), ('e0', {'name': ['name of e0']}))
+        self.assertEqual(len(adapter.requests), 5)
+
+    def test_golden_records_submit(self):
+        """
+        Test that golden records are invalidated when the chunks are submitted, not when the submission is created.
+        """
+        state = {'name': 'old'}
+        def handler(request):
+            data = request_json(request)
+            if 'submit' in data['query']:
+                # a golden record fetched while the mutation is in flight has the old state
+                self.assertEqual(api.golden_records(['e1'], insights)['e1'], {'name': ['old']})
+                state['name'] = 'new'
+                return 200, {'data': {'submit': {'recordsAdded': 1}}}
+            return 200, {'data': {'entity_0': {'entity': {'id': 'e1', 'golden': {'name': [state['name']]}}}}}
+        api, adapter = fake_api(handler)
+        insights = RecordInsights(alias='golden').values('name')
+        results = api.submit_stream([{'id': 'r1'}], validate=False)
+        self.assertEqual(api.golden_records(['e1'], insights)['e1'], {'name': ['old']})
+        self.assertEqual([result.records_added for result in results], [1])
+        self.assertEqual(api.golden_records(['e1'], insights)['e1'], {'name': ['new']})
 
 if __name__ == '__main__':
     unittest.main()
-
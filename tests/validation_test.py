@@ -0,0 +1,68 @@
+import datetime
+import unittest
+import graphql
+from tilores.schema import search_params_of
+from tilores.validation import SearchParamsValidator
+from tests.support import fake_api, load_schema, request_json
+
+class SearchParamsValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.search_params = search_params_of(load_schema())
+
+    def test_validate(self):
+        """
+        Test that unknown fields and invalid values raise and values are coerced to their type.
+        """
+        validate = SearchParamsValidator(self.search_params, normalize=False)
+        self.assertEqual(validate({'first_name': ' Sophia ', 'zip': 10115, 'city': None}), {'first_name': ' Sophia ', 'zip': '10115'})
+        with self.assertRaises(AssertionError):
+            validate({'field_does_not_exist': 'Sophia'})
+        with self.assertRaises(AssertionError):
+            validate({'first_name': ['Sophia']})
+
+    def test_normalize(self):
+        """
+        Test that strings are trimmed, Unicode normalized and dates formatted as ISO 8601.
+        """
+        validate = SearchParamsValidator(self.search_params, date_fields=['dob', 'birthday'])
+        self.assertEqual(validate({
+            'first_name': '  Sophia   Marie ',
+            'last_name': 'Müller',
+            'dob': '15.04.1990',
+            'birthday': datetime.date(1990, 4, 15),
+            'city': '   ',
+        }), {'first_name': 'Sophia Marie', 'last_name': 'Müller', 'dob': '1990-04-15', 'birthday': '1990-04-15'})
+        self.assertEqual(validate.key({'last_name': 'Müller ', 'first_name': 'Sophia'}), (('first_name', 'Sophia'), ('last_name', 'Müller')))
+        with self.assertRaises(AssertionError):
+            validate({'dob': 'yesterday'})
+
+    def test_compiled_types(self):
+        """
+        Test the coercion of non-null, list, enum and input object types.
+        """
+        sort_criteria = load_schema('complex_schema').get_type('SortCriteria')
+        validate = SearchParamsValidator([('sort', graphql.GraphQLList(graphql.GraphQLNonNull(sort_criteria))), ('limit', graphql.GraphQLInt)])
+        self.assertEqual(validate({'sort': {'field': ' name ', 'direction': 'ASC'}, 'limit': '10'}),
+            {'sort': [{'field': 'name', 'direction': 'ASC'}], 'limit': 10})
+        with self.assertRaises(AssertionError):
+            validate({'sort': [{'field': 'name', 'direction': 'UP'}]})
+        with self.assertRaises(AssertionError):
+            validate({'sort': [{'direction': 'ASC'}]})
+        with self.assertRaisesRegex(AssertionError, "'sort'"):
+            validate({'sort': 'name'})
+        with self.assertRaises(AssertionError):
+            validate({'limit': 1.5})
+
+    def test_search(self):
+        """
+        Test that searches send the normalized parameters if enabled.
+        """
+        api, adapter = fake_api(validate_search_params=True)
+        api.schema = load_schema()
+        api.search((('id',),), {'first_name': ' Sophia '})
+        self.assertEqual(request_json(adapter.requests[-1])['variables'], {'params': {'first_name': 'Sophia'}})
+        with self.assertRaises(AssertionError):
+            api.search((('id',),), {'field_does_not_exist': 'Sophia'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,28 @@
-from .tilores_api import TiloresAPI
-from .record_insights import RecordInsights
+from typing import TYPE_CHECKING
+import importlib
 
+__all__ = ['TiloresAPI', 'AsyncTiloresAPI', 'RecordInsights']
+
+# The public classes are imported on first access, so that `import tilores`
+# does not load requests, httpx, graphql-core or pydantic up front.
+_LAZY_ATTRIBUTES = {
+    'TiloresAPI': 'tilores.tilores_api',
+    'AsyncTiloresAPI': 'tilores.async_tilores_api',
+    'RecordInsights': 'tilores.record_insights',
+}
+
+if TYPE_CHECKING:
+    from .tilores_api import TiloresAPI
+    from .async_tilores_api import AsyncTiloresAPI
+    from .record_insights import RecordInsights
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,3 @@
+from tilores.cli import main
+
+raise SystemExit(main())
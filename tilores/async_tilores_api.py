@@ -0,0 +1,407 @@
+import asyncio
+import importlib.util
+import time
+import os
+from tilores.operations import DocumentCache, split_batch_result, document_hash, is_persisted_query_error, is_mutation, operation_name_of
+from tilores.schema import search_params_of, record_params_of, record_selection_of, records_definition_of
+from tilores.codec import json_loads, json_dumps, GraphQLResponseError
+from tilores.conversion import selection_of
+from tilores.tilores_api import JSON_HEADERS
+from tilores.instrumentation import Hooks, hooks_of
+from tilores.compression import Compression
+from tilores.resilience import RetryPolicy, RateLimiter, CircuitBreaker, UNPROCESSED_STATUS_CODES, is_retryable, retry_after_of
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+class AsyncTiloresAPI:
+    """
+    An asyncio API client to interact with a Tilores instance.
+
+    It offers the same methods as `TiloresAPI`, but all of them, including the
+    schema derived ones, are coroutines. Requests are sent through a pooled
+    httpx client, which uses HTTP/2 if the `h2` package is installed.
+
+    Requires the `async` extra: pip install tilores-sdk[async]
+    """
+
+    def __init__(self,
+        *,
+        api_url: str,
+        token_url: str,
+        client_id: str,
+        client_secret: str,
+        scope: list[str] = None,
+        client: 'httpx.AsyncClient' = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        http2: bool = None,
+        timeout: float | tuple[float, float] = None,
+        document_cache_size: int = 128,
+        persisted_queries: bool = False,
+        json_backend: str = None,
+        retry: RetryPolicy = None,
+        rate_limiter: RateLimiter = None,
+        circuit_breaker: CircuitBreaker = None,
+        hooks: Hooks | list[Hooks] = None,
+        validate_search_params: bool = False,
+        compression: Compression = None
+        ):
+        """
+        Args:
+            client: An optional httpx client to use, a pooled client is created if omitted.
+            max_connections: The maximum number of concurrent connections, ignored if a client is provided.
+            max_keepalive_connections: The maximum number of idle connections kept alive, ignored if a client is provided.
+            http2: Whether to use HTTP/2, by default it is used if available. Ignored if a client is provided.
+            timeout: The timeout in seconds applied to every request, either as a single value or a (connect, read) tuple.
+            document_cache_size: The maximum number of rendered documents to keep, see `DocumentCache`.
+            persisted_queries: Whether to send automatic persisted queries, see `TiloresAPI`.
+            json_backend: The JSON library to encode requests and decode responses with, see `TiloresAPI`.
+            retry: The RetryPolicy for throttled and failed requests, see `TiloresAPI`.
+            rate_limiter: An optional RateLimiter, it may be shared with other clients, including synchronous ones.
+            circuit_breaker: An optional CircuitBreaker to fail fast while the instance is unhealthy.
+            hooks: Optional instrumentation Hooks, see `TiloresAPI`.
+            validate_search_params: Whether to validate and normalize the search parameters, see `TiloresAPI`.
+            compression: An optional Compression for the request and response bodies, see `TiloresAPI`.
+        """
+        if httpx is None:
+            raise ImportError('AsyncTiloresAPI requires httpx, install it using: pip install tilores-sdk[async]')
+        self.api_url = api_url
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope or ["tilores/mutation.submit", "tilores/query.search", "tilores/query.entity"]
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+            timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.timeout = timeout
+        self._owns_client = client is None
+        if client is None:
+            if http2 is None:
+                http2 = importlib.util.find_spec('h2') is not None
+            client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+                timeout=timeout,
+            )
+        self.client = client
+        self.documents = DocumentCache(maxsize=document_cache_size)
+        self.persisted_queries = persisted_queries
+        self.json_loads = json_loads(json_backend)
+        self.json_dumps = json_dumps(json_backend)
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.hooks = hooks_of(hooks)
+        self.validate_search_params = validate_search_params
+        self.compression = compression
+        self._search_params_validator = None
+        self._arrow_adapters = {}
+        self._access_token = None
+        self._access_token_expires_at = None
+        self._access_token_lock = asyncio.Lock()
+        self._schema = None
+        self._schema_lock = asyncio.Lock()
+
+    @classmethod
+    def from_environ(cls, **kwargs):
+        return cls(
+            api_url=os.environ['TILORES_API_URL'],
+            token_url=os.environ['TILORES_TOKEN_URL'],
+            client_id=os.environ['TILORES_CLIENT_ID'],
+            client_secret=os.environ['TILORES_CLIENT_SECRET'],
+            **kwargs
+        )
+
+    async def close(self):
+        """Close the pooled connections, unless the client was provided by the caller."""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def fetch_access_token(self):
+        if self.hooks is None:
+            return await self._fetch_access_token()
+        started = time.perf_counter()
+        try:
+            token = await self._fetch_access_token()
+        except Exception as e:
+            self.hooks.on_token_refresh(time.perf_counter() - started, e)
+            raise
+        self.hooks.on_token_refresh(time.perf_counter() - started)
+        return token
+
+    async def _fetch_access_token(self):
+        response = await self.client.post(
+            self.token_url,
+            auth=(self.client_id, self.client_secret),
+            data={'grant_type': 'client_credentials', 'scope': ' '.join(self.scope)},
+        )
+        response.raise_for_status()
+        data = response.json()
+        return (data['access_token'], data['expires_in'])
+
+    async def access_token(self):
+        """Get the access token, refreshing it if necessary."""
+        async with self._access_token_lock:
+            now = int(time.time())
+            if self._access_token_expires_at and self._access_token_expires_at > now:
+                return self._access_token
+            access_token, expires_in = await self.fetch_access_token()
+            self._access_token = access_token
+            self._access_token_expires_at = now + expires_in
+            return self._access_token
+
+    def invalidate_access_token(self, access_token):
+        """Mark the access token as expired, e.g. after it was rejected, unless it was already replaced."""
+        if self._access_token == access_token:
+            self._access_token_expires_at = None
+
+    async def schema(self):
+        async with self._schema_lock:
+            if self._schema is None:
+                from graphql import build_client_schema
+                from tilores.schema import INTROSPECTION_QUERY
+                result = await self.gql(INTROSPECTION_QUERY)
+                self._schema = build_client_schema(result['data'])
+            return self._schema
+
+    async def gql(self, query, variables=None, retry=None):
+        """Perform a GraphQL query against the Tilores instance, see `TiloresAPI.gql`."""
+        idempotent = not is_mutation(query)
+        data = {'query': query}
+        if variables is not None:
+            data['variables'] = variables
+        if not self.persisted_queries:
+            return await self.post_gql(data, retry=retry, idempotent=idempotent)
+        data['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': document_hash(query)}}
+        del data['query']
+        result = await self.post_gql(data, retry=retry, idempotent=idempotent)
+        if is_persisted_query_error(result):
+            data['query'] = query
+            result = await self.post_gql(data, retry=retry, idempotent=idempotent)
+        return result
+
+    async def post_gql(self, data, retry=None, idempotent=None):
+        """
+        Post the GraphQL request body to the Tilores instance.
+
+        A request rejected with 401 Unauthorized is retried once with a new access token.
+        Throttled and failed requests are retried according to the retry policy, see `TiloresAPI.send_gql`.
+        """
+        retry = retry or self.retry
+        if idempotent is None:
+            idempotent = 'query' not in data or not is_mutation(data['query'])
+        status_codes = retry.status_codes if idempotent else retry.status_codes & UNPROCESSED_STATUS_CODES
+        hooks = self.hooks
+        circuit_breaker = self.circuit_breaker
+        if hooks is not None:
+            operation = operation_name_of(data['query']) if 'query' in data else 'gql'
+        body = self.json_dumps(data)
+        body_size = len(body)
+        if self.compression is None:
+            headers = JSON_HEADERS
+        else:
+            body, headers = self.compression.encode(body, client='httpx')
+        attempt = 0
+        reauthenticated = False
+        while True:
+            access_token = await self.access_token()
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            if circuit_breaker is not None:
+                circuit_breaker.allow()
+            try:
+                if hooks is not None:
+                    context = hooks.before_request(operation)
+                    started = time.perf_counter()
+                response = await self.client.post(
+                    self.api_url,
+                    headers={"Authorization": f"Bearer {access_token}", **headers},
+                    content=body,
+                )
+            except httpx.TransportError as e:
+                if circuit_breaker is not None:
+                    circuit_breaker.record(False)
+                if hooks is not None:
+                    hooks.after_request(operation, context, time.perf_counter() - started, error=e)
+                if attempt >= retry.max_retries or not is_retryable(e, status_codes, idempotent):
+                    raise
+                attempt += 1
+                delay = retry.delay(attempt)
+                if hooks is not None:
+                    hooks.on_retry(operation, attempt, delay, error=e)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # the request was not sent, e.g. a hook raised or the task was cancelled
+                if circuit_breaker is not None:
+                    circuit_breaker.release()
+                raise
+            if circuit_breaker is not None:
+                circuit_breaker.record(response.status_code < 500)
+            if hooks is not None:
+                response_encoding = response.headers.get('Content-Encoding')
+                # the bytes read from the connection, before decompression
+                response_bytes = response.num_bytes_downloaded if response_encoding else len(response.content)
+                hooks.after_request(operation, context, time.perf_counter() - started, len(response.request.content),
+                    response_bytes, response.status_code)
+                if 'Content-Encoding' in headers:
+                    hooks.on_compression(operation, 'request', headers['Content-Encoding'], body_size, len(body))
+                if response_encoding:
+                    hooks.on_compression(operation, 'response', response_encoding, len(response.content), response_bytes)
+            if response.status_code == 401 and not reauthenticated:
+                reauthenticated = True
+                self.invalidate_access_token(access_token)
+                continue
+            if response.status_code in status_codes and attempt < retry.max_retries:
+                attempt += 1
+                delay = retry.delay(attempt, retry_after_of(response))
+                if hooks is not None:
+                    hooks.on_retry(operation, attempt, delay, status=response.status_code)
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            return self.json_loads(response.content)
+
+    async def search_params(self):
+        """Get a list of tuples of search parameter names and types for the search query."""
+        return search_params_of(await self.schema())
+
+    async def search_param_names(self):
+        """Get a list of search parameter names for the search query."""
+        return [x for (x, _) in await self.search_params()]
+
+    async def search_params_validator(self):
+        """Get the SearchParamsValidator compiled from the SearchParams type, see `TiloresAPI`."""
+        if self._search_params_validator is None:
+            from tilores.validation import SearchParamsValidator
+            self._search_params_validator = SearchParamsValidator(await self.search_params())
+        return self._search_params_validator
+
+    async def records_definition(self):
+        """Returns the field definition for the records field."""
+        return records_definition_of(await self.schema())
+
+    async def record_selection(self):
+        """Get the selection of all record fields, to search with instead of an option model."""
+        return record_selection_of(await self.schema())
+
+    async def record_params(self):
+        """Get a list of tuples of field names and their type for the RecordInput-type."""
+        return record_params_of(await self.schema())
+
+    async def record_param_names(self):
+        """Get a list of search parameter names for the search query."""
+        return [x for (x, _) in await self.record_params()]
+
+    async def search(self, recordFieldsToQuery, searchParams):
+        """
+        Perform a search query with the given parameters.
+
+        See also: TiloresAPI.search
+        """
+        if self.validate_search_params:
+            searchParams = (await self.search_params_validator())(searchParams)
+        query = self.documents.get('search', selection_of(recordFieldsToQuery))
+        return await self.gql(query, variables={'params': searchParams})
+
+    async def search_arrow(self, recordFieldsToQuery, searchParams):
+        """
+        Perform a search query and flatten the records of all entities into an Arrow table.
+
+        See also: TiloresAPI.search_arrow
+        """
+        result = await self.search(recordFieldsToQuery, searchParams)
+        if result.get('errors'):
+            raise GraphQLResponseError(result['errors'])
+        selection = selection_of(recordFieldsToQuery)
+        if selection not in self._arrow_adapters:
+            from tilores.columnar import ArrowAdapter
+            self._arrow_adapters[selection] = ArrowAdapter(await self.schema(), selection)
+        return self._arrow_adapters[selection].table(result['data']['search']['entities'])
+
+    async def search_many(self, recordFieldsToQuery, searchParamsIter, concurrency=10, return_exceptions=False):
+        """
+        Perform many search queries concurrently and yield the results as they complete.
+
+        At most `concurrency` searches are in flight at any time and the search
+        parameters are consumed lazily, so that large or endless (async) iterables
+        can be processed.
+
+        Args:
+            recordFieldsToQuery: The record fields to query, see `search`.
+            searchParamsIter: An iterable or async iterable of search parameters.
+            concurrency: The maximum number of searches in flight.
+            return_exceptions: Whether to yield failed searches with the exception as result instead of raising it.
+
+        Yields:
+            Tuples of the search parameters and the search result.
+        """
+        assert concurrency > 0, f'Concurrency must be positive, got: {concurrency!r}'
+        if hasattr(searchParamsIter, '__aiter__'):
+            params_iter = searchParamsIter.__aiter__()
+            next_params = params_iter.__anext__
+        else:
+            params_iter = iter(searchParamsIter)
+            async def next_params():
+                try:
+                    return next(params_iter)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        pending = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        params = await next_params()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.ensure_future(self.search(recordFieldsToQuery, params))] = params
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    params = pending.pop(task)
+                    if task.exception() is not None and not return_exceptions:
+                        raise task.exception()
+                    yield params, task.exception() or task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def search_batch(self, recordFieldsToQuery, searchParamsList, batch_size=50):
+        """
+        Perform many search queries with as few requests as possible.
+
+        See also: TiloresAPI.search_batch
+        """
+        assert batch_size > 0, f'Batch size must be positive, got: {batch_size!r}'
+        selection = selection_of(recordFieldsToQuery)
+        searchParamsList = list(searchParamsList)
+        if self.validate_search_params:
+            searchParamsList = list((await self.search_params_validator()).validate_many(searchParamsList))
+        results = []
+        for start in range(0, len(searchParamsList), batch_size):
+            batch = searchParamsList[start:start + batch_size]
+            query = self.documents.get('search_batch', selection, len(batch))
+            result = await self.gql(query, variables={f'params_{i}': params for i, params in enumerate(batch)})
+            results.extend(split_batch_result(result, len(batch)))
+        return results
+
+    async def entity_edges(self, entityID):
+        """
+        Searches for the edges of a single entity.
+        """
+        query = self.documents.get('entity_edges')
+        return await self.gql(query, variables={'entityID': entityID})
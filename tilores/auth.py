@@ -0,0 +1,177 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class TokenStore:
+    """
+    The interface to share access tokens, e.g. between processes.
+
+    The default implementation does not store anything.
+    """
+
+    def get(self, key):
+        """Get the stored tuple of access token and its expiry timestamp, or None."""
+        return None
+
+    def set(self, key, access_token, expires_at):
+        """Store the access token and its expiry timestamp."""
+        pass
+
+    @contextmanager
+    def lock(self, key):
+        """Lock the key so that only one process refreshes the token at a time."""
+        yield
+
+class FileTokenStore(TokenStore):
+    """
+    Shares the access tokens between processes on the same machine through files.
+
+    The files are only readable by the current user and refreshing is guarded
+    by a file lock where supported.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f'{key}.token')
+
+    def get(self, key):
+        try:
+            with open(self.path_for(key), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return (data['access_token'], data['expires_at'])
+
+    def set(self, key, access_token, expires_at):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path_for(key)}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'access_token': access_token, 'expires_at': expires_at}, f)
+        os.replace(tmp_path, self.path_for(key))
+
+    @contextmanager
+    def lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(f'{self.path_for(key)}.lock', os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+class TokenManager:
+    """
+    Provides access tokens to any number of threads, refreshing them before they expire.
+
+    Only one thread refreshes an expired token while the others wait for its
+    result (single-flight). Tokens are considered expired `refresh_skew`
+    seconds before their actual expiry, so that requests started just before
+    the expiry still succeed. With `background_refresh` a daemon thread
+    refreshes the token another `refresh_skew` seconds earlier, so that
+    requests never wait for a refresh.
+    """
+
+    def __init__(self, fetch, *, refresh_skew=60, background_refresh=False, store=None, key=None):
+        """
+        Args:
+            fetch: A function returning a new tuple of access token and its lifetime in seconds.
+            refresh_skew: The seconds before the expiry at which a token is refreshed.
+            background_refresh: Whether to refresh the token in a background thread before it expires.
+            store: An optional TokenStore to share the tokens through, e.g. a FileTokenStore.
+            key: The key to share the tokens under, required if a store is provided.
+        """
+        assert store is None or key is not None, 'A key is required to share tokens through a store'
+        self.fetch = fetch
+        self.refresh_skew = refresh_skew
+        self.store = store or TokenStore()
+        self.key = key
+        self.token = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if background_refresh:
+            self._thread = threading.Thread(target=self._refresh_loop, name='tilores-token-refresh', daemon=True)
+            self._thread.start()
+
+    @property
+    def access_token(self):
+        return self.token[0] if self.token else None
+
+    @property
+    def expires_at(self):
+        return self.token[1] if self.token else None
+
+    @staticmethod
+    def key_for(token_url, client_id, scope):
+        """Derive the key to share tokens between clients with the same credentials and scope."""
+        return hashlib.sha256(f'{token_url}\n{client_id}\n{" ".join(sorted(scope))}'.encode('utf-8')).hexdigest()
+
+    def is_fresh(self, expires_at, skew=None):
+        return expires_at is not None and expires_at - (self.refresh_skew if skew is None else skew) > time.time()
+
+    def get(self):
+        """Get a valid access token, refreshing it if necessary."""
+        token = self.token
+        if token is not None and self.is_fresh(token[1]):
+            return token[0]
+        return self.refresh()
+
+    def invalidate(self, access_token):
+        """Mark the access token as expired, e.g. after it was rejected, unless it was already replaced."""
+        with self._lock:
+            if self.access_token == access_token:
+                self.token = (access_token, None)
+
+    def refresh(self, skew=None):
+        """Refresh the access token unless another thread or process already did."""
+        with self._lock:
+            if self.access_token is not None and self.is_fresh(self.expires_at, skew):
+                return self.access_token
+            with self.store.lock(self.key):
+                stored = self.store.get(self.key)
+                if stored is not None and stored[0] != self.access_token and self.is_fresh(stored[1], skew):
+                    self.token = tuple(stored)
+                    return self.access_token
+                now = time.time()
+                access_token, expires_in = self.fetch()
+                self.token = (access_token, now + expires_in)
+                self.store.set(self.key, access_token, now + expires_in)
+                return access_token
+
+    def _refresh_loop(self):
+        retry_delay = 1
+        skew = 2 * self.refresh_skew
+        while not self._stop.is_set():
+            delay = 0
+            if self.expires_at is not None:
+                delay = max(0, self.expires_at - skew - time.time())
+            if self._stop.wait(delay):
+                return
+            try:
+                refreshed_at = time.time()
+                self.refresh(skew=skew)
+                # never refresh more often than every half token lifetime
+                skew = min(2 * self.refresh_skew, (self.expires_at - refreshed_at) / 2)
+                retry_delay = 1
+            except Exception:
+                self._stop.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, 60)
+
+    def close(self):
+        """Stop the background refresh."""
+        self._stop.set()
@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import json
+import threading
+import time
+
+class CacheBackend:
+    """
+    The interface of a shared cache backend, e.g. to share results between processes.
+
+    Values are JSON serializable search results.
+    """
+
+    def get(self, key):
+        """Get the value for the key or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """Store the value for at most `ttl` seconds."""
+        raise NotImplementedError
+
+    def delete(self, keys):
+        """Delete the values of the keys."""
+        raise NotImplementedError
+
+class RedisCacheBackend(CacheBackend):
+    """A CacheBackend storing the results as JSON in Redis, using a client like redis.Redis."""
+
+    def __init__(self, client, prefix='tilores:search:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value, separators=(',', ':')), ex=max(1, int(ttl)))
+
+    def delete(self, keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+class ResultCache:
+    """
+    An in-memory LRU cache for search results with TTL and entity-aware invalidation.
+
+    Concurrent lookups of the same key are coalesced, so that only one of them
+    performs the search while the others wait for its result. Results with
+    errors are not cached. Cached results are shared, treat them as read-only.
+
+    Submitting records invalidates the cached results that contain any of the
+    submitted record IDs or whose search parameter values appear in any of the
+    submitted records. As records can be linked by any rule, this does not
+    catch all affected searches, use `invalidate_on_submit='all'` or a short
+    TTL if stale results are not acceptable. Invalidations only reach the
+    optional shared backend for keys known to this process.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, backend=None, invalidate_on_submit='entities'):
+        """
+        Args:
+            maxsize: The maximum number of results kept in memory.
+            ttl: The time in seconds a result is served from the cache.
+            backend: An optional shared CacheBackend consulted on memory misses.
+            invalidate_on_submit: Either 'entities' to invalidate the affected results or 'all' to clear the cache on submit.
+        """
+        assert invalidate_on_submit in ('entities', 'all'), f'Unknown invalidation policy: {invalidate_on_submit!r}'
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.invalidate_on_submit = invalidate_on_submit
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._index = {}
+        self._in_flight = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(selection, searchParams):
+        """Derive the cache key from the selection of record fields and the (serializable) search parameters."""
+        return hashlib.sha256(json.dumps([selection, searchParams], sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()
+
+    def cache_info(self):
+        """The hits, misses and current size of the cache."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'in_flight': len(self._in_flight)}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                with self._lock:
+                    self.hits += 1
+                return value
+        return None
+
+    def get_or_compute(self, key, compute, searchParams=None):
+        """
+        Get the cached result for the key or compute it, waiting for a concurrent computation of the same key.
+
+        Args:
+            key: The cache key, see `key_for`.
+            compute: A function performing the search.
+            searchParams: The search parameters to index the result by for invalidation.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            generation = self._generation
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+            # results computed while records were submitted might already be stale
+            if not value.get('errors') and generation == self._generation:
+                self.set(key, value, searchParams)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def set(self, key, value, searchParams=None):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, self._index_terms(value, searchParams))
+            for term in self._entries[key][2]:
+                self._index.setdefault(term, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            keys = self._index.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[term]
+
+    @staticmethod
+    def _index_terms(value, searchParams):
+        terms = set()
+        for param in (searchParams or {}).values():
+            if param is not None:
+                terms.add(('value', str(param).casefold()))
+        entities = ((value.get('data') or {}).get('search') or {}).get('entities') or []
+        for entity in entities:
+            terms.add(('entity', entity.get('id')))
+            for record in entity.get('records') or []:
+                if 'id' in record:
+                    terms.add(('record', record['id']))
+        return frozenset(terms)
+
+    def invalidate(self, terms):
+        """Invalidate all results indexed by any of the terms."""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for term in terms:
+                keys |= self._index.get(term, set())
+            for key in keys:
+                self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(list(keys))
+
+    def invalidate_entities(self, entity_ids):
+        """Invalidate all results containing any of the entities."""
+        self.invalidate([('entity', entity_id) for entity_id in entity_ids])
+
+    def invalidate_submitted(self, records):
+        """Invalidate the results affected by submitting the records, see ResultCache."""
+        if self.invalidate_on_submit == 'all':
+            self.clear()
+            return
+        terms = []
+        for record in records:
+            terms.append(('record', record.get('id')))
+            terms.extend(('value', str(value).casefold()) for value in record.values() if value is not None)
+        self.invalidate(terms)
+
+    def clear(self):
+        """Remove all results from memory. The shared backend relies on the TTL."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._index.clear()
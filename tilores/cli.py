@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+
+def codegen(args):
+    """Generate the static models module, see ModuleGenerator."""
+    from tilores.codegen import ModuleGenerator, load_schema
+    if args.schema:
+        generator = ModuleGenerator(load_schema(args.schema), source=os.path.basename(args.schema))
+    else:
+        from tilores import TiloresAPI
+        with TiloresAPI.from_environ() as api:
+            generator = ModuleGenerator(api.schema, source=api.api_url)
+    source = generator.generate()
+    if args.output is None or args.output == '-':
+        sys.stdout.write(source)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(source)
+    return 0
+
+def column_of(value):
+    column, separator, param = value.partition('=')
+    if not separator or not column or not param:
+        raise argparse.ArgumentTypeError(f'expected COLUMN=PARAM, got: {value!r}')
+    return column, param
+
+def match(args):
+    """Match the rows of a file against the instance, see MatchJob."""
+    from tilores import TiloresAPI
+    def progress(report):
+        print(report, file=sys.stderr, flush=True)
+    with TiloresAPI.from_environ() as api:
+        report = api.match_file(args.input, args.output, columns=dict(args.column) if args.column else None,
+            id_column=args.id_column, input_format=args.format, concurrency=args.concurrency,
+            checkpoint_every=args.checkpoint_every, resume=not args.restart, progress=progress,
+            report_interval=args.report_interval)
+    if report.resumed:
+        print(f'Resumed after {report.resumed} rows', file=sys.stderr)
+    return 0
+
+def parser_of():
+    parser = argparse.ArgumentParser(prog='tilores', description='Tools to develop with the Tilores entity resolution database.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('codegen', help='generate a module with static pydantic models for the schema',
+        description='Generate a Python module with static pydantic models, option models and selections for the schema.')
+    command.add_argument('--schema', help='a .graphql schema or .json introspection result, by default the schema of the '
+        'instance configured by the TILORES_API_URL, TILORES_TOKEN_URL, TILORES_CLIENT_ID and TILORES_CLIENT_SECRET environment variables')
+    command.add_argument('-o', '--output', help='the file to write the module to, by default stdout')
+    command.set_defaults(run=codegen)
+
+    command = commands.add_parser('match', help='match the rows of a file and write the matching entity IDs',
+        description='Search for each row of a CSV, JSON lines or Parquet file and write the matching entity IDs in input order, '
+        'as JSON lines or, if the output ends with .csv, CSV. The progress is checkpointed and an interrupted job resumes. '
+        'The instance is configured by the TILORES_API_URL, TILORES_TOKEN_URL, TILORES_CLIENT_ID and TILORES_CLIENT_SECRET environment variables.')
+    command.add_argument('input', help='the .csv, .jsonl or .parquet file with the rows to match')
+    command.add_argument('output', help='the .jsonl or .csv file to write the results to')
+    command.add_argument('--format', choices=('csv', 'jsonl', 'parquet'), help='the input format, by default derived from the extension')
+    command.add_argument('-c', '--column', action='append', type=column_of, metavar='COLUMN=PARAM',
+        help='map an input column onto a search parameter, by default columns named like search parameters are used')
+    command.add_argument('--id-column', help='an input column to identify the rows by in the output')
+    command.add_argument('--concurrency', type=int, default=8, help='the maximum number of searches in flight (default: %(default)s)')
+    command.add_argument('--checkpoint-every', type=int, default=1000, help='the rows between two checkpoints (default: %(default)s)')
+    command.add_argument('--report-interval', type=float, default=10.0, help='the seconds between two progress reports (default: %(default)s)')
+    command.add_argument('--restart', action='store_true', help='ignore the checkpoint of a previous run and start over')
+    command.set_defaults(run=match)
+    return parser
+
+def main(argv=None):
+    """The entry point of the `tilores` command."""
+    args = parser_of().parse_args(argv)
+    return args.run(args)
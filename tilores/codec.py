@@ -0,0 +1,146 @@
+import enum
+import json
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+class GraphQLResponseError(Exception):
+    """Raised for GraphQL errors in responses that are not returned as a whole, e.g. streamed ones."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(str(error.get('message', error)) for error in errors))
+        self.errors = errors
+
+def json_loads(backend=None):
+    """
+    Get a function decoding JSON from bytes or str.
+
+    Args:
+        backend: Either 'orjson', 'msgspec' or 'json'. By default the fastest installed one is used.
+    """
+    if backend is None:
+        backend = 'orjson' if orjson is not None else 'msgspec' if msgspec is not None else 'json'
+    match backend:
+        case 'orjson':
+            assert orjson is not None, 'The orjson JSON backend requires orjson to be installed'
+            return orjson.loads
+        case 'msgspec':
+            assert msgspec is not None, 'The msgspec JSON backend requires msgspec to be installed'
+            return msgspec.json.Decoder().decode
+        case 'json':
+            return json.loads
+        case _:
+            raise NotImplementedError(f'Unknown JSON backend: {backend!r}')
+
+def json_default(value):
+    """
+    Convert the values the JSON libraries cannot encode natively.
+
+    Pydantic models are dumped in JSON mode, with orjson directly to a JSON
+    fragment. Dates and times become ISO 8601 strings, like the Date, Time
+    and DateTime scalars of the schema expect.
+    """
+    # values can only be instances of modules that were imported, checking them does not import them
+    pydantic = sys.modules.get('pydantic')
+    if pydantic is not None and isinstance(value, pydantic.BaseModel):
+        if _orjson_fragment is not None:
+            return _orjson_fragment(value.model_dump_json())
+        return value.model_dump(mode='json')
+    datetime = sys.modules.get('datetime')
+    if datetime is not None and isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    decimal = sys.modules.get('decimal')
+    if decimal is not None and isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+_orjson_fragment = getattr(orjson, 'Fragment', None)
+
+def json_dumps(backend=None):
+    """
+    Get a function encoding a value, e.g. GraphQL variables, as compact UTF-8 JSON bytes in a single pass.
+
+    Pydantic models, dates and times and other values are converted while
+    encoding, see `json_default`.
+
+    Args:
+        backend: Either 'orjson', 'msgspec' or 'json'. By default the fastest installed one is used.
+    """
+    if backend is None:
+        backend = 'orjson' if orjson is not None else 'msgspec' if msgspec is not None else 'json'
+    match backend:
+        case 'orjson':
+            assert orjson is not None, 'The orjson JSON backend requires orjson to be installed'
+            return lambda value: orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        case 'msgspec':
+            assert msgspec is not None, 'The msgspec JSON backend requires msgspec to be installed'
+            return msgspec.json.Encoder(enc_hook=json_default).encode
+        case 'json':
+            encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False, default=json_default)
+            return lambda value: encoder.encode(value).encode('utf-8')
+        case _:
+            raise NotImplementedError(f'Unknown JSON backend: {backend!r}')
+
+def iter_items(fp, path, id_path=None, model=None):
+    """
+    Incrementally parse a GraphQL response and yield the items of the list at `path` one at a time.
+
+    Only a single item is held in memory at any time. GraphQL errors in the
+    response are raised as GraphQLResponseError once all items were yielded.
+
+    Args:
+        fp: A binary file-like object with the response body.
+        path: The dot separated path to the list, e.g. 'data.search.entities'. An 'item' segment
+            iterates nested lists, e.g. 'data.search.entities.item.records'.
+        id_path: An optional path of a value to yield together with each item, e.g.
+            'data.search.entities.item.id'. The value must precede the items in the response.
+        model: An optional pydantic model or callable to convert each item with.
+
+    Yields:
+        The items, or tuples of the most recent `id_path` value and the item if `id_path` is given.
+    """
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError('Streaming requires ijson, install it using: pip install tilores-sdk[streaming]') from None
+    if model is not None and hasattr(model, 'model_validate'):
+        model = model.model_validate
+    item_prefix = f'{path}.item'
+    errors = []
+    builder = None
+    builder_prefix = None
+    current_id = None
+    for prefix, event, value in ijson.parse(fp, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == builder_prefix and event in ('end_map', 'end_array'):
+                if builder_prefix == 'errors.item':
+                    errors.append(builder.value)
+                else:
+                    item = builder.value if model is None else model(builder.value)
+                    yield item if id_path is None else (current_id, item)
+                builder = None
+            continue
+        if prefix == id_path:
+            current_id = value
+        elif event in ('start_map', 'start_array') and prefix in (item_prefix, 'errors.item'):
+            builder = ijson.ObjectBuilder()
+            builder_prefix = prefix
+            builder.event(event, value)
+        elif prefix == item_prefix:
+            item = value if model is None else model(value)
+            yield item if id_path is None else (current_id, item)
+    if errors:
+        raise GraphQLResponseError(errors)
@@ -0,0 +1,219 @@
+import graphql
+import keyword
+from tilores.helpers import TILORES_ROOT_TYPES
+from tilores.schema import FINGERPRINT_QUERY, fingerprint_of, record_selection_of
+
+SCALAR_TYPES = {
+    'String': 'str',
+    'ID': 'str',
+    'Int': 'int',
+    'Boolean': 'bool',
+    'Float': 'float',
+    'Time': 'datetime.time',
+    'Date': 'datetime.date',
+    'DateTime': 'datetime.datetime',
+}
+
+def load_schema(path):
+    """Load a schema from either a `.graphql` SDL file or a `.json` introspection result."""
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    if path.endswith('.json'):
+        import json
+        introspection = json.loads(source)
+        return graphql.build_client_schema(introspection.get('data', introspection))
+    return graphql.build_schema(source)
+
+def schema_fingerprint_of(schema):
+    """Get the fingerprint of a schema, equal to `TiloresAPI.schema_fingerprint()` of an instance serving it."""
+    # graphql-core refuses to execute anything against schemas declaring the incremental delivery directives
+    kwargs = schema.to_kwargs()
+    kwargs['directives'] = [directive for directive in kwargs['directives'] if directive.name not in ('defer', 'stream')]
+    result = graphql.graphql_sync(graphql.GraphQLSchema(**kwargs), FINGERPRINT_QUERY)
+    assert not result.errors, f'Cannot fingerprint schema: {result.errors!r}'
+    return fingerprint_of(result.data)
+
+def identifier_of(name):
+    return f'{name}_' if keyword.iskeyword(name) else name
+
+def docstring_of(description, indent):
+    if '"""' in description or '\\' in description or description.endswith('"'):
+        return [f'{indent}__doc__ = {description!r}']
+    lines = description.strip().splitlines()
+    if len(lines) == 1:
+        return [f'{indent}"""{lines[0]}"""']
+    return [f'{indent}"""'] + [f'{indent}{line}'.rstrip() for line in lines] + [f'{indent}"""']
+
+class ModuleGenerator():
+    """
+    Generates the source of a Python module with static pydantic models for the Tilores schema.
+
+    The module contains the same models as `PydanticFactory.generate()` with
+    the enums, unions and interfaces they reference, plus an option model per
+    object type to select fields with, the full selection of the Record fields
+    and the search parameter names. Importing it does not require the schema
+    or graphql-core, so services avoid building the models on every start.
+    The models defer building their validators until they are first used.
+
+    In contrast to the PydanticFactory, the enum members have their GraphQL
+    names as values, and all object fields, not only the required ones, have
+    nested option models.
+    """
+
+    def __init__(self, schema, source=None):
+        """
+        Args:
+            schema: The GraphQL schema to generate the models for.
+            source: An optional description of where the schema came from, mentioned in the module docstring.
+        """
+        self.schema = schema
+        self.source = source
+        self.references = {}
+        self.aliases = set()
+        self.defined = set()
+        self.forward = []
+        self.blocks = []
+
+    def generate(self):
+        """Generate the module source."""
+        self.references = {}
+        self.aliases = set()
+        self.defined = set()
+        self.forward = []
+        self.blocks = []
+        for type_name in TILORES_ROOT_TYPES:
+            graphql_type = self.schema.get_type(type_name)
+            assert graphql_type is not None, f'Cannot get type in schema for: {type_name!r}'
+            self.create(graphql_type)
+        header = [
+            '"""',
+            f'Static pydantic models for the Tilores schema{f" of {self.source}" if self.source else ""}.',
+            '',
+            'Generated by `tilores codegen`, do not edit.',
+            '"""',
+            'import datetime',
+            'import typing',
+            'from enum import Enum',
+            'from pydantic import BaseModel, Field',
+            '',
+            *(['# aliases for the classes with fields of the same names'] if self.aliases else []),
+            *[f'_{name} = {name}' for name in sorted(self.aliases)],
+            *([''] if self.aliases else []),
+            f'SCHEMA_FINGERPRINT = {schema_fingerprint_of(self.schema)!r}',
+        ]
+        models = ', '.join(f'{name!r}: {name}' for name, kind in self.references.items() if kind != 'enum' and kind != 'union')
+        option_models = ', '.join(f'{name!r}: {name}Options' for name, kind in self.references.items() if kind == 'output')
+        footer = [
+            f'MODELS = {{{models}}}',
+            '',
+            f'OPTION_MODELS = {{{option_models}}}',
+            '',
+            *(['# resolve the references of the option models of recursive types'] if self.forward else []),
+            *[f'{name}.model_rebuild()' for name in self.forward],
+            *([''] if self.forward else []),
+            f'RECORD_SELECTION = {record_selection_of(self.schema)!r}',
+            '"""The selection of all Record fields, to be used instead of an option model."""',
+            '',
+            f'SEARCH_PARAM_NAMES = {tuple(self.schema.get_type("SearchParams").fields)!r}',
+            '',
+            f'RECORD_PARAM_NAMES = {tuple(self.schema.get_type("RecordInput").fields)!r}',
+        ]
+        return '\n\n\n'.join('\n'.join(block) for block in [header] + self.blocks + [footer]) + '\n'
+
+    def create(self, graphql_type):
+        """Add the definitions of a named type and the types it references, the referenced ones first."""
+        if graphql_type.name in self.references:
+            return
+        match graphql_type:
+            case graphql.GraphQLEnumType():
+                self.references[graphql_type.name] = 'enum'
+                self.append(graphql_type.name, self.enum_of(graphql_type))
+            case graphql.GraphQLUnionType():
+                self.references[graphql_type.name] = 'union'
+                for member_type in graphql_type.types:
+                    self.create(member_type)
+                members = ', '.join(self.reference_of(member_type.name) for member_type in graphql_type.types)
+                self.append(graphql_type.name, [f'{graphql_type.name} = typing.Union[{members}]'])
+            case graphql.GraphQLObjectType() | graphql.GraphQLInterfaceType() | graphql.GraphQLInputObjectType():
+                is_input = isinstance(graphql_type, graphql.GraphQLInputObjectType)
+                self.references[graphql_type.name] = 'input' if is_input else 'output'
+                for field in graphql_type.fields.values():
+                    self.create(graphql.get_named_type(field.type))
+                self.append(graphql_type.name, self.model_of(graphql_type))
+                if not is_input:
+                    self.append(f'{graphql_type.name}Options', self.option_model_of(graphql_type))
+
+    def append(self, name, lines):
+        self.blocks.append(lines)
+        self.defined.add(name)
+
+    def reference_of(self, name):
+        """Refer to a generated class by name, or by a forward reference if it is not yet defined."""
+        return name if name in self.defined else repr(name)
+
+    def enum_of(self, graphql_type):
+        lines = [f'class {graphql_type.name}(Enum):']
+        if graphql_type.description:
+            lines += docstring_of(graphql_type.description, '    ')
+        lines += [f'    {identifier_of(name)} = {name!r}' for name in graphql_type.values]
+        return lines
+
+    def model_of(self, graphql_type):
+        lines = [f'class {graphql_type.name}(BaseModel, defer_build=True):']
+        if graphql_type.description:
+            lines += docstring_of(graphql_type.description, '    ')
+        shadowed = {identifier_of(field_name) for field_name in graphql_type.fields}
+        for field_name, field in graphql_type.fields.items():
+            required = isinstance(field.type, graphql.GraphQLNonNull)
+            annotation = self.type_of(field.type, shadowed)
+            description = field.description or f'A value for {field_name} of type {field.type}'
+            arguments = ['...' if required else 'None', f'description={description!r}']
+            if keyword.iskeyword(field_name):
+                arguments.append(f'alias={field_name!r}')
+            lines.append(f'    {identifier_of(field_name)}: {annotation} = {self.name_of("Field", shadowed)}({", ".join(arguments)})')
+        if not graphql_type.fields:
+            lines.append('    pass')
+        return lines
+
+    def option_model_of(self, graphql_type):
+        # nested option models have to be annotated with the class itself, see option_model_to_graphql_fields
+        lines = [f'class {graphql_type.name}Options(BaseModel, defer_build=True):']
+        shadowed = {identifier_of(field_name) for field_name in graphql_type.fields}
+        for field_name, field in graphql_type.fields.items():
+            named_type = graphql.get_named_type(field.type)
+            if isinstance(named_type, (graphql.GraphQLObjectType, graphql.GraphQLInterfaceType)):
+                annotation = self.reference_of(f'{named_type.name}Options')
+                if annotation.startswith("'") and f'{graphql_type.name}Options' not in self.forward:
+                    self.forward.append(f'{graphql_type.name}Options')
+            else:
+                annotation = f'{self.name_of("typing", shadowed)}.Optional[{self.name_of("bool", shadowed)}]'
+            alias = f', alias={field_name!r}' if keyword.iskeyword(field_name) else ''
+            lines.append(f'    {identifier_of(field_name)}: {annotation} = {self.name_of("Field", shadowed)}(None{alias})')
+        if not graphql_type.fields:
+            lines.append('    pass')
+        return lines
+
+    def name_of(self, name, shadowed):
+        """Get the name to refer to a module level name with inside a class, which has attributes of the names in `shadowed`."""
+        if name not in shadowed:
+            return name
+        assert name not in self.references, f'Cannot refer to type {name!r} from a type with a field of the same name'
+        self.aliases.add(name)
+        return f'_{name}'
+
+    def type_of(self, graphql_type, shadowed=frozenset(), nullable=True):
+        """Get the annotation of a GraphQL type, referencing the generated classes by name."""
+        match graphql_type:
+            case graphql.GraphQLNonNull():
+                return self.type_of(graphql_type.of_type, shadowed, nullable=False)
+            case graphql.GraphQLList():
+                annotation = f'{self.name_of("list", shadowed)}[{self.type_of(graphql_type.of_type, shadowed)}]'
+            case graphql.GraphQLScalarType():
+                annotation = SCALAR_TYPES.get(graphql_type.name, 'typing.Any')
+                module, _, name = annotation.rpartition('.')
+                annotation = f'{self.name_of(module, shadowed)}.{name}' if module else self.name_of(name, shadowed)
+            case _:
+                annotation = self.reference_of(self.name_of(graphql_type.name, shadowed))
+        if nullable and not annotation.endswith('.Any'):
+            annotation = f'{self.name_of("typing", shadowed)}.Optional[{annotation}]'
+        return annotation
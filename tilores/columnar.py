@@ -0,0 +1,169 @@
+import datetime
+import json
+import graphql
+
+try:
+    import pyarrow
+except ImportError:
+    raise ImportError('The columnar export requires pyarrow, install it using: pip install tilores-sdk[arrow]') from None
+
+ENTITY_ID_COLUMN = 'entity_id'
+HITS_COLUMN = 'hits'
+
+def parse_time(value):
+    """Parse an ISO 8601 date time, treating values without offset as UTC."""
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=datetime.timezone.utc)
+
+def arrow_type_of(graphql_type):
+    """
+    Get the Arrow type and a parser for the JSON values of a GraphQL type.
+
+    The mapping follows the PydanticFactory, enums are dictionary encoded
+    strings and other custom scalars JSON encoded strings. The parser is None
+    if the JSON values can be converted by Arrow as they are.
+    """
+    match graphql_type:
+        case graphql.GraphQLNonNull():
+            return arrow_type_of(graphql_type.of_type)
+        case graphql.GraphQLScalarType(name='String') | graphql.GraphQLScalarType(name='ID'):
+            return pyarrow.string(), None
+        case graphql.GraphQLScalarType(name='Int'):
+            return pyarrow.int64(), None
+        case graphql.GraphQLScalarType(name='Boolean'):
+            return pyarrow.bool_(), None
+        case graphql.GraphQLScalarType(name='Float'):
+            return pyarrow.float64(), None
+        case graphql.GraphQLScalarType(name='Time'):
+            return pyarrow.time64('us'), datetime.time.fromisoformat
+        case graphql.GraphQLScalarType(name='Date'):
+            return pyarrow.date32(), datetime.date.fromisoformat
+        case graphql.GraphQLScalarType(name='DateTime'):
+            return pyarrow.timestamp('us', tz='UTC'), parse_time
+        case graphql.GraphQLScalarType():
+            return pyarrow.string(), lambda value: json.dumps(value, separators=(',', ':'))
+        case graphql.GraphQLEnumType():
+            return pyarrow.dictionary(pyarrow.int32(), pyarrow.string()), None
+        case graphql.GraphQLList():
+            inner_type, inner_parse = arrow_type_of(graphql_type.of_type)
+            if pyarrow.types.is_dictionary(inner_type):
+                inner_type = pyarrow.string()
+            return pyarrow.list_(inner_type), None if inner_parse is None else lambda values: [None if value is None else inner_parse(value) for value in values]
+        case _:
+            raise NotImplementedError(f'Unmatched case for GraphQL type: {graphql_type!r}')
+
+class Column:
+    """A column of the flattened records, holding the selected values of a field path."""
+
+    def __init__(self, path, arrow_type, parse, lists):
+        self.path = path
+        self.name = '.'.join(path)
+        self.arrow_type = arrow_type
+        self.parse = parse
+        # the indexes of the path segments whose values are lists of objects
+        self.lists = lists
+
+    def get(self, record, depth=0):
+        """Get the value of the path from a record, mapping over nested lists."""
+        for i in range(depth, len(self.path)):
+            if record is None:
+                return None
+            record = record.get(self.path[i])
+            if i in self.lists and i + 1 < len(self.path) and record is not None:
+                return [self.get(item, i + 1) for item in record]
+        return record
+
+    def array(self, values):
+        """Convert the collected values into an Arrow array."""
+        if pyarrow.types.is_dictionary(self.arrow_type):
+            return pyarrow.array(values, pyarrow.string()).dictionary_encode()
+        if self.parse is not None:
+            if pyarrow.types.is_date(self.arrow_type) or pyarrow.types.is_timestamp(self.arrow_type):
+                # Arrow parses ISO 8601 much faster, but rejects date times without offset
+                try:
+                    return pyarrow.array(values, pyarrow.string()).cast(self.arrow_type)
+                except pyarrow.ArrowInvalid:
+                    pass
+            values = [None if value is None else self.parse(value) for value in values]
+        return pyarrow.array(values, self.arrow_type)
+
+class ArrowAdapter:
+    """
+    Flattens search results into Apache Arrow record batches with one row per record.
+
+    The columns are `entity_id`, `hits` (the rules the record matched by) and
+    one column per selected record field, named by the dot separated path of
+    the field, e.g. `address.city`. The column types are derived from the
+    schema, see `arrow_type_of`. Fields nested in lists of objects become
+    list columns.
+
+    The batches and tables convert to pandas with `to_pandas()` and to
+    polars with `polars.from_arrow()` without copying the data of most types.
+
+    Requires the `arrow` extra: pip install tilores-sdk[arrow]
+    """
+
+    def __init__(self, schema, selection, batch_size=64*1024):
+        """
+        Args:
+            schema: The GraphQL schema of the Tilores instance.
+            selection: The selection of record fields, see `selection_of`.
+            batch_size: The maximum number of rows per record batch.
+        """
+        self.selection = selection
+        self.batch_size = batch_size
+        self.columns = [self.column_of(schema.get_type('Record'), path) for path in selection]
+        self.schema = pyarrow.schema(
+            [pyarrow.field(ENTITY_ID_COLUMN, pyarrow.string()), pyarrow.field(HITS_COLUMN, pyarrow.list_(pyarrow.string()))] +
+            [pyarrow.field(column.name, column.arrow_type) for column in self.columns]
+        )
+
+    @staticmethod
+    def column_of(record_type, path):
+        graphql_type = record_type
+        lists = set()
+        for i, name in enumerate(path):
+            if name == '__typename':
+                graphql_type = graphql.GraphQLString
+                break
+            field = graphql.get_named_type(graphql_type).fields.get(name)
+            assert field is not None, f'Cannot find field {".".join(path[:i + 1])!r} in {record_type.name!r}'
+            graphql_type = field.type
+            if i + 1 < len(path) and isinstance(graphql.get_nullable_type(graphql_type), graphql.GraphQLList):
+                lists.add(i)
+        arrow_type, parse = arrow_type_of(graphql_type)
+        for _ in lists:
+            arrow_type = pyarrow.list_(arrow_type)
+            parse = None if parse is None else (lambda inner_parse: lambda values: [None if value is None else inner_parse(value) for value in values])(parse)
+        return Column(path, arrow_type, parse, lists)
+
+    def record_batches(self, entities):
+        """Lazily flatten the entities, e.g. of `TiloresAPI.search_stream`, into record batches of at most `batch_size` rows."""
+        entity_ids, hits, records = [], [], []
+        for entity in entities:
+            entity_records = entity.get('records') or ()
+            entity_hits = entity.get('hits') or {}
+            entity_ids.extend([entity.get('id')] * len(entity_records))
+            hits.extend([entity_hits.get(record.get('id')) for record in entity_records])
+            records.extend(entity_records)
+            while len(records) >= self.batch_size:
+                yield self.record_batch(entity_ids[:self.batch_size], hits[:self.batch_size], records[:self.batch_size])
+                del entity_ids[:self.batch_size], hits[:self.batch_size], records[:self.batch_size]
+        if records:
+            yield self.record_batch(entity_ids, hits, records)
+
+    def record_batch(self, entity_ids, hits, records):
+        """Convert the records with their entity IDs and hits into a record batch, column by column."""
+        arrays = [pyarrow.array(entity_ids, pyarrow.string()), pyarrow.array(hits, pyarrow.list_(pyarrow.string()))]
+        for column in self.columns:
+            if len(column.path) == 1:
+                name = column.path[0]
+                values = [record.get(name) for record in records]
+            else:
+                values = [column.get(record) for record in records]
+            arrays.append(column.array(values))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def table(self, entities):
+        """Flatten the entities, e.g. `result['data']['search']['entities']`, into a table."""
+        return pyarrow.Table.from_batches(list(self.record_batches(entities)), schema=self.schema)
@@ -0,0 +1,135 @@
+import gzip
+import importlib.util
+import re
+
+ENCODINGS = ('gzip', 'zstd', 'br')
+
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3, 'br': 4}
+
+def zstd_compressor(level):
+    try:
+        from compression import zstd
+        return lambda data: zstd.compress(data, level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd compression requires zstandard, install it using: pip install tilores-sdk[compression]') from None
+    # compressors must not be shared between threads, a new one per body is cheap
+    return lambda data: zstandard.ZstdCompressor(level=level).compress(data)
+
+def brotli_compressor(level):
+    try:
+        import brotli
+    except ImportError:
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            raise ImportError('br compression requires brotli, install it using: pip install tilores-sdk[compression]') from None
+    return lambda data: brotli.compress(data, quality=level)
+
+def compressor_of(encoding, level=None):
+    """Get a function compressing bytes with the content coding, e.g. 'gzip'."""
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    match encoding:
+        case 'gzip':
+            return lambda data: gzip.compress(data, compresslevel=level, mtime=0)
+        case 'zstd':
+            return zstd_compressor(level)
+        case 'br':
+            return brotli_compressor(level)
+        case _:
+            raise NotImplementedError(f'Unknown content coding: {encoding!r}')
+
+def httpx_version():
+    """Get the version of the installed httpx as tuple of ints, e.g. (0, 28, 1)."""
+    import httpx
+    return tuple(int(part) for part in re.findall(r'\d+', httpx.__version__)[:3])
+
+def decodable_encodings(client='requests'):
+    """
+    Get the response content codings the HTTP client can decode with the installed packages.
+
+    Args:
+        client: Either 'requests', whose responses urllib3 decodes, or 'httpx'.
+    """
+    if client == 'httpx':
+        encodings = ['gzip', 'deflate']
+        # httpx decodes zstd with zstandard as of 0.27.1, and br with brotli or brotlicffi
+        if importlib.util.find_spec('zstandard') is not None and httpx_version() >= (0, 27, 1):
+            encodings.append('zstd')
+        if importlib.util.find_spec('brotli') is not None or importlib.util.find_spec('brotlicffi') is not None:
+            encodings.append('br')
+        return tuple(encodings)
+    # urllib3 lists the codings it has decoders for, e.g. zstd only as of urllib3 2 with zstandard installed
+    from urllib3.util.request import ACCEPT_ENCODING
+    return tuple(ACCEPT_ENCODING.split(','))
+
+class Compression:
+    """
+    Compresses request bodies and negotiates compressed responses.
+
+    Request bodies of at least `threshold` bytes are compressed with the
+    given content coding and sent with a Content-Encoding header, smaller
+    ones are sent as they are, as compressing them saves less than it costs.
+    Responses are requested with all content codings the HTTP client of the
+    TiloresAPI (urllib3) or AsyncTiloresAPI (httpx) can decode, they are
+    decompressed transparently, also while streaming.
+
+    zstd requires the zstandard package and br the brotli package, both are
+    installed by the `compression` extra: pip install tilores-sdk[compression]
+    """
+
+    def __init__(self, request_encoding='gzip', threshold=1024, level=None, accept_encodings=None):
+        """
+        Args:
+            request_encoding: The content coding of the request bodies, 'gzip', 'zstd' or 'br', None disables it.
+            threshold: The minimum size in bytes of the request bodies to compress.
+            level: The compression level, by default 6 for gzip, 3 for zstd and 4 for br.
+            accept_encodings: The content codings accepted for responses, by default all the client
+                can decode, see `decodable_encodings`. An empty tuple requests uncompressed responses.
+        """
+        assert request_encoding is None or request_encoding in ENCODINGS, \
+            f'Unknown request encoding {request_encoding!r}, expected one of: {ENCODINGS!r}'
+        self.request_encoding = request_encoding
+        self.threshold = threshold
+        self.level = level
+        self.accept_encodings = None if accept_encodings is None else tuple(accept_encodings)
+        # the Accept-Encoding header per HTTP client
+        self._accept_encoding = {}
+        # fail on construction if the compressor is not installed
+        self.compress = None if request_encoding is None else compressor_of(request_encoding, level)
+
+    def __getstate__(self):
+        # the compressor and the headers are rebuilt when unpickled, e.g. in another process with other packages
+        return {name: value for name, value in self.__dict__.items() if name not in ('compress', '_accept_encoding')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._accept_encoding = {}
+        self.compress = None if self.request_encoding is None else compressor_of(self.request_encoding, self.level)
+
+    def accept_encoding(self, client='requests'):
+        """Get the Accept-Encoding header for the HTTP client, either 'requests' or 'httpx'."""
+        accept_encoding = self._accept_encoding.get(client)
+        if accept_encoding is None:
+            encodings = decodable_encodings(client) if self.accept_encodings is None else self.accept_encodings
+            accept_encoding = self._accept_encoding[client] = ', '.join(encodings) or 'identity'
+        return accept_encoding
+
+    def encode(self, body, client='requests'):
+        """
+        Compress a JSON request body if it is large enough.
+
+        Args:
+            client: The HTTP client sending the body, which decodes the response, see `accept_encoding`.
+
+        Returns:
+            A tuple of the body to send and its headers.
+        """
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': self.accept_encoding(client)}
+        if self.compress is None or len(body) < self.threshold:
+            return body, headers
+        headers['Content-Encoding'] = self.request_encoding
+        return self.compress(body), headers
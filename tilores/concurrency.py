@@ -0,0 +1,55 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import itertools
+
+def bounded_map(fn, items, concurrency, ordered=False):
+    """
+    Apply the function to the items in a thread pool and yield the results as they complete.
+
+    The items are consumed lazily and at most `concurrency` calls are in
+    flight at any time, which keeps the memory bounded for large or endless
+    iterables. Exceptions are raised when their result is yielded, the
+    remaining calls are cancelled.
+
+    With `ordered` the results are yielded in the order of the items. Up to
+    `4 * concurrency` items are then submitted ahead, so that a slow call
+    does not stall the others until the window is exhausted.
+    """
+    assert concurrency > 0, f'Concurrency must be positive, got: {concurrency!r}'
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if ordered:
+            yield from ordered_map(executor, fn, items, 4 * concurrency)
+            return
+        pending = set()
+        try:
+            while True:
+                for item in itertools.islice(items, concurrency - len(pending)):
+                    pending.add(executor.submit(fn, item))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+def ordered_map(executor, fn, items, window):
+    """
+    Apply the function to the items with any executor and yield the results in the order of the items.
+
+    At most `window` items are submitted ahead of the result yielded next.
+    The remaining calls are cancelled if the consumer stops early.
+    """
+    pending = deque()
+    try:
+        while True:
+            for item in itertools.islice(items, window - len(pending)):
+                pending.append(executor.submit(fn, item))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,8 +1,25 @@
-from pydantic import BaseModel
-from pydantic import create_model
-from graphql_query import Field
+from functools import lru_cache
+from typing import TYPE_CHECKING
+import weakref
 
-def pydantic_model_to_option_model(model: type[BaseModel]):
+# pydantic and graphql_query are imported on first use to keep `import tilores` fast
+if TYPE_CHECKING:
+  from pydantic import BaseModel
+
+# The conversions are cached by model class, the classes are not kept alive by the caches.
+_option_models = weakref.WeakKeyDictionary()
+_option_fields = weakref.WeakKeyDictionary()
+
+def pydantic_model_to_option_model(model: 'type[BaseModel]'):
+  """
+  Returns the option model of a pydantic model, with a bool or a nested option model per field.
+
+  The option model is created once per model, so that the same model always has the same option model.
+  """
+  option_model = _option_models.get(model)
+  if option_model is not None:
+    return option_model
+  from pydantic import BaseModel, create_model
   fields = {}
 
   for name, field in model.model_fields.items():
@@ -11,17 +28,71 @@ def pydantic_model_to_option_model(model: type[BaseModel]):
     else:
       fields[name] = (bool, None)
 
-  return create_model(model.__name__, **fields)
+  option_model = _option_models[model] = create_model(model.__name__, **fields)
+  return option_model
+
+def option_fields_of(option_model: 'type[BaseModel]'):
+  """Returns the field names of an option model class with whether they have a nested option model, cached per class."""
+  option_fields = _option_fields.get(option_model)
+  if option_fields is None:
+    from pydantic import BaseModel
+    option_fields = _option_fields[option_model] = tuple(
+      (name, isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel))
+      for name, field in option_model.model_fields.items()
+    )
+  return option_fields
+
+def option_model_to_graphql_fields(model: 'BaseModel'):
+  """Returns the graphql_query fields of the selected fields of an option model, see selection_to_graphql_fields."""
+  return selection_to_graphql_fields(option_model_to_selection(model))
+
+def option_model_to_selection(model: 'BaseModel'):
+  """
+  Returns the selected fields of an option model as a hashable tuple of field paths.
+
+  E.g. (('id',), ('addr', 'street')) for an option model with id and addr.street set.
+  """
+  paths = []
+
+  for name, nested in option_fields_of(type(model)):
+    value = getattr(model, name)
+    if nested:
+      if value is not None:
+        paths.extend((name,) + path for path in option_model_to_selection(value))
+    elif value:
+      paths.append((name,))
 
-def option_model_to_graphql_fields(model: BaseModel):
+  return tuple(paths)
+
+def selection_of(fields):
+  """Returns the selection for either an option model or an existing selection."""
+  if isinstance(fields, tuple):
+    return fields
+  return option_model_to_selection(fields)
+
+def selection_to_graphql_fields(selection: tuple):
+  """
+  Returns the graphql_query fields of a selection.
+
+  The fields are built once per selection, the returned list is a copy but
+  the nested Field objects are shared and must not be modified.
+  """
+  return list(_graphql_fields_of(selection))
+
+@lru_cache(maxsize=1024)
+def _graphql_fields_of(selection: tuple):
+  from graphql_query import Field
   fields = []
+  subselections = {}
 
-  for name, field in model.model_fields.items():
-    if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
-      subfields = option_model_to_graphql_fields(getattr(model, name))
-      if len(subfields) > 0:
-        fields.append(Field(name=name, fields=subfields))
-    elif getattr(model, name):
+  for path in selection:
+    name = path[0]
+    if len(path) == 1:
       fields.append(name)
+    else:
+      if name not in subselections:
+        subselections[name] = []
+        fields.append(name)
+      subselections[name].append(path[1:])
 
-  return fields
\ No newline at end of file
+  return tuple(Field(name=name, fields=list(_graphql_fields_of(tuple(subselections[name])))) if name in subselections else name for name in fields)
@@ -0,0 +1,183 @@
+from array import array
+from collections import deque
+
+def parse_edge(edge):
+    """Split an edge of the form 'recordA:recordB:RULE' into its parts."""
+    parts = edge.split(':', 2)
+    assert len(parts) == 3, f'Edge not in the form "recordA:recordB:RULE": {edge!r}'
+    return parts
+
+class EntityGraph:
+    """
+    An undirected graph of records connected by the edges of their entities.
+
+    The record IDs, rule IDs and entity IDs are interned once and the edges are
+    stored as compact integer arrays. Adjacency lookups use a compressed sparse
+    row (CSR) index that is built on first use, so traversals do not touch the
+    ID strings except for the results. Records only linked as duplicates are
+    not part of the graph, as the entities do not list edges for them.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        """The record IDs by their node index."""
+        self.node_index = {}
+        """The node index by record ID."""
+        self.node_entity = array('l')
+        """The entity index by node index."""
+        self.entities = []
+        """The entity IDs by their entity index."""
+        self.rules = []
+        """The rule IDs by their rule index."""
+        self._rule_index = {}
+        self.sources = array('l')
+        self.targets = array('l')
+        self.edge_rules = array('l')
+        self._csr = None
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.sources)
+
+    def node(self, record_id, entity=-1):
+        """Get the node index of a record, adding it to the graph if necessary."""
+        index = self.node_index.get(record_id)
+        if index is None:
+            index = self.node_index[record_id] = len(self.nodes)
+            self.nodes.append(record_id)
+            self.node_entity.append(entity)
+            self._csr = None
+        return index
+
+    def add_entity(self, entity_id, edges):
+        """Add the edges of an entity, as returned in its `edges` field."""
+        entity = len(self.entities)
+        self.entities.append(entity_id)
+        for edge in edges:
+            a, b, rule = parse_edge(edge)
+            self.add_edge(a, b, rule, entity)
+
+    def add_edge(self, a, b, rule, entity=-1):
+        """Add an edge between two records, satisfied by the rule."""
+        rule_index = self._rule_index.get(rule)
+        if rule_index is None:
+            rule_index = self._rule_index[rule] = len(self.rules)
+            self.rules.append(rule)
+        self.sources.append(self.node(a, entity))
+        self.targets.append(self.node(b, entity))
+        self.edge_rules.append(rule_index)
+        self._csr = None
+
+    def csr(self):
+        """
+        Get the adjacency in compressed sparse row format.
+
+        Returns:
+            A tuple of `indptr`, `indices` and `edges` arrays. The neighbours of
+            node i are `indices[indptr[i]:indptr[i+1]]`, connected by the edges
+            at the same positions in `edges`. Each edge appears in both directions.
+        """
+        if self._csr is None:
+            indptr = array('l', bytes(array('l').itemsize * (self.num_nodes + 1)))
+            for node in self.sources:
+                indptr[node + 1] += 1
+            for node in self.targets:
+                indptr[node + 1] += 1
+            for i in range(self.num_nodes):
+                indptr[i + 1] += indptr[i]
+            position = indptr[:-1]
+            indices = array('l', bytes(array('l').itemsize * 2 * self.num_edges))
+            edges = array('l', bytes(array('l').itemsize * 2 * self.num_edges))
+            for edge, (a, b) in enumerate(zip(self.sources, self.targets)):
+                indices[position[a]] = b
+                edges[position[a]] = edge
+                position[a] += 1
+                indices[position[b]] = a
+                edges[position[b]] = edge
+                position[b] += 1
+            self._csr = (indptr, indices, edges)
+        return self._csr
+
+    def neighbors(self, record_id):
+        """Get the distinct record IDs directly connected to the record."""
+        indptr, indices, _ = self.csr()
+        node = self.node_index[record_id]
+        return [self.nodes[i] for i in dict.fromkeys(indices[indptr[node]:indptr[node + 1]])]
+
+    def bfs(self, recordIDs, max_depth=None, max_nodes=None):
+        """
+        Traverse the graph breadth-first from the records.
+
+        Args:
+            recordIDs: The record IDs to start from. Records not in the graph are skipped.
+            max_depth: The maximum number of edges between a start record and a visited one.
+            max_nodes: The maximum number of records to visit.
+
+        Returns:
+            A dict of the visited record IDs to their depth, in the order of their visit.
+        """
+        indptr, indices, _ = self.csr()
+        depths = {}
+        queue = deque()
+        for record_id in recordIDs:
+            node = self.node_index.get(record_id)
+            if node is not None and node not in depths and (max_nodes is None or len(depths) < max_nodes):
+                depths[node] = 0
+                queue.append(node)
+        while queue:
+            node = queue.popleft()
+            depth = depths[node] + 1
+            if max_depth is not None and depth > max_depth:
+                continue
+            for neighbor in indices[indptr[node]:indptr[node + 1]]:
+                if neighbor not in depths:
+                    if max_nodes is not None and len(depths) >= max_nodes:
+                        return {self.nodes[n]: d for n, d in depths.items()}
+                    depths[neighbor] = depth
+                    queue.append(neighbor)
+        return {self.nodes[n]: d for n, d in depths.items()}
+
+    def subgraph(self, recordIDs):
+        """Get a new graph with only the edges between the given records."""
+        nodes = {self.node_index[record_id] for record_id in recordIDs if record_id in self.node_index}
+        graph = EntityGraph()
+        entities = {}
+        for a, b, rule in zip(self.sources, self.targets, self.edge_rules):
+            if a in nodes and b in nodes:
+                entity = self.node_entity[a]
+                if entity >= 0 and entity not in entities:
+                    entities[entity] = len(graph.entities)
+                    graph.entities.append(self.entities[entity])
+                graph.add_edge(self.nodes[a], self.nodes[b], self.rules[rule], entities.get(entity, -1))
+        return graph
+
+    def edge_list(self):
+        """Get the edges as a list of tuples of record A, record B and rule ID."""
+        return [(self.nodes[a], self.nodes[b], self.rules[rule]) for a, b, rule in zip(self.sources, self.targets, self.edge_rules)]
+
+    def to_numpy(self):
+        """
+        Get the graph as NumPy arrays, e.g. to build a scipy.sparse.csr_matrix from.
+
+        Returns:
+            A dict with the `edges` as an (n, 2) array of node indices, the
+            `rules` index per edge, the `entity` index per node and the CSR
+            `indptr`, `indices` and `edge` arrays, see `csr`.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('NumPy export requires numpy, install it using: pip install tilores-sdk[insights]') from None
+        indptr, indices, edges = self.csr()
+        return {
+            'edges': numpy.array([self.sources, self.targets], dtype=numpy.int64).T.reshape(-1, 2),
+            'rules': numpy.array(self.edge_rules, dtype=numpy.int64),
+            'entity': numpy.array(self.node_entity, dtype=numpy.int64),
+            'indptr': numpy.array(indptr, dtype=numpy.int64),
+            'indices': numpy.array(indices, dtype=numpy.int64),
+            'edge': numpy.array(edges, dtype=numpy.int64),
+        }
@@ -2,6 +2,7 @@ import graphql
 import typing
 from enum import Enum
 import datetime
+import keyword
 from pydantic import create_model, Field
 
 TILORES_ROOT_TYPES = ['Record', 'RecordInput', 'SearchParams']
@@ -77,3 +78,136 @@ class PydanticFactory():
             python_type = typing.Optional[python_type]
         return default_value, python_type
 
+
+class Struct:
+    """
+    The base class for the compact record classes generated by the StructFactory.
+
+    Instances only store the fields declared in `__slots__`, fields not present
+    in a response are None.
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        assert not fields, f'Unknown fields for {type(self).__name__}: {sorted(fields)!r}'
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__ if getattr(self, name) is not None)
+        return f'{type(self).__name__}({fields})'
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class StructFactory():
+    """
+    Generates compact `__slots__` classes and compiled decoders from the schema.
+
+    In contrast to the models of the PydanticFactory, decoding does not
+    validate the values, it only converts the scalars that have no JSON
+    representation (Date, DateTime, Time and enums), which makes it suitable
+    for decoding large responses.
+    """
+
+    def __init__(self, schema):
+        self.references = {}
+        self.decoders = {}
+        self.schema = schema
+
+    def generate(self):
+        [self.create_struct(struct_name) for struct_name in TILORES_ROOT_TYPES + ['Entity'] if self.schema.get_type(struct_name) is not None]
+        return self.references
+
+    def decode(self, struct_name, data):
+        """Decode a response dict, e.g. an entity or record, into an instance of the named struct."""
+        if struct_name not in self.decoders:
+            self.create_struct(struct_name)
+        return self.decoders[struct_name](data)
+
+    def decoder(self, struct_name):
+        """Get the decoder function of the named struct, e.g. to be used as model in `TiloresAPI.search_stream`."""
+        if struct_name not in self.decoders:
+            self.create_struct(struct_name)
+        return self.decoders[struct_name]
+
+    def create_struct(self, struct_name:str):
+        if struct_name in self.references:
+            return self.references[struct_name]
+        graphql_type = self.schema.get_type(struct_name)
+        assert graphql_type is not None, f'Cannot get type in schema for: {struct_name!r}'
+        field_names = tuple(graphql_type.fields)
+        struct = type(struct_name, (Struct,), {'__slots__': field_names, '__doc__': graphql_type.description})
+        self.references[struct_name] = struct
+        field_decoders = {field_name: self.type_of(field_type) for field_name, field_type in graphql_type.fields.items()}
+        self.decoders[struct_name] = self.compile_decoder(struct, field_decoders)
+        return struct
+
+    def compile_decoder(self, struct, field_decoders):
+        """Generate a decoder function which assigns all slots without any per-field dispatch."""
+        namespace = {'new': object.__new__, 'struct': struct, 'setattr': setattr}
+        lines = ['def decode(data):', '    obj = new(struct)', '    get = data.get']
+        for i, (field_name, field_decoder) in enumerate(field_decoders.items()):
+            value = f'get({field_name!r})'
+            if field_decoder is not None:
+                namespace[f'decode_{i}'] = field_decoder
+                lines.append(f'    value = {value}')
+                value = f'None if value is None else decode_{i}(value)'
+            if keyword.iskeyword(field_name):
+                lines.append(f'    setattr(obj, {field_name!r}, {value})')
+            else:
+                lines.append(f'    obj.{field_name} = {value}')
+        lines.append('    return obj')
+        exec('\n'.join(lines), namespace)
+        return namespace['decode']
+
+    def type_of(self, graphql_type):
+        """Get the decoder for a value of the GraphQL type or None if the JSON value can be used as is."""
+        match graphql_type:
+            case graphql.type.definition.GraphQLInputField() | graphql.type.definition.GraphQLField():
+                return self.type_of(graphql_type.type)
+            case graphql.type.definition.GraphQLNonNull():
+                return self.type_of(graphql_type.of_type)
+            case graphql.type.definition.GraphQLScalarType(name='Float'):
+                return float
+            case graphql.type.definition.GraphQLScalarType(name='Time'):
+                return datetime.time.fromisoformat
+            case graphql.type.definition.GraphQLScalarType(name='Date'):
+                return datetime.date.fromisoformat
+            case graphql.type.definition.GraphQLScalarType(name='DateTime'):
+                return datetime.datetime.fromisoformat
+            case graphql.type.definition.GraphQLScalarType():
+                return None
+            case graphql.type.definition.GraphQLList():
+                inner_decoder = self.type_of(graphql_type.of_type)
+                if inner_decoder is None:
+                    return None
+                return lambda values: [None if value is None else inner_decoder(value) for value in values]
+            case graphql.type.definition.GraphQLEnumType(name=enum_name):
+                if enum_name not in self.references:
+                    enum = Enum(enum_name, [(name, name) for name in graphql_type.values])
+                    enum.__doc__ = graphql_type.description
+                    self.references[enum_name] = enum
+                return self.references[enum_name].__getitem__
+            case graphql.type.definition.GraphQLUnionType() | graphql.type.definition.GraphQLInterfaceType():
+                if isinstance(graphql_type, graphql.type.definition.GraphQLInterfaceType):
+                    self.create_struct(graphql_type.name)
+                for possible_type in self.schema.get_possible_types(graphql_type):
+                    self.create_struct(possible_type.name)
+                default_name = graphql_type.name if graphql_type.name in self.decoders else None
+                decoders = self.decoders
+                def decode_abstract(value):
+                    struct_name = value.get('__typename', default_name)
+                    return value if struct_name is None else decoders[struct_name](value)
+                return decode_abstract
+            case graphql.type.definition.GraphQLObjectType(name=struct_name) | graphql.type.definition.GraphQLInputObjectType(name=struct_name):
+                self.create_struct(struct_name)
+                decoders = self.decoders
+                return lambda value: decoders[struct_name](value)
+            case _:
+                raise NotImplementedError(f'Unmatched case for GraphQL type: {graphql_type!r}')
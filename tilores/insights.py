@@ -0,0 +1,199 @@
+from graphql_query import Field
+import datetime
+from .record_insights import DESC
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def parse_time(value):
+    """Parse an ISO 8601 date or time, treating values without offset as UTC."""
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    elif isinstance(value, datetime.date):
+        parsed = datetime.datetime.combine(value, datetime.time())
+    else:
+        parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+def casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+class RecordInsightsEvaluator:
+    """
+    Evaluates RecordInsights queries locally against already fetched records.
+
+    The records are read column by column. Every column, its non-null values,
+    their keys and timestamps are derived only once per evaluator and shared
+    by all fields of all queries evaluated. If NumPy is installed, they are
+    arrays and the aggregations run vectorized on them. The results have the same shape as the `recordInsights`
+    part of a response: a dict of the aliases to their values.
+
+    Supported are the operations of the RecordInsights builder: frequencyDistribution,
+    newest, oldest, values and valuesDistinct.
+    """
+
+    def __init__(self, records, use_numpy=None):
+        """
+        Args:
+            records: The records as dicts or objects, e.g. generated by the StructFactory.
+            use_numpy: Whether to use NumPy, by default it is used if installed.
+        """
+        self.records = records
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        assert not self.use_numpy or numpy is not None, 'use_numpy requires NumPy to be installed'
+        self._columns = {}
+        self._non_null = {}
+        self._keys = {}
+        self._timestamps = {}
+
+    def column(self, field_name):
+        """Get the values of a field for all records, as object array if NumPy is used."""
+        if field_name not in self._columns:
+            if self.records and not isinstance(self.records[0], dict):
+                values = (getattr(record, field_name, None) for record in self.records)
+            else:
+                values = (record.get(field_name) for record in self.records)
+            # fromiter keeps list values as elements instead of adding a dimension
+            self._columns[field_name] = numpy.fromiter(values, dtype=object, count=len(self.records)) if self.use_numpy else list(values)
+        return self._columns[field_name]
+
+    def evaluate(self, insights):
+        """Evaluate the fields of a RecordInsights query and return the result per alias."""
+        result = {}
+        for field in insights.fields:
+            arguments = {argument.name: argument.value for argument in field.arguments}
+            field_name = arguments.get('field', '""')[1:-1]
+            match field.name:
+                case 'frequencyDistribution':
+                    value = self.frequency_distribution(field_name, top=arguments.get('top'), direction=arguments.get('direction', DESC),
+                        case_sensitive=arguments.get('caseSensitive', False))
+                    value = [self.select(entry, field.fields) for entry in value]
+                case 'newest':
+                    value = self.select(self.newest(field_name), field.fields)
+                case 'oldest':
+                    value = self.select(self.oldest(field_name), field.fields)
+                case 'values':
+                    value = self.values(field_name)
+                case 'valuesDistinct':
+                    value = self.values_distinct(field_name, case_sensitive=arguments.get('caseSensitive', False))
+                case _:
+                    raise NotImplementedError(f'Unsupported RecordInsights field: {field.name!r}')
+            result[field.alias or field.name] = value
+        return result
+
+    def select(self, value, fields):
+        """Reduce a dict or object to the selected fields, like GraphQL does."""
+        if value is None or not fields:
+            return value
+        selected = {}
+        for field in fields:
+            name = field.name if isinstance(field, Field) else field
+            alias = field.alias or name if isinstance(field, Field) else name
+            field_value = value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+            selected[alias] = self.select(field_value, field.fields) if isinstance(field, Field) else field_value
+        return selected
+
+    def non_null(self, field_name):
+        """Get the record indices and the values of a field where it is not null."""
+        if field_name not in self._non_null:
+            column = self.column(field_name)
+            if self.use_numpy:
+                indices = numpy.flatnonzero(numpy.not_equal(column, None))
+                self._non_null[field_name] = (indices, column[indices])
+            else:
+                indices = [i for i, value in enumerate(column) if value is not None]
+                self._non_null[field_name] = (indices, [column[i] for i in indices])
+        return self._non_null[field_name]
+
+    def keys(self, field_name, case_sensitive=False):
+        """Get the keys to count the non-null values of a field by, as string array if NumPy is used and all are strings."""
+        if (field_name, case_sensitive) not in self._keys:
+            _, values = self.non_null(field_name)
+            keys = list(values) if case_sensitive else [casefold(value) for value in values]
+            if self.use_numpy and keys and all(isinstance(key, str) for key in keys):
+                keys = numpy.array(keys)
+            self._keys[field_name, case_sensitive] = keys
+        return self._keys[field_name, case_sensitive]
+
+    def timestamps(self, field_name):
+        """Get the POSIX timestamps of the non-null values of a time field, parsing each distinct value once."""
+        if field_name not in self._timestamps:
+            _, values = self.non_null(field_name)
+            parsed = {}
+            timestamps = []
+            for value in values:
+                if value not in parsed:
+                    parsed[value] = parse_time(value).timestamp()
+                timestamps.append(parsed[value])
+            self._timestamps[field_name] = numpy.array(timestamps, dtype=numpy.float64) if self.use_numpy else timestamps
+        return self._timestamps[field_name]
+
+    def frequency_distribution(self, field_name, top=None, direction=DESC, case_sensitive=False):
+        """
+        Count how often each non-null value is present, ordered by the frequency.
+
+        Values that only differ in their case are counted together unless
+        `case_sensitive` is set, the first occurrence represents them. Values
+        with the same frequency keep the order of their first occurrence.
+        """
+        _, values = self.non_null(field_name)
+        if not len(values):
+            return []
+        keys = self.keys(field_name, case_sensitive)
+        if not isinstance(keys, list):
+            _, first_index, counts = numpy.unique(keys, return_index=True, return_counts=True)
+            order = numpy.lexsort((first_index, -counts if direction == DESC else counts))[:top]
+            entries = zip(values[first_index[order]].tolist(), counts[order].tolist())
+        else:
+            counts = {}
+            first_values = {}
+            for key, value in zip(keys, values):
+                if key in counts:
+                    counts[key] += 1
+                else:
+                    counts[key] = 1
+                    first_values[key] = value
+            entries = sorted(((first_values[key], count) for key, count in counts.items()), key=lambda entry: -entry[1] if direction == DESC else entry[1])[:top]
+        return [{'value': value, 'frequency': frequency, 'percentage': frequency / len(values)} for value, frequency in entries]
+
+    def newest(self, field_name):
+        """Get the record with the most recent value of the time field, or None."""
+        return self._extreme_record(field_name, newest=True)
+
+    def oldest(self, field_name):
+        """Get the record with the least recent value of the time field, or None."""
+        return self._extreme_record(field_name, newest=False)
+
+    def _extreme_record(self, field_name, newest):
+        indices, values = self.non_null(field_name)
+        if not len(values):
+            return None
+        timestamps = self.timestamps(field_name)
+        if self.use_numpy:
+            position = numpy.argmax(timestamps) if newest else numpy.argmin(timestamps)
+        else:
+            position = timestamps.index(max(timestamps) if newest else min(timestamps))
+        return self.records[int(indices[position])]
+
+    def values(self, field_name):
+        """Get all non-null values of the field."""
+        return list(self.non_null(field_name)[1])
+
+    def values_distinct(self, field_name, case_sensitive=False):
+        """Get the unique non-null values of the field in the order of their first occurrence."""
+        _, values = self.non_null(field_name)
+        keys = self.keys(field_name, case_sensitive)
+        if not isinstance(keys, list):
+            _, first_index = numpy.unique(keys, return_index=True)
+            return values[numpy.sort(first_index)].tolist()
+        seen = set()
+        distinct = []
+        for key, value in zip(keys, values):
+            if key not in seen:
+                seen.add(key)
+                distinct.append(value)
+        return distinct
@@ -0,0 +1,361 @@
+from bisect import bisect_left
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Hooks:
+    """
+    The interface of instrumentation hooks, all methods do nothing by default.
+
+    The operation is the name of the GraphQL operation, e.g. 'search' or
+    'entity_edges', or 'gql' for anonymous documents. Hooks are called from
+    the threads performing the requests and must be thread-safe. Clients
+    without hooks skip all instrumentation, including the time measurements.
+    """
+
+    def before_request(self, operation):
+        """Called before each HTTP request, including retries. The return value is passed to `after_request`."""
+        return None
+
+    def after_request(self, operation, context, duration, request_bytes=None, response_bytes=None, status=None, error=None):
+        """
+        Called after each HTTP request.
+
+        Args:
+            context: The value returned by `before_request`.
+            duration: The seconds until the response headers, or the body unless streamed, were received.
+            request_bytes: The size of the request body as sent, i.e. compressed if it was.
+            response_bytes: The size of the response body as received, i.e. compressed if it was,
+                None if it was streamed without Content-Length.
+            status: The HTTP status code, None if the request failed.
+            error: The exception if the request failed without a response.
+        """
+
+    def on_retry(self, operation, attempt, delay, status=None, error=None):
+        """Called before waiting `delay` seconds to retry a request for the given attempt, starting at 1."""
+
+    def on_token_refresh(self, duration, error=None):
+        """Called after requesting a new access token."""
+
+    def on_phase(self, operation, phase, duration):
+        """Called with the time spent in a client side phase: 'render', 'serialize', 'decode' or 'convert'."""
+
+    def on_cache(self, cache, hit):
+        """Called for each lookup in a client cache, e.g. 'search' or 'golden_records'."""
+
+    def on_compression(self, operation, direction, encoding, size, encoded_size):
+        """
+        Called for each compressed request body and each compressed response body that was not streamed.
+
+        Args:
+            direction: Either 'request' or 'response'.
+            encoding: The content coding, e.g. 'gzip'.
+            size: The size of the body before compression.
+            encoded_size: The size of the compressed body, as passed to `after_request`.
+        """
+
+class CompositeHooks(Hooks):
+    """Calls several hooks in order."""
+
+    def __init__(self, hooks):
+        self.hooks = list(hooks)
+
+    def before_request(self, operation):
+        return [hooks.before_request(operation) for hooks in self.hooks]
+
+    def after_request(self, operation, context, duration, request_bytes=None, response_bytes=None, status=None, error=None):
+        for hooks, hooks_context in zip(self.hooks, context):
+            hooks.after_request(operation, hooks_context, duration, request_bytes, response_bytes, status, error)
+
+    def on_retry(self, operation, attempt, delay, status=None, error=None):
+        for hooks in self.hooks:
+            hooks.on_retry(operation, attempt, delay, status, error)
+
+    def on_token_refresh(self, duration, error=None):
+        for hooks in self.hooks:
+            hooks.on_token_refresh(duration, error)
+
+    def on_phase(self, operation, phase, duration):
+        for hooks in self.hooks:
+            hooks.on_phase(operation, phase, duration)
+
+    def on_cache(self, cache, hit):
+        for hooks in self.hooks:
+            hooks.on_cache(cache, hit)
+
+    def on_compression(self, operation, direction, encoding, size, encoded_size):
+        for hooks in self.hooks:
+            hooks.on_compression(operation, direction, encoding, size, encoded_size)
+
+def hooks_of(hooks):
+    """Combine the hooks argument of a client, either None, a Hooks instance or a list of them."""
+    if hooks is None or isinstance(hooks, Hooks):
+        return hooks
+    hooks = list(hooks)
+    if not hooks:
+        return None
+    return hooks[0] if len(hooks) == 1 else CompositeHooks(hooks)
+
+class Histogram:
+    """A cumulative histogram with fixed bucket boundaries, like the Prometheus one."""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile, e.g. 0.99, by linear interpolation within its bucket, like Prometheus does.
+
+        Returns None without observations and the largest bucket boundary for values beyond it.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+class MetricsCollector(Hooks):
+    """
+    Collects request metrics in memory.
+
+    Records per operation the latency histograms, request and response
+    sizes, status codes, retries and requests in flight, as well as the
+    client side phases, token refreshes, cache hit rates and compression
+    ratios. Use `snapshot`
+    to read them, e.g. to export them periodically.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = {}
+            self.request_bytes = {}
+            self.response_bytes = {}
+            self.phases = {}
+            self.statuses = {}
+            self.retries = {}
+            self.in_flight = {}
+            self.token_refreshes = Histogram(self.latency_buckets)
+            self.token_errors = 0
+            self.cache = {}
+            self.compression = {}
+
+    def _histogram(self, histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def before_request(self, operation):
+        with self._lock:
+            self.in_flight[operation] = self.in_flight.get(operation, 0) + 1
+
+    def after_request(self, operation, context, duration, request_bytes=None, response_bytes=None, status=None, error=None):
+        with self._lock:
+            self.in_flight[operation] -= 1
+            self._histogram(self.latency, operation, self.latency_buckets).observe(duration)
+            if request_bytes is not None:
+                self._histogram(self.request_bytes, operation, self.size_buckets).observe(request_bytes)
+            if response_bytes is not None:
+                self._histogram(self.response_bytes, operation, self.size_buckets).observe(response_bytes)
+            key = (operation, status if error is None else type(error).__name__)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def on_retry(self, operation, attempt, delay, status=None, error=None):
+        with self._lock:
+            self.retries[operation] = self.retries.get(operation, 0) + 1
+
+    def on_token_refresh(self, duration, error=None):
+        with self._lock:
+            self.token_refreshes.observe(duration)
+            if error is not None:
+                self.token_errors += 1
+
+    def on_phase(self, operation, phase, duration):
+        with self._lock:
+            self._histogram(self.phases, (operation, phase), self.latency_buckets).observe(duration)
+
+    def on_cache(self, cache, hit):
+        with self._lock:
+            counts = self.cache.setdefault(cache, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def on_compression(self, operation, direction, encoding, size, encoded_size):
+        with self._lock:
+            totals = self.compression.setdefault((operation, direction), [0, 0, 0])
+            totals[0] += 1
+            totals[1] += size
+            totals[2] += encoded_size
+
+    def snapshot(self):
+        """Get a copy of the collected metrics as plain dicts."""
+        with self._lock:
+            return {
+                'latency': {operation: h.to_dict() for operation, h in self.latency.items()},
+                'request_bytes': {operation: h.to_dict() for operation, h in self.request_bytes.items()},
+                'response_bytes': {operation: h.to_dict() for operation, h in self.response_bytes.items()},
+                'phases': {f'{operation}.{phase}': h.to_dict() for (operation, phase), h in self.phases.items()},
+                'statuses': {f'{operation}.{status}': count for (operation, status), count in self.statuses.items()},
+                'retries': dict(self.retries),
+                'in_flight': dict(self.in_flight),
+                'token_refreshes': dict(self.token_refreshes.to_dict(), errors=self.token_errors),
+                'cache': {cache: {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses)} for cache, (hits, misses) in self.cache.items()},
+                'compression': {f'{operation}.{direction}': {'count': count, 'bytes': size, 'encoded_bytes': encoded_size,
+                    'ratio': size / encoded_size if encoded_size else None} for (operation, direction), (count, size, encoded_size) in self.compression.items()},
+            }
+
+class PrometheusHooks(Hooks):
+    """
+    Exports the request metrics through prometheus_client.
+
+    Requires the `prometheus` extra: pip install tilores-sdk[prometheus]
+    """
+
+    def __init__(self, registry=None, namespace='tilores'):
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusHooks requires prometheus_client, install it using: pip install tilores-sdk[prometheus]') from None
+        registry = registry or prometheus_client.REGISTRY
+        options = {'namespace': namespace, 'registry': registry}
+        self.latency = prometheus_client.Histogram('request_duration_seconds', 'Duration of the requests to the Tilores instance.',
+            ['operation', 'status'], buckets=LATENCY_BUCKETS, **options)
+        self.request_bytes = prometheus_client.Histogram('request_size_bytes', 'Size of the request bodies.',
+            ['operation'], buckets=SIZE_BUCKETS, **options)
+        self.response_bytes = prometheus_client.Histogram('response_size_bytes', 'Size of the response bodies.',
+            ['operation'], buckets=SIZE_BUCKETS, **options)
+        self.in_flight = prometheus_client.Gauge('requests_in_flight', 'Requests waiting for a response.', ['operation'], **options)
+        self.retries = prometheus_client.Counter('request_retries', 'Retried requests.', ['operation'], **options)
+        self.phases = prometheus_client.Histogram('phase_duration_seconds', 'Time spent in client side phases.',
+            ['operation', 'phase'], buckets=LATENCY_BUCKETS, **options)
+        self.token_refreshes = prometheus_client.Histogram('token_refresh_duration_seconds', 'Duration of the access token requests.',
+            ['result'], buckets=LATENCY_BUCKETS, **options)
+        self.cache = prometheus_client.Counter('cache_lookups', 'Lookups in the client caches.', ['cache', 'result'], **options)
+        self.uncompressed_bytes = prometheus_client.Counter('uncompressed_bytes', 'Size of the compressed bodies before compression.',
+            ['operation', 'direction', 'encoding'], **options)
+        self.compressed_bytes = prometheus_client.Counter('compressed_bytes', 'Size of the compressed bodies.',
+            ['operation', 'direction', 'encoding'], **options)
+
+    def before_request(self, operation):
+        self.in_flight.labels(operation).inc()
+
+    def after_request(self, operation, context, duration, request_bytes=None, response_bytes=None, status=None, error=None):
+        self.in_flight.labels(operation).dec()
+        self.latency.labels(operation, str(status) if error is None else type(error).__name__).observe(duration)
+        if request_bytes is not None:
+            self.request_bytes.labels(operation).observe(request_bytes)
+        if response_bytes is not None:
+            self.response_bytes.labels(operation).observe(response_bytes)
+
+    def on_retry(self, operation, attempt, delay, status=None, error=None):
+        self.retries.labels(operation).inc()
+
+    def on_token_refresh(self, duration, error=None):
+        self.token_refreshes.labels('ok' if error is None else 'error').observe(duration)
+
+    def on_phase(self, operation, phase, duration):
+        self.phases.labels(operation, phase).observe(duration)
+
+    def on_cache(self, cache, hit):
+        self.cache.labels(cache, 'hit' if hit else 'miss').inc()
+
+    def on_compression(self, operation, direction, encoding, size, encoded_size):
+        self.uncompressed_bytes.labels(operation, direction, encoding).inc(size)
+        self.compressed_bytes.labels(operation, direction, encoding).inc(encoded_size)
+
+class OpenTelemetryHooks(Hooks):
+    """
+    Traces each request as a client span and records the metrics through OpenTelemetry.
+
+    Uses the global tracer and meter providers unless others are given.
+    Requires the `opentelemetry` extra: pip install tilores-sdk[opentelemetry]
+    """
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        try:
+            from opentelemetry import metrics as otel_metrics, trace as otel_trace
+        except ImportError:
+            raise ImportError('OpenTelemetryHooks requires opentelemetry-api, install it using: pip install tilores-sdk[opentelemetry]') from None
+        self.trace = otel_trace
+        self.tracer = otel_trace.get_tracer('tilores', tracer_provider=tracer_provider)
+        meter = otel_metrics.get_meter('tilores', meter_provider=meter_provider)
+        self.latency = meter.create_histogram('tilores.request.duration', unit='s', description='Duration of the requests to the Tilores instance.')
+        self.request_bytes = meter.create_histogram('tilores.request.size', unit='By', description='Size of the request bodies.')
+        self.response_bytes = meter.create_histogram('tilores.response.size', unit='By', description='Size of the response bodies.')
+        self.in_flight = meter.create_up_down_counter('tilores.requests.in_flight', description='Requests waiting for a response.')
+        self.retries = meter.create_counter('tilores.request.retries', description='Retried requests.')
+        self.phases = meter.create_histogram('tilores.phase.duration', unit='s', description='Time spent in client side phases.')
+        self.token_refreshes = meter.create_histogram('tilores.token_refresh.duration', unit='s', description='Duration of the access token requests.')
+        self.cache = meter.create_counter('tilores.cache.lookups', description='Lookups in the client caches.')
+        self.uncompressed_bytes = meter.create_counter('tilores.compression.uncompressed', unit='By', description='Size of the compressed bodies before compression.')
+        self.compressed_bytes = meter.create_counter('tilores.compression.compressed', unit='By', description='Size of the compressed bodies.')
+
+    def before_request(self, operation):
+        self.in_flight.add(1, {'operation': operation})
+        return self.tracer.start_span(f'tilores {operation}', kind=self.trace.SpanKind.CLIENT, attributes={'graphql.operation.name': operation})
+
+    def after_request(self, operation, context, duration, request_bytes=None, response_bytes=None, status=None, error=None):
+        self.in_flight.add(-1, {'operation': operation})
+        attributes = {'operation': operation, 'status': str(status) if error is None else type(error).__name__}
+        self.latency.record(duration, attributes)
+        if request_bytes is not None:
+            self.request_bytes.record(request_bytes, {'operation': operation})
+            context.set_attribute('http.request.body.size', request_bytes)
+        if response_bytes is not None:
+            self.response_bytes.record(response_bytes, {'operation': operation})
+            context.set_attribute('http.response.body.size', response_bytes)
+        if status is not None:
+            context.set_attribute('http.response.status_code', status)
+        if error is not None:
+            context.record_exception(error)
+        if error is not None or status >= 400:
+            context.set_status(self.trace.Status(self.trace.StatusCode.ERROR))
+        context.end()
+
+    def on_retry(self, operation, attempt, delay, status=None, error=None):
+        self.retries.add(1, {'operation': operation})
+
+    def on_token_refresh(self, duration, error=None):
+        self.token_refreshes.record(duration, {'result': 'ok' if error is None else 'error'})
+
+    def on_phase(self, operation, phase, duration):
+        self.phases.record(duration, {'operation': operation, 'phase': phase})
+
+    def on_cache(self, cache, hit):
+        self.cache.add(1, {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+    def on_compression(self, operation, direction, encoding, size, encoded_size):
+        attributes = {'operation': operation, 'direction': direction, 'encoding': encoding}
+        self.uncompressed_bytes.add(size, attributes)
+        self.compressed_bytes.add(encoded_size, attributes)
@@ -0,0 +1,265 @@
+from dataclasses import dataclass, field
+import csv
+import io
+import itertools
+import json
+import os
+import threading
+import time
+from tilores.concurrency import bounded_map
+from tilores.instrumentation import Histogram
+
+MATCH_SELECTION = (('id',),)
+
+MATCH_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0)
+
+INPUT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+NO_SEARCH_PARAMS = 'No search parameters'
+
+@dataclass
+class MatchReport:
+    """The progress of a match job."""
+    rows: int = 0
+    """The number of rows matched, including those of previous runs."""
+    matched: int = 0
+    """The number of rows with at least one matching entity."""
+    errors: int = 0
+    """The number of rows that could not be matched."""
+    resumed: int = 0
+    """The number of rows skipped, because a previous run already matched them."""
+    elapsed: float = 0.0
+    """The seconds since this run started."""
+    rows_per_second: float = 0.0
+    """The throughput of this run since the previous report."""
+    latency: dict = field(default_factory=dict)
+    """The estimated p50, p95 and p99 search latency in seconds of this run."""
+
+    def __str__(self):
+        latency = ' '.join(f'{name} {value * 1000:.0f}ms' for name, value in self.latency.items() if value is not None)
+        return (f'{self.rows} rows, {self.matched} matched, {self.errors} errors, '
+            f'{self.rows_per_second:.1f} rows/s{", " + latency if latency else ""}')
+
+def format_of(path):
+    """Get the input format of a file from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    assert extension in INPUT_FORMATS, f'Unknown input format {extension!r}, expected one of: {sorted(INPUT_FORMATS)!r}'
+    return INPUT_FORMATS[extension]
+
+def read_rows(path, input_format=None):
+    """Lazily read the rows of a CSV, JSON lines or Parquet file as dicts."""
+    match input_format or format_of(path):
+        case 'csv':
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                yield from csv.DictReader(f)
+        case 'jsonl':
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        case 'parquet':
+            try:
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError('Reading Parquet requires pyarrow, install it using: pip install tilores-sdk[arrow]') from None
+            for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+                yield from batch.to_pylist()
+        case unknown:
+            raise NotImplementedError(f'Unknown input format: {unknown!r}')
+
+class MatchJob:
+    """
+    Matches the rows of a file against Tilores and writes the matching entity IDs, resuming where a previous run stopped.
+
+    Each row is searched for with the values of its columns mapped onto the
+    search parameters. The searches run concurrently, while the results are
+    written in the order of the input, one JSON line or CSV row per input
+    row with its number, its optional ID and the matching entity IDs or the
+    error. After every `checkpoint_every` rows the output is synced and the
+    progress is stored next to it in `<output>.checkpoint`. A new run
+    truncates the output to the last checkpoint and skips the rows matched
+    before, so that a killed job continues where it stopped.
+
+    Rows whose search failed, e.g. on a timeout or an open circuit, are
+    written with their error, but the checkpoint does not move past the
+    first of them, so that the next run searches them again. Only rows
+    without search parameters are final errors.
+    """
+
+    def __init__(self, api, input, output, *, columns=None, id_column=None, input_format=None, concurrency=8,
+        checkpoint_every=1000, resume=True, progress=None, report_interval=10.0):
+        """
+        Args:
+            api: The TiloresAPI to search with, its retry policy and rate limiter apply to all searches.
+            input: The path of the CSV, JSON lines or Parquet file with the rows to match.
+            output: The path of the JSON lines or, if it ends with .csv, CSV file to write the results to.
+            columns: A dict of input columns to search parameters. By default the columns named like a
+                search parameter, ignoring their case, are used.
+            id_column: An optional input column to identify the rows by in the output.
+            input_format: Either 'csv', 'jsonl' or 'parquet', by default derived from the file extension.
+            concurrency: The maximum number of searches in flight.
+            checkpoint_every: The number of rows after which the progress is stored.
+            resume: Whether to resume from the checkpoint of a previous run or start over.
+            progress: An optional function called with a MatchReport every `report_interval` seconds and at the end.
+            report_interval: The seconds between two progress reports.
+        """
+        self.api = api
+        self.input = input
+        self.output = output
+        self.columns = columns
+        self.id_column = id_column
+        self.input_format = input_format or format_of(input)
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        self.progress = progress
+        self.report_interval = report_interval
+        self.checkpoint_path = f'{output}.checkpoint'
+        self.csv_output = output.lower().endswith('.csv')
+        self.latency = Histogram(MATCH_LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+
+    def load_checkpoint(self):
+        """Load the checkpoint of a previous run, or None."""
+        if not self.resume or not os.path.exists(self.checkpoint_path) or not os.path.exists(self.output):
+            return None
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        assert checkpoint['input'] == os.path.abspath(self.input), \
+            f'The checkpoint {self.checkpoint_path!r} belongs to another input: {checkpoint["input"]!r}'
+        return checkpoint
+
+    def store_checkpoint(self, out, report, complete=False, failed=None):
+        """Store the progress, or if a row failed, the progress before it, i.e. its number, offset, matched and errors."""
+        out.flush()
+        os.fsync(out.fileno())
+        rows, offset, matched, errors = failed or (report.rows, out.tell(), report.matched, report.errors)
+        checkpoint = {'input': os.path.abspath(self.input), 'rows': rows, 'offset': offset,
+            'matched': matched, 'errors': errors, 'complete': complete and failed is None}
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def column_mapping(self):
+        """
+        Get a function returning the mapping of the columns of a row to search parameters, validating the configured one.
+
+        By default the columns are mapped by their names, per set of columns, as the rows of JSON lines may differ in them.
+        """
+        search_param_names = self.api.search_param_names
+        if self.columns is not None:
+            unknown = set(self.columns.values()) - set(search_param_names)
+            assert not unknown, f'Columns mapped to unknown search parameters: {sorted(unknown)!r}'
+            columns = dict(self.columns)
+            return lambda row: columns
+        names = {name.casefold(): name for name in search_param_names}
+        mappings = {}
+        def columns_of(row):
+            key = tuple(row)
+            if key not in mappings:
+                mappings[key] = {column: names[column.casefold()] for column in row if column.casefold() in names}
+            return mappings[key]
+        return columns_of
+
+    def match_row(self, item):
+        """
+        Search for a single row, returning its number, ID, the matching entity IDs, the error and whether it failed.
+
+        A failed row, unlike one without search parameters, is searched again by the next run.
+        """
+        number, row, columns_of = item
+        row_id = row.get(self.id_column) if self.id_column else None
+        columns = columns_of(row)
+        searchParams = {param: row[column] for column, param in columns.items() if row.get(column) not in (None, '')}
+        if not searchParams:
+            return number, row_id, [], NO_SEARCH_PARAMS, False
+        started = time.perf_counter()
+        try:
+            result = self.api.search(MATCH_SELECTION, searchParams)
+        except Exception as e:
+            return number, row_id, [], f'{type(e).__name__}: {e}', True
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                self.latency.observe(duration)
+        error = '; '.join(str(error.get('message', error)) for error in result['errors']) if result.get('errors') else None
+        entities = ((result.get('data') or {}).get('search') or {}).get('entities') or []
+        return number, row_id, [entity['id'] for entity in entities], error, error is not None
+
+    def line_of(self, number, row_id, entity_ids, error):
+        if not self.csv_output:
+            line = {'row': number, 'entityIDs': entity_ids}
+            if self.id_column:
+                line['id'] = row_id
+            if error:
+                line['error'] = error
+            return (json.dumps(line, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if number == 0:
+            writer.writerow(['row'] + (['id'] if self.id_column else []) + ['entity_ids', 'error'])
+        writer.writerow([number] + ([row_id] if self.id_column else []) + [' '.join(entity_ids), error or ''])
+        return buffer.getvalue().encode('utf-8')
+
+    def report(self, report, started, last_report):
+        """Update the elapsed time, throughput and latency of the report since the previous one."""
+        now = time.perf_counter()
+        rows, last_time = last_report
+        report.elapsed = now - started
+        report.rows_per_second = (report.rows - rows) / (now - last_time) if now > last_time else 0.0
+        with self._lock:
+            report.latency = {f'p{int(q * 100)}': self.latency.quantile(q) for q in (0.5, 0.95, 0.99)}
+        return report.rows, now
+
+    def run(self):
+        """Match all remaining rows and return the final MatchReport."""
+        checkpoint = self.load_checkpoint()
+        report = MatchReport()
+        if checkpoint is not None:
+            report.rows = report.resumed = checkpoint['rows']
+            report.matched = checkpoint['matched']
+            report.errors = checkpoint['errors']
+        started = time.perf_counter()
+        last_report = (report.rows, started)
+        rows = itertools.islice(enumerate(read_rows(self.input, self.input_format)), report.resumed, None)
+        columns_of = self.column_mapping()
+        if self.columns is None and self.input_format != 'jsonl':
+            # all rows have the columns of the first one
+            first = next(rows, None)
+            assert first is None or columns_of(first[1]), \
+                f'No input column matches a search parameter: {sorted(self.api.search_param_names)!r}'
+            rows = itertools.chain([first] if first else [], rows)
+        items = ((number, row, columns_of) for number, row in rows)
+        complete = False
+        # the progress before the first failed row, where the next run resumes
+        failed = None
+        with open(self.output, 'r+b' if checkpoint else 'wb') as out:
+            if checkpoint:
+                out.truncate(checkpoint['offset'])
+                out.seek(checkpoint['offset'])
+            try:
+                for number, row_id, entity_ids, error, retry in bounded_map(self.match_row, items, self.concurrency, ordered=True):
+                    if retry and failed is None:
+                        failed = (report.rows, out.tell(), report.matched, report.errors)
+                    out.write(self.line_of(number, row_id, entity_ids, error))
+                    report.rows += 1
+                    report.matched += bool(entity_ids)
+                    report.errors += bool(error)
+                    if report.rows % self.checkpoint_every == 0:
+                        self.store_checkpoint(out, report, failed=failed)
+                    if self.progress is not None and time.perf_counter() - last_report[1] >= self.report_interval:
+                        last_report = self.report(report, started, last_report)
+                        self.progress(report)
+                complete = True
+            finally:
+                # on errors and interrupts the rows written so far are kept for the next run
+                self.store_checkpoint(out, report, complete, failed)
+        self.report(report, started, (report.resumed, started))
+        if self.progress is not None:
+            self.progress(report)
+        return report
+
+def match_file(api, input, output, **options):
+    """Match the rows of a file against Tilores, see MatchJob for the options."""
+    return MatchJob(api, input, output, **options).run()
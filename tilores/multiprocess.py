@@ -0,0 +1,143 @@
+from dataclasses import dataclass, fields
+import itertools
+import os
+import weakref
+from tilores.auth import TokenStore
+from tilores.compression import Compression
+from tilores.concurrency import bounded_map, ordered_map
+from tilores.conversion import selection_of
+from tilores.resilience import RetryPolicy
+
+@dataclass
+class ClientConfig:
+    """
+    The picklable configuration of a TiloresAPI, see its arguments.
+
+    The session, result cache, rate limiter, circuit breaker and hooks are
+    bound to a process and therefore not part of the configuration, a client
+    created from it uses its own connections and access token.
+    """
+    api_url: str
+    token_url: str
+    client_id: str
+    client_secret: str
+    scope: list = None
+    pool_connections: int = 2
+    pool_maxsize: int = 10
+    pool_block: bool = False
+    timeout: float | tuple = None
+    schema_cache_dir: str = None
+    schema_cache_ttl: int = 24*60*60
+    document_cache_size: int = 128
+    persisted_queries: bool = False
+    json_backend: str = None
+    token_refresh_skew: int = 60
+    token_background_refresh: bool = False
+    token_store: TokenStore = None
+    retry: RetryPolicy = None
+    compression: Compression = None
+    validate_search_params: bool = False
+
+    def create(self, **overrides):
+        """Create a new TiloresAPI with this configuration and the process bound options, e.g. hooks, as overrides."""
+        from tilores.tilores_api import TiloresAPI
+        return TiloresAPI(**{field.name: getattr(self, field.name) for field in fields(self)}, **overrides)
+
+@dataclass
+class ClientSnapshot:
+    """
+    A picklable snapshot of a TiloresAPI, its configuration and the introspection result of the schema.
+
+    Clients restored from the snapshot, e.g. in worker processes, build the
+    schema and the models derived from it from the introspection result
+    instead of querying it again.
+    """
+    config: ClientConfig
+    introspection: dict = None
+
+    def client(self, **overrides):
+        """Create a new TiloresAPI from the snapshot, see `ClientConfig.create`."""
+        client = self.config.create(**overrides)
+        if self.introspection is not None:
+            # seeds the cached property
+            client.__dict__['introspection'] = self.introspection
+        return client
+
+def restore_client(snapshot):
+    """Restore a pickled TiloresAPI from its snapshot."""
+    return snapshot.client()
+
+# The clients of this process, whose connections and tokens are renewed in forked children.
+_clients = weakref.WeakSet()
+
+def _after_fork_in_child():
+    for client in list(_clients):
+        client.after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+# The client of a map_search worker process, created by its initializer.
+_worker_client = None
+
+def current_client():
+    """Get the client of the current map_search worker process, e.g. to decode results with its `structs` in `postprocess`."""
+    assert _worker_client is not None, 'There is no client outside of map_search worker processes'
+    return _worker_client
+
+def _init_worker(snapshot):
+    global _worker_client
+    _worker_client = snapshot.client()
+
+def _search_chunk(task):
+    selection, chunk, postprocess, concurrency, return_exceptions = task
+    def search(searchParams):
+        try:
+            result = _worker_client.search(selection, searchParams)
+            return result if postprocess is None else postprocess(result)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+    return list(bounded_map(search, chunk, concurrency, ordered=True))
+
+def map_search(api, recordFieldsToQuery, searchParamsIter, processes=None, postprocess=None, concurrency=4, chunksize=16,
+    return_exceptions=False, mp_context=None):
+    """
+    Perform searches and post-process their results in a pool of worker processes, yielding the results in input order.
+
+    Each worker creates its own client from a snapshot of `api`, including the
+    introspection result, which is fetched once here. The search parameters
+    are sent in chunks of `chunksize`, a worker searches for the parameters of
+    a chunk with `concurrency` threads and applies `postprocess` to each
+    result, so that CPU-bound post-processing scales with the processes
+    instead of being limited by the GIL.
+
+    Args:
+        api: The TiloresAPI to snapshot, see `ClientConfig` for the options that are carried over.
+        recordFieldsToQuery: The record fields to query, see `TiloresAPI.search`.
+        searchParamsIter: An iterable of search parameters, consumed lazily.
+        processes: The number of worker processes, by default the number of CPUs.
+        postprocess: An optional function to apply to each search result in the workers. It and its
+            return values must be picklable, e.g. a module level function returning plain values.
+            Use `current_client()` within it to access the worker's client.
+        concurrency: The maximum number of searches in flight per worker.
+        chunksize: The number of search parameters sent to a worker at once.
+        return_exceptions: Whether to yield exceptions of failed searches instead of raising them.
+        mp_context: An optional multiprocessing context, e.g. `multiprocessing.get_context('spawn')`.
+
+    Yields:
+        The post-processed result per search parameters in input order.
+    """
+    # multiprocessing takes a while to import and is only needed here
+    from concurrent.futures import ProcessPoolExecutor
+    assert chunksize > 0, f'Chunk size must be positive, got: {chunksize!r}'
+    selection = selection_of(recordFieldsToQuery)
+    processes = processes or os.cpu_count() or 1
+    snapshot = api.snapshot(introspection=True)
+    searchParamsIter = iter(searchParamsIter)
+    chunks = iter(lambda: list(itertools.islice(searchParamsIter, chunksize)), [])
+    tasks = ((selection, chunk, postprocess, concurrency, return_exceptions) for chunk in chunks)
+    with ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_init_worker, initargs=(snapshot,)) as executor:
+        for results in ordered_map(executor, _search_chunk, tasks, 2 * processes):
+            yield from results
@@ -0,0 +1,246 @@
+from tilores.conversion import selection_to_graphql_fields
+from functools import lru_cache
+import hashlib
+import re
+
+# graphql_query is imported by the builders on first use to keep `import tilores` fast
+
+OPERATION_NAME = re.compile(r'^\s*(?:query|mutation|subscription)\s+(\w+)')
+
+def search_operation(selection):
+    """
+    Build the search operation for the given selection of record fields.
+
+    The operation expects the search parameters in the `params` variable.
+    """
+    from graphql_query import Operation, Query, Argument, Variable, Field
+    recordFields=Field(name="records", fields = selection_to_graphql_fields(selection))
+    var_params = Variable(name='params', type='SearchParams!')
+    return Operation(
+        type='query',
+        name='search',
+        variables=[var_params],
+        queries=[
+            Query(
+                name='search',
+                arguments=[
+                    Argument(name='input', value=Argument(name='parameters', value=var_params))
+                ],
+                fields=[
+                    Field(name='entities', fields=[
+                        'id',
+                        'hits',
+                        recordFields
+                    ])
+                ]
+            )
+        ]
+    )
+
+def entity_edges_operation():
+    """
+    Build the operation to query the edges of a single entity.
+
+    The operation expects the entity ID in the `entityID` variable.
+    """
+    from graphql_query import Operation, Query, Argument, Variable, Field
+    var_entity_id = Variable(name='entityID', type='ID!')
+    return Operation(
+        type='query',
+        name='entity_edges',
+        variables=[var_entity_id],
+        queries=[
+            Query(
+                name='entity',
+                arguments=[
+                    Argument(name='input', value=Argument(name='id', value=var_entity_id))
+                ],
+                fields=[
+                    Field(name='entity', fields=[
+                        'edges'
+                    ])
+                ]
+            )
+        ]
+    )
+
+def search_batch_operation(selection, size):
+    """
+    Build an operation with `size` aliased search queries for the given selection of record fields.
+
+    The query at index i is aliased as `search_i` and expects its search
+    parameters in the `params_i` variable.
+    """
+    from graphql_query import Operation, Query, Argument, Variable, Field
+    recordFields=Field(name="records", fields = selection_to_graphql_fields(selection))
+    variables = []
+    queries = []
+    for i in range(size):
+        var_params = Variable(name=f'params_{i}', type='SearchParams!')
+        variables.append(var_params)
+        queries.append(
+            Query(
+                name='search',
+                alias=f'search_{i}',
+                arguments=[
+                    Argument(name='input', value=Argument(name='parameters', value=var_params))
+                ],
+                fields=[
+                    Field(name='entities', fields=[
+                        'id',
+                        'hits',
+                        recordFields
+                    ])
+                ]
+            )
+        )
+    return Operation(
+        type='query',
+        name='search_batch',
+        variables=variables,
+        queries=queries
+    )
+
+def split_batch_result(result, size, name='search'):
+    """
+    Split the result of an operation with `size` aliased queries into one result per query.
+
+    Each result has the same shape as the result of the single query. Errors
+    are assigned to the query they belong to by their path, errors without
+    a path are assigned to all queries. If the server discarded the complete
+    data, the `data` of every result is None.
+    """
+    data = result.get('data')
+    errors = result.get('errors') or []
+    results = []
+    for i in range(size):
+        alias = f'{name}_{i}'
+        item = {'data': None if data is None else {name: data.get(alias)}}
+        item_errors = [error for error in errors if not error.get('path') or error['path'][0] == alias]
+        if item_errors:
+            item['errors'] = item_errors
+        results.append(item)
+    return results
+
+def entities_operation(fields, size, name='entities', query='entity'):
+    """
+    Build an operation with `size` aliased entity queries selecting the given entity fields.
+
+    The query at index i is aliased as `entity_i` and expects the entity ID in
+    the `id_i` variable. Use `query='entityByRecord'` to look the entities up
+    by record IDs instead.
+    """
+    from graphql_query import Operation, Query, Argument, Variable, Field
+    variables = []
+    queries = []
+    for i in range(size):
+        var_id = Variable(name=f'id_{i}', type='ID!')
+        variables.append(var_id)
+        queries.append(
+            Query(
+                name=query,
+                alias=f'entity_{i}',
+                arguments=[
+                    Argument(name='input', value=Argument(name='id', value=var_id))
+                ],
+                fields=[
+                    Field(name='entity', fields=fields)
+                ]
+            )
+        )
+    return Operation(
+        type='query',
+        name=name,
+        variables=variables,
+        queries=queries
+    )
+
+def submit_operation():
+    """
+    Build the mutation to submit records.
+
+    The operation expects the list of records in the `records` variable.
+    """
+    from graphql_query import Operation, Query, Argument, Variable
+    var_records = Variable(name='records', type='[RecordInput!]!')
+    return Operation(
+        type='mutation',
+        name='submit',
+        variables=[var_records],
+        queries=[
+            Query(
+                name='submit',
+                arguments=[
+                    Argument(name='input', value=Argument(name='records', value=var_records))
+                ],
+                fields=[
+                    'recordsAdded'
+                ]
+            )
+        ]
+    )
+
+@lru_cache(maxsize=1024)
+def document_hash(query):
+    """The SHA-256 hash identifying a document as persisted query."""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=1024)
+def operation_name_of(query):
+    """The name of the operation in the document, 'gql' if it is anonymous."""
+    match = OPERATION_NAME.match(query)
+    return match.group(1) if match else 'gql'
+
+@lru_cache(maxsize=1024)
+def is_mutation(query):
+    """Whether the document contains a mutation, which must not be sent twice."""
+    from graphql import GraphQLError, OperationDefinitionNode, OperationType, parse
+    try:
+        document = parse(query, no_location=True)
+    except GraphQLError:
+        # the server rejects invalid documents without executing them
+        return False
+    return any(isinstance(definition, OperationDefinitionNode) and definition.operation == OperationType.MUTATION
+        for definition in document.definitions)
+
+def is_persisted_query_error(result):
+    """Whether the server asks for the full document, because it does not know or support the persisted query."""
+    for error in result.get('errors') or []:
+        code = (error.get('extensions') or {}).get('code')
+        if code in ('PERSISTED_QUERY_NOT_FOUND', 'PERSISTED_QUERY_NOT_SUPPORTED') or error.get('message') in ('PersistedQueryNotFound', 'PersistedQueryNotSupported'):
+            return True
+    return False
+
+OPERATIONS = {
+    'search': search_operation,
+    'search_batch': search_batch_operation,
+    'entity_edges': entity_edges_operation,
+    'submit': submit_operation,
+}
+
+class DocumentCache:
+    """
+    A bounded LRU cache of rendered GraphQL documents.
+
+    Documents are keyed by the operation name and its arguments, e.g. the
+    selection of record fields, so that rendering only happens once per
+    distinct selection.
+    """
+
+    def __init__(self, maxsize=128):
+        self._render = lru_cache(maxsize=maxsize)(self.render)
+
+    @staticmethod
+    def render(name, *args):
+        return OPERATIONS[name](*args).render()
+
+    def get(self, name, *args):
+        """Get the rendered document of the operation, all arguments must be hashable."""
+        return self._render(name, *args)
+
+    def cache_info(self):
+        """The hits, misses, maxsize and currsize of the cache."""
+        return self._render.cache_info()
+
+    def clear(self):
+        self._render.cache_clear()
@@ -1,5 +1,6 @@
 from typing import Optional, List
 from graphql_query import Operation, Query, Argument, Variable, Field
+import graphql_query
 
 DESC = 'DESC'
 ASC = 'ASC'
@@ -16,6 +17,15 @@ class RecordInsights(Field):
         super().__init__(name='recordInsights', alias=alias)
         self.validate_field_names = validate_field_names
 
+    def evaluate(self, records):
+        """
+        Evaluate this query locally against already fetched records instead of querying them.
+
+        See also: RecordInsightsEvaluator
+        """
+        from .insights import RecordInsightsEvaluator
+        return RecordInsightsEvaluator(records).evaluate(self)
+
     def assert_field_name(self, field_name):
         if self.validate_field_names is None:
             return
@@ -85,3 +95,5 @@ class RecordInsights(Field):
         self.fields.append(field)
         return self
 
+# resolve the forward references of the graphql_query Field base class
+RecordInsights.model_rebuild(_types_namespace=vars(graphql_query))
@@ -0,0 +1,200 @@
+import email.utils
+import random
+import sys
+import threading
+import time
+import requests
+import urllib3
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# The status codes of requests the instance rejected without processing them.
+UNPROCESSED_STATUS_CODES = frozenset({429, 503})
+
+def retry_after_of(response):
+    """Get the seconds to wait from the Retry-After header of a response, or None."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_unsent(exception):
+    """Whether a request failed while connecting, i.e. before anything was sent to the instance."""
+    if isinstance(exception, requests.ConnectTimeout):
+        return True
+    if isinstance(exception, requests.ConnectionError):
+        reason = exception.args[0] if exception.args else None
+        # urllib3 wraps the connection error once its own retries are exhausted
+        reason = getattr(reason, 'reason', reason)
+        # NewConnectionError, raised if the connection was refused, is a ConnectTimeoutError
+        return isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+    httpx = sys.modules.get('httpx')
+    return httpx is not None and isinstance(exception, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+def is_retryable(exception, status_codes=RETRY_STATUS_CODES, idempotent=True):
+    """
+    Whether a failed request is worth retrying: throttled, server errors and connection issues.
+
+    Both requests and httpx exceptions are classified, the latter like their
+    requests counterparts: timeouts and network errors are retried, protocol
+    errors are not.
+
+    Requests that are not idempotent, e.g. mutations, are only retried if
+    they were certainly not processed: if the connection could not be
+    established or the instance rejected them with 429 or 503. A read timeout
+    or server error may happen after the mutation was applied.
+    """
+    if not idempotent:
+        status_codes = frozenset(status_codes) & UNPROCESSED_STATUS_CODES
+    if isinstance(exception, requests.HTTPError):
+        return exception.response is not None and exception.response.status_code in status_codes
+    if isinstance(exception, (requests.ConnectionError, requests.Timeout)):
+        return idempotent or is_unsent(exception)
+    # exceptions can only be httpx ones if httpx was imported
+    httpx = sys.modules.get('httpx')
+    if httpx is None:
+        return False
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code in status_codes
+    if isinstance(exception, (httpx.TimeoutException, httpx.NetworkError)):
+        return idempotent or is_unsent(exception)
+    return False
+
+class RetryPolicy:
+    """
+    Retries throttled and failed requests with jittered exponential backoff.
+
+    The delay before retry n is drawn uniformly from zero to
+    `backoff * 2 ** (n - 1)`, capped at `max_backoff` ("full jitter"), so that
+    many clients failing at once do not retry in lockstep. A Retry-After
+    header sent by the instance takes precedence, up to `max_retry_after`.
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0, max_retry_after=300.0, status_codes=RETRY_STATUS_CODES):
+        """
+        Args:
+            max_retries: The maximum number of retries per request, 0 disables retrying.
+            backoff: The base delay in seconds.
+            max_backoff: The maximum delay in seconds without Retry-After.
+            max_retry_after: The maximum delay in seconds requested by Retry-After that is honored.
+            status_codes: The HTTP status codes to retry.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.status_codes = frozenset(status_codes)
+
+    def delay(self, attempt, retry_after=None):
+        """Get the seconds to wait before the retry with the given number, starting at 1."""
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+NO_RETRY = RetryPolicy(max_retries=0)
+
+class RateLimiter:
+    """
+    A token bucket limiting the request rate, shareable by threads and asyncio tasks.
+
+    Callers reserve a token and wait until it becomes available outside of the
+    lock, so that waiting neither blocks other threads nor the event loop.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: The sustained number of requests per second.
+            burst: The number of requests that may be sent at once, defaults to the rate (at least 1).
+        """
+        assert rate > 0, f'Rate must be positive, got: {rate!r}'
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take the tokens and return the seconds to wait before they may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - tokens
+            self._updated = now
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until the tokens are available."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=1):
+        """Wait until the tokens are available without blocking the event loop."""
+        import asyncio
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Fails fast while the Tilores instance is unhealthy.
+
+    After `failure_threshold` consecutive server errors or connection failures
+    the circuit opens and requests raise CircuitOpenError without being sent.
+    Once `reset_timeout` seconds passed, a single trial request is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    Throttled requests (429) do not count as failures.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            raise CircuitOpenError(f'Circuit open after {self.failures} consecutive failures')
+
+    def record(self, success):
+        """Record the outcome of a request that was let through."""
+        with self._lock:
+            if success:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """Release the trial of a request that was let through but not sent, e.g. because a hook raised."""
+        with self._lock:
+            self._trial = False
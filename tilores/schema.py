@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import weakref
+
+FINGERPRINT_QUERY = '''
+query fingerprint {
+  __schema {
+    types {
+      kind
+      name
+      fields(includeDeprecated: true) { name type { ...TypeRef } }
+      inputFields { name type { ...TypeRef } }
+      enumValues(includeDeprecated: true) { name }
+      possibleTypes { name }
+    }
+  }
+}
+
+fragment TypeRef on __Type {
+  kind
+  name
+  ofType { kind name ofType { kind name ofType { kind name ofType { kind name } } } }
+}
+'''
+
+def __getattr__(name):
+    # graphql-core is imported on first use of the introspection query to keep `import tilores` fast
+    if name == 'INTROSPECTION_QUERY':
+        from graphql import get_introspection_query
+        global INTROSPECTION_QUERY
+        INTROSPECTION_QUERY = get_introspection_query(descriptions=True)
+        return INTROSPECTION_QUERY
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def fingerprint_of(data):
+    """Hash a JSON serializable value independent of its key order."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+class SchemaCache:
+    """
+    An on-disk cache for introspection results, keyed by the API URL.
+
+    Entries younger than the TTL are used without any request. Older entries
+    are revalidated by comparing their fingerprint, a hash of the result of the
+    small FINGERPRINT_QUERY, with the current one of the instance. Only if the
+    types or fields changed is the full introspection fetched again.
+    Descriptions are not part of the fingerprint.
+    """
+
+    def __init__(self, directory, ttl=24*60*60):
+        """
+        Args:
+            directory: The directory to store the introspection results in, it is created if missing.
+            ttl: The time in seconds an entry is used without revalidating it.
+        """
+        self.directory = directory
+        self.ttl = ttl
+
+    def path_for(self, api_url):
+        return os.path.join(self.directory, f'{hashlib.sha256(api_url.encode("utf-8")).hexdigest()}.json')
+
+    def load(self, api_url):
+        """Load the entry for the API URL, returns None if there is no valid entry."""
+        try:
+            with open(self.path_for(api_url), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('api_url') != api_url:
+            return None
+        return entry
+
+    def store(self, api_url, introspection, fingerprint):
+        """Atomically store the introspection result and its fingerprint as fetched now."""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {'api_url': api_url, 'fetched_at': time.time(), 'fingerprint': fingerprint, 'introspection': introspection}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path_for(api_url))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+def search_params_of(schema):
+    """Get a list of tuples of search parameter names and types for the search query."""
+    return [(name, graphql_input_field.type) for name, graphql_input_field in schema.get_type('SearchParams').fields.items()]
+
+def record_params_of(schema):
+    """Get a list of tuples of field names and their type for the RecordInput-type."""
+    return [(name, graphql_input_field.type) for name, graphql_input_field in schema.get_type('RecordInput').fields.items()]
+
+def selection_of_type(graphql_type, path=(), visited=()):
+    """
+    Get the selection of all fields of an object type as a tuple of field paths, see `selection_of`.
+
+    Nested object types are selected recursively, except for types already
+    selected on the path, of unions only the `__typename` is selected.
+    """
+    from graphql import GraphQLInterfaceType, GraphQLObjectType, GraphQLUnionType, get_named_type
+    visited += (graphql_type.name,)
+    selection = []
+    for name, field in graphql_type.fields.items():
+        named_type = get_named_type(field.type)
+        if isinstance(named_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            if named_type.name not in visited:
+                selection += selection_of_type(named_type, path + (name,), visited)
+        elif isinstance(named_type, GraphQLUnionType):
+            selection.append(path + (name, '__typename'))
+        else:
+            selection.append(path + (name,))
+    return tuple(selection)
+
+# The record selections are computed once per schema, the schemas are not kept alive by the cache.
+_record_selections = weakref.WeakKeyDictionary()
+
+def record_selection_of(schema):
+    """Get the selection of all fields of the Record type."""
+    selection = _record_selections.get(schema)
+    if selection is None:
+        selection = _record_selections[schema] = selection_of_type(schema.get_type('Record'))
+    return selection
+
+def records_definition_of(schema):
+    """Returns the field definition for the records field."""
+    from graphql_query import Field
+    from tilores.conversion import selection_to_graphql_fields
+    return Field(name='records', fields=selection_to_graphql_fields(record_selection_of(schema)))
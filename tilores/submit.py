@@ -0,0 +1,147 @@
+from dataclasses import dataclass, field
+from graphql import GraphQLNonNull
+from pydantic import BaseModel
+import json
+import os
+import time
+from tilores.codec import json_dumps
+from tilores.concurrency import bounded_map
+from tilores.operations import submit_operation
+from tilores.resilience import NO_RETRY, RetryPolicy, is_retryable, retry_after_of
+
+SUBMIT_QUERY = submit_operation().render()
+
+@dataclass
+class ChunkResult:
+    """The outcome of submitting a single chunk of records."""
+    index: int
+    """The position of the chunk in the submitted stream, starting at 0."""
+    records: int
+    """The number of records in the chunk."""
+    records_added: int = 0
+    """The number of records the Tilores instance reported as added."""
+    attempts: int = 0
+    """The number of requests it took to submit the chunk."""
+    errors: list = field(default_factory=list)
+    """The GraphQL errors or the exception that prevented the chunk from being submitted."""
+
+    @property
+    def ok(self):
+        return not self.errors and self.records_added == self.records
+
+def read_jsonl(path):
+    """Lazily read the records from a JSON lines file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def record_validator(record_params):
+    """
+    Build a function that asserts that a record matches the RecordInput type.
+
+    Args:
+        record_params: The RecordInput fields as returned by `TiloresAPI.record_params`.
+    """
+    allowed = {name for name, _ in record_params}
+    required = {name for name, graphql_type in record_params if isinstance(graphql_type, GraphQLNonNull)}
+    def validate(record):
+        unknown = record.keys() - allowed
+        assert not unknown, f'Record fields {sorted(unknown)!r} not present in RecordInput fields: {sorted(allowed)!r}'
+        missing = [name for name in required if record.get(name) is None]
+        assert not missing, f'Record is missing the required fields: {sorted(missing)!r}'
+    return validate
+
+def chunk_records(records, max_records=1000, max_bytes=4*1024*1024, dumps=None):
+    """
+    Lazily split the records into chunks limited by the number of records and their JSON size.
+
+    A single record larger than `max_bytes` is sent in a chunk of its own.
+    The size is measured with `dumps`, by default the fastest `json_dumps`.
+    """
+    dumps = dumps or json_dumps()
+    chunk = []
+    chunk_bytes = 0
+    for record in records:
+        record_bytes = len(dumps(record)) + 1
+        if chunk and (len(chunk) >= max_records or chunk_bytes + record_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(record)
+        chunk_bytes += record_bytes
+    if chunk:
+        yield chunk
+
+def invalidate_submitted(api, chunk):
+    """Invalidate the cached results of the client the submitted records may affect."""
+    if getattr(api, 'result_cache', None) is not None:
+        api.result_cache.invalidate_submitted(chunk)
+    if hasattr(api, 'invalidate_golden_records'):
+        api.invalidate_golden_records()
+
+def submit_chunk(api, index, chunk, max_retries=5, backoff=0.5, max_backoff=30.0):
+    """
+    Submit a single chunk of records, retrying throttled and failed requests with exponential backoff.
+
+    The retries are made here instead of by the client's RetryPolicy, so that
+    they are counted per chunk. As the submit mutation must not be applied
+    twice, only requests that were certainly not processed are retried, see
+    `is_retryable`. The client's rate limiter and circuit breaker
+    still apply to every attempt. Cached search results affected by the
+    records and the golden records are invalidated before and after the
+    chunk is submitted, so that results of queries running meanwhile are not
+    cached, see ResultCache.
+    """
+    retry = RetryPolicy(max_retries=max_retries, backoff=backoff, max_backoff=max_backoff)
+    result = ChunkResult(index=index, records=len(chunk))
+    invalidate_submitted(api, chunk)
+    try:
+        while True:
+            result.attempts += 1
+            try:
+                response = api.gql(SUBMIT_QUERY, variables={'records': chunk}, retry=NO_RETRY)
+            except Exception as e:
+                if result.attempts > max_retries or not is_retryable(e, idempotent=False):
+                    result.errors = [e]
+                    return result
+                time.sleep(retry.delay(result.attempts, retry_after_of(getattr(e, 'response', None))))
+                continue
+            break
+    finally:
+        # even a failed submit may have been applied
+        invalidate_submitted(api, chunk)
+    if response.get('errors'):
+        result.errors = response['errors']
+    if response.get('data') and response['data'].get('submit'):
+        result.records_added = response['data']['submit']['recordsAdded']
+    return result
+
+def submit_stream(api, records, max_records=1000, max_bytes=4*1024*1024, concurrency=4, validate=True, **retry_options):
+    """
+    Submit a stream of records in concurrent chunks and yield a report per chunk as it completes.
+
+    The records are consumed lazily and at most `concurrency` chunks are in
+    flight at any time, so that arbitrarily large streams can be submitted
+    with bounded memory.
+
+    Args:
+        api: The TiloresAPI to submit the records with.
+        records: An iterable of record dicts or RecordInput models, or the path to a JSON lines file.
+        max_records: The maximum number of records per chunk.
+        max_bytes: The maximum JSON size of the records per chunk.
+        concurrency: The maximum number of chunks in flight.
+        validate: Whether to validate the records against the RecordInput type before submitting them.
+        retry_options: Passed on to `submit_chunk`, e.g. max_retries and backoff.
+
+    Yields:
+        A ChunkResult per chunk in the order of completion.
+    """
+    if isinstance(records, (str, os.PathLike)):
+        records = read_jsonl(records)
+    records = (record.model_dump(exclude_none=True) if isinstance(record, BaseModel) else record for record in records)
+    if validate:
+        validate_record = record_validator(api.record_params)
+        records = (validate_record(record) or record for record in records)
+    chunks = enumerate(chunk_records(records, max_records=max_records, max_bytes=max_bytes, dumps=getattr(api, 'json_dumps', None)))
+    yield from bounded_map(lambda chunk: submit_chunk(api, *chunk, **retry_options), chunks, concurrency)
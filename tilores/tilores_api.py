@@ -1,16 +1,64 @@
-from graphql import get_introspection_query, build_client_schema, GraphQLObjectType
-from graphql_query import Operation, Query, Argument, Variable, Field
 from functools import cached_property
 from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
 import requests
-import time
+import itertools
 import os
-from .record_insights import RecordInsights
-from pydantic import BaseModel
-from tilores.conversion import option_model_to_graphql_fields
+import sys
+import time
+from tilores.operations import DocumentCache, entities_operation, split_batch_result, document_hash, is_persisted_query_error, is_mutation, operation_name_of
+from tilores.auth import TokenManager, TokenStore
+from tilores.cache import ResultCache
+from tilores.compression import Compression
+from tilores.instrumentation import Hooks, hooks_of
+from tilores.multiprocess import ClientConfig, ClientSnapshot, restore_client, map_search, _clients
+from tilores.resilience import RetryPolicy, RateLimiter, CircuitBreaker, UNPROCESSED_STATUS_CODES, is_retryable, retry_after_of
+from tilores.concurrency import bounded_map
+from tilores.graph import EntityGraph
+from tilores.codec import json_loads, json_dumps, iter_items, GraphQLResponseError
+from tilores.conversion import selection_of
+from tilores.schema import FINGERPRINT_QUERY, SchemaCache, fingerprint_of, search_params_of, record_params_of, record_selection_of, records_definition_of
+
+# graphql-core, graphql_query and pydantic are imported on first use, so that
+# `import tilores` stays fast for short lived processes, e.g. CLIs and Lambdas.
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def params_of(searchParams):
+    """Get the search parameters as a plain dict, e.g. to derive cache keys from."""
+    # values can only be pydantic models if pydantic was imported
+    pydantic = sys.modules.get('pydantic')
+    if pydantic is not None and isinstance(searchParams, pydantic.BaseModel):
+        return searchParams.model_dump(mode='json')
+    return searchParams
+
+def create_session(pool_connections: int = 2, pool_maxsize: int = 10, pool_block: bool = False):
+    """
+    Create a requests session with a keep-alive connection pool.
+
+    Args:
+        pool_connections: The number of hosts to keep connection pools for, by default the token and the API host.
+        pool_maxsize: The maximum number of connections kept alive per host, should match the number of threads using the client.
+        pool_block: Whether to wait for a free connection instead of opening a new one once the pool is exhausted.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 class TiloresAPI:
-    """A simple API client to interact with a Tilores instance."""
+    """
+    A simple API client to interact with a Tilores instance.
+
+    The client keeps a pool of keep-alive connections, which is shared by all
+    requests, including the token requests. Use the client as a context manager
+    or call `close()` to release the connections once done.
+
+    Clients can be pickled, e.g. to pass them to worker processes, which
+    restores them from a `snapshot` with their own connections. Forked
+    children renew the connections automatically, see `after_fork`.
+    """
 
     def __init__(self,
         *,
@@ -18,19 +66,102 @@ class TiloresAPI:
         token_url: str,
         client_id: str,
         client_secret: str,
-        scope: list[str] = None
+        scope: list[str] = None,
+        session: requests.Session = None,
+        pool_connections: int = 2,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: float | tuple[float, float] = None,
+        schema_cache_dir: str = None,
+        schema_cache_ttl: int = 24*60*60,
+        document_cache_size: int = 128,
+        persisted_queries: bool = False,
+        json_backend: str = None,
+        token_refresh_skew: int = 60,
+        token_background_refresh: bool = False,
+        token_store: TokenStore = None,
+        result_cache: ResultCache = None,
+        retry: RetryPolicy = None,
+        rate_limiter: RateLimiter = None,
+        circuit_breaker: CircuitBreaker = None,
+        hooks: Hooks | list[Hooks] = None,
+        validate_search_params: bool = False,
+        compression: Compression = None
         ):
+        """
+        Args:
+            session: An optional requests session to use, a pooled session is created if omitted.
+            pool_connections: See `create_session`, ignored if a session is provided.
+            pool_maxsize: See `create_session`, ignored if a session is provided.
+            pool_block: See `create_session`, ignored if a session is provided.
+            timeout: The timeout in seconds applied to every request, either as a single value or a (connect, read) tuple.
+            schema_cache_dir: An optional directory to cache the introspection result in, see `SchemaCache`.
+            schema_cache_ttl: The time in seconds the cached introspection result is used without revalidating it.
+            document_cache_size: The maximum number of rendered documents to keep, see `DocumentCache`.
+            persisted_queries: Whether to send automatic persisted queries, i.e. the document hash instead of the
+                document, falling back to the full document if the instance does not know the hash.
+            json_backend: The JSON library to encode requests and decode responses with, either 'orjson', 'msgspec'
+                or 'json'. By default the fastest installed one is used, see `json_dumps` for the supported values.
+            token_refresh_skew: The seconds before its expiry at which the access token is refreshed, see `TokenManager`.
+            token_background_refresh: Whether to refresh the access token in a background thread before it expires.
+            token_store: An optional TokenStore to share access tokens with other processes, e.g. a FileTokenStore.
+            result_cache: An optional ResultCache to serve repeated searches from.
+            retry: The RetryPolicy for throttled and failed requests, by default up to 3 retries.
+                Use `NO_RETRY` to fail on the first error.
+            rate_limiter: An optional RateLimiter to throttle the requests with, it may be shared between clients.
+            circuit_breaker: An optional CircuitBreaker to fail fast while the instance is unhealthy.
+            hooks: Optional instrumentation Hooks, e.g. a MetricsCollector, or a list of them.
+            validate_search_params: Whether to validate and normalize the search parameters before searching,
+                see `search_params_validator`. Requires the schema.
+            compression: An optional Compression to compress large request bodies with and to negotiate compressed
+                responses, e.g. `Compression('zstd')`. By default only gzip and deflate responses are accepted.
+        """
         self.api_url = api_url
         self.token_url = token_url
         self.client_id = client_id
         self.client_secret = client_secret
         self.scope = scope or ["tilores/mutation.submit", "tilores/query.search", "tilores/query.entity"]
-        self._access_token = None
-        self._access_token_expires_at = None
+        self.timeout = timeout
+        self.config = ClientConfig(api_url=api_url, token_url=token_url, client_id=client_id, client_secret=client_secret,
+            scope=scope, pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block, timeout=timeout,
+            schema_cache_dir=schema_cache_dir, schema_cache_ttl=schema_cache_ttl, document_cache_size=document_cache_size,
+            persisted_queries=persisted_queries, json_backend=json_backend, token_refresh_skew=token_refresh_skew,
+            token_background_refresh=token_background_refresh, token_store=token_store, retry=retry, compression=compression,
+            validate_search_params=validate_search_params)
+        self._owns_session = session is None
+        self.session = session or create_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.schema_cache = SchemaCache(schema_cache_dir, ttl=schema_cache_ttl) if schema_cache_dir else None
+        self.documents = DocumentCache(maxsize=document_cache_size)
+        self.persisted_queries = persisted_queries
+        self.json_loads = json_loads(json_backend)
+        self.json_dumps = json_dumps(json_backend)
+        self.result_cache = result_cache
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.hooks = hooks_of(hooks)
+        self.validate_search_params = validate_search_params
+        self.compression = compression
+        self.tokens = self._token_manager()
         self._golden_records = {}
+        # incremented on invalidation, so that golden records fetched meanwhile are not cached
+        self._golden_records_generation = 0
+        self._arrow_adapters = {}
+        _clients.add(self)
+
+    def _token_manager(self):
+        return TokenManager(
+            self.fetch_access_token,
+            refresh_skew=self.config.token_refresh_skew,
+            background_refresh=self.config.token_background_refresh,
+            store=self.config.token_store,
+            key=TokenManager.key_for(self.token_url, self.client_id, self.scope),
+        )
 
     @classmethod
     def from_environ(cls, **kwargs):
+        if 'TILORES_SCHEMA_CACHE_DIR' in os.environ:
+            kwargs.setdefault('schema_cache_dir', os.environ['TILORES_SCHEMA_CACHE_DIR'])
         return cls(
             api_url=os.environ['TILORES_API_URL'],
             token_url=os.environ['TILORES_TOKEN_URL'],
@@ -39,11 +170,77 @@ class TiloresAPI:
             **kwargs
         )
 
+    def close(self):
+        """Stop the token refresh and close the pooled connections, unless the session was provided by the caller."""
+        # a closed client is not renewed in forked children
+        _clients.discard(self)
+        self.tokens.close()
+        if self._owns_session:
+            self.session.close()
+
+    def snapshot(self, introspection=False):
+        """
+        Get a picklable ClientSnapshot of the configuration and the introspection result to restore the client from.
+
+        Args:
+            introspection: Whether to fetch the introspection result if it was not fetched yet.
+        """
+        return ClientSnapshot(self.config, self.introspection if introspection else self.__dict__.get('introspection'))
+
+    def __reduce__(self):
+        return restore_client, (self.snapshot(),)
+
+    def after_fork(self):
+        """
+        Renew the connections and the token manager in a forked child process, called automatically after `os.fork()`.
+
+        The connections of the parent must not be shared, the access token is kept until it expires.
+        """
+        if self._owns_session:
+            self.session = create_session(pool_connections=self.config.pool_connections, pool_maxsize=self.config.pool_maxsize,
+                pool_block=self.config.pool_block)
+        token = self.tokens.token
+        self.tokens = self._token_manager()
+        self.tokens.token = token
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _measure(self, function, *args, operation=None, phase=None):
+        """
+        Call the function and report its duration to the hooks, unless the client has none.
+
+        The duration is reported as the `phase` of the `operation`, or without
+        a phase as token refresh, which is reported on errors as well.
+        """
+        hooks = self.hooks
+        if hooks is None:
+            return function(*args)
+        started = time.perf_counter()
+        if phase is not None:
+            result = function(*args)
+            hooks.on_phase(operation, phase, time.perf_counter() - started)
+            return result
+        try:
+            result = function(*args)
+        except Exception as e:
+            hooks.on_token_refresh(time.perf_counter() - started, e)
+            raise
+        hooks.on_token_refresh(time.perf_counter() - started)
+        return result
+
     def fetch_access_token(self):
-        response = requests.post(
+        return self._measure(self._fetch_access_token)
+
+    def _fetch_access_token(self):
+        response = self.session.post(
             self.token_url,
             auth=(self.client_id, self.client_secret),
             data={'grant_type': 'client_credentials', 'scope': ' '.join(self.scope)},
+            timeout=self.timeout,
         )
         response.raise_for_status()
         data = response.json()
@@ -52,84 +249,214 @@ class TiloresAPI:
     @property
     def access_token(self):
         """Get the access token, refreshing it if necessary."""
-        now = int(time.time())
-        if self._access_token_expires_at and self._access_token_expires_at > now:
-            return self._access_token
-        else:
-            access_token, expires_in = self.fetch_access_token()
-            self._access_token = access_token
-            self._access_token_expires_at = now + expires_in
-            return self._access_token
+        return self.tokens.get()
+
+    @property
+    def _access_token_expires_at(self):
+        return self.tokens.expires_at
 
     @cached_property
     def schema(self):
-        result = self.gql(get_introspection_query(descriptions=True))
-        return build_client_schema(result['data'])
+        from graphql import build_client_schema
+        return build_client_schema(self.introspection)
+
+    @cached_property
+    def introspection(self):
+        """Get the introspection result of the schema, served from the schema cache if configured."""
+        from tilores.schema import INTROSPECTION_QUERY
+        if self.schema_cache is None:
+            return self.gql(INTROSPECTION_QUERY)['data']
+        entry = self.schema_cache.load(self.api_url)
+        if entry is not None and self.schema_cache.is_fresh(entry):
+            return entry['introspection']
+        # fetched before the introspection, a schema changed in between is detected by the next revalidation
+        fingerprint = self.schema_fingerprint()
+        if entry is not None and fingerprint == entry['fingerprint']:
+            return self.schema_cache.store(self.api_url, entry['introspection'], fingerprint)['introspection']
+        introspection = self.gql(INTROSPECTION_QUERY)['data']
+        self.schema_cache.store(self.api_url, introspection, fingerprint)
+        return introspection
+
+    def schema_fingerprint(self):
+        """Fetch a hash of the schema types and fields, which is much cheaper than the full introspection."""
+        return fingerprint_of(self.gql(FINGERPRINT_QUERY)['data'])
 
-    def gql(self, query, variables=None):
-        """Perform a GraphQL query against the Tilores instance."""
+    def gql(self, query, variables=None, retry=None):
+        """
+        Perform a GraphQL query against the Tilores instance.
+
+        Args:
+            retry: An optional RetryPolicy overriding the client's one for this query.
+                Mutations are only retried if they were certainly not processed, see `is_retryable`.
+        """
+        operation = None if self.hooks is None else operation_name_of(query)
+        # decided on the document, persisted queries are sent without it
+        idempotent = not is_mutation(query)
         data = {'query': query}
         if variables is not None:
-            def to_serializable(val):
-                if isinstance(val, BaseModel):
-                    return val.dict()  # Converts Pydantic model to dict
-                elif isinstance(val, dict):
-                    return {k: to_serializable(v) for k, v in val.items()}
-                elif isinstance(val, list):
-                    return [to_serializable(v) for v in val]
-                return val
-            data['variables'] = to_serializable(variables)
-        response = requests.post(
-            self.api_url,
-            headers={
-                "Authorization": f"Bearer {self.access_token}",
-                "Content-Type": "application/json"
-            },
-            json=data
-        )
-        response.raise_for_status()
-        return response.json()
+            data['variables'] = variables
+        if not self.persisted_queries:
+            return self.post_gql(data, retry=retry, operation=operation, idempotent=idempotent)
+        data['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': document_hash(query)}}
+        del data['query']
+        result = self.post_gql(data, retry=retry, operation=operation, idempotent=idempotent)
+        if is_persisted_query_error(result):
+            data['query'] = query
+            result = self.post_gql(data, retry=retry, operation=operation, idempotent=idempotent)
+        return result
+
+    def post_gql(self, data, retry=None, operation=None, idempotent=None):
+        """Post the GraphQL request body to the Tilores instance and decode the response."""
+        response = self.send_gql(data, retry=retry, operation=operation, idempotent=idempotent)
+        return self._measure(self.json_loads, response.content, operation=operation or 'gql', phase='decode')
+
+    def send_gql(self, data, stream=False, retry=None, operation=None, idempotent=None):
+        """
+        Post the GraphQL request body to the Tilores instance and return the successful HTTP response.
+
+        A request rejected with 401 Unauthorized is retried once with a new access token.
+        Throttled and failed requests are retried according to the retry policy, mutations
+        only if they were certainly not processed. Whether the request is idempotent is
+        derived from its query, unless given.
+        The body is serialized, and compressed if configured, once for all attempts.
+        """
+        retry = retry or self.retry
+        if idempotent is None:
+            idempotent = 'query' not in data or not is_mutation(data['query'])
+        status_codes = retry.status_codes if idempotent else retry.status_codes & UNPROCESSED_STATUS_CODES
+        hooks = self.hooks
+        circuit_breaker = self.circuit_breaker
+        if hooks is not None:
+            if operation is None:
+                operation = operation_name_of(data['query']) if 'query' in data else 'gql'
+            started = time.perf_counter()
+        body = self.json_dumps(data)
+        body_size = len(body)
+        if self.compression is None:
+            headers = JSON_HEADERS
+        else:
+            body, headers = self.compression.encode(body)
+        if hooks is not None:
+            hooks.on_phase(operation, 'serialize', time.perf_counter() - started)
+        attempt = 0
+        reauthenticated = False
+        while True:
+            access_token = self.access_token
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if circuit_breaker is not None:
+                circuit_breaker.allow()
+            try:
+                if hooks is not None:
+                    context = hooks.before_request(operation)
+                    started = time.perf_counter()
+                response = self.session.post(
+                    self.api_url,
+                    headers={"Authorization": f"Bearer {access_token}", **headers},
+                    data=body,
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            except requests.RequestException as e:
+                if circuit_breaker is not None:
+                    circuit_breaker.record(False)
+                if hooks is not None:
+                    hooks.after_request(operation, context, time.perf_counter() - started, error=e)
+                if attempt >= retry.max_retries or not is_retryable(e, status_codes, idempotent):
+                    raise
+                attempt += 1
+                delay = retry.delay(attempt)
+                if hooks is not None:
+                    hooks.on_retry(operation, attempt, delay, error=e)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # the request was not sent, e.g. a hook raised or the caller was interrupted
+                if circuit_breaker is not None:
+                    circuit_breaker.release()
+                raise
+            if circuit_breaker is not None:
+                circuit_breaker.record(response.status_code < 500)
+            if hooks is not None:
+                response_encoding = response.headers.get('Content-Encoding')
+                if stream:
+                    response_bytes = response.headers.get('Content-Length')
+                else:
+                    # the bytes read from the connection, before decompression
+                    response_bytes = response.raw.tell() if response_encoding else len(response.content)
+                hooks.after_request(operation, context, time.perf_counter() - started, len(response.request.body or b''),
+                    None if response_bytes is None else int(response_bytes), response.status_code)
+                if 'Content-Encoding' in headers:
+                    hooks.on_compression(operation, 'request', headers['Content-Encoding'], body_size, len(body))
+                if response_encoding and not stream:
+                    hooks.on_compression(operation, 'response', response_encoding, len(response.content), response_bytes)
+            if response.status_code == 401 and not reauthenticated:
+                reauthenticated = True
+                response.close()
+                self.tokens.invalidate(access_token)
+                continue
+            if response.status_code in status_codes and attempt < retry.max_retries:
+                attempt += 1
+                delay = retry.delay(attempt, retry_after_of(response))
+                if hooks is not None:
+                    hooks.on_retry(operation, attempt, delay, status=response.status_code)
+                response.close()
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response
 
     @cached_property
     def search_params(self):
         """Get a list of tuples of search parameter names and types for the search query."""
-        search_params = []
-        for name, graphql_input_field in self.schema.get_type('SearchParams').fields.items():
-            search_params.append((name, graphql_input_field.type))
-        return search_params
+        return search_params_of(self.schema)
 
     @cached_property
     def search_param_names(self):
         """Get a list of search parameter names for the search query."""
         return [x for (x, _) in self.search_params]
 
+    @cached_property
+    def search_params_validator(self):
+        """
+        Get the SearchParamsValidator compiled from the SearchParams type.
+
+        Assign another SearchParamsValidator to change the normalization, e.g. to declare date fields.
+        """
+        from tilores.validation import SearchParamsValidator
+        return SearchParamsValidator(self.search_params)
+
     @cached_property
     def records_definition(self):
         """Returns the field definition for the records field."""
-        def subfieldsOf(type):
-            subfields = []
-            for name, subfield in type.fields.items():
-                if isinstance(subfield.type, GraphQLObjectType):
-                    subfields.append(Field(name=name, fields=subfieldsOf(subfield.type)))
-                else:
-                    subfields.append(name)
-            return subfields
+        return records_definition_of(self.schema)
 
-        return Field(name='records', fields=subfieldsOf(self.schema.get_type('Record')))
+    @cached_property
+    def record_selection(self):
+        """Get the selection of all record fields, to search with instead of an option model."""
+        return record_selection_of(self.schema)
 
     @cached_property
     def record_params(self, refresh=False):
         """Get a list of tuples of field names and their type for the RecordInput-type."""
-        record_params = []
-        for name, graphql_input_field in self.schema.get_type('RecordInput').fields.items():
-            record_params.append((name, graphql_input_field.type))
-        return record_params
+        return record_params_of(self.schema)
 
     @cached_property
     def record_param_names(self):
         """Get a list of search parameter names for the search query."""
         return [x for (x, _) in self.record_params]
 
+    @cached_property
+    def structs(self):
+        """Get the StructFactory to decode responses into compact typed objects."""
+        from tilores.helpers import StructFactory
+        return StructFactory(self.schema)
+
+    def _render_search(self, recordFieldsToQuery):
+        """Get the selection of the record fields and the search document selecting them."""
+        selection = selection_of(recordFieldsToQuery)
+        return selection, self.documents.get('search', selection)
+
     def search(self, recordFieldsToQuery, searchParams):
         """
         Perform a search query with the given parameters.
@@ -138,53 +465,371 @@ class TiloresAPI:
             recordFieldsToQuery: A nested dict[str,bool] of GraphQL fields to query on the record field, should be limited to relevant fields.
             searchParams: Search parameters to use in the query.
 
+        Identical searches are served from the result cache, if configured.
+
         See also: https://docs.tilotech.io/tilores/api/#query-search
         """
-        recordFields=Field(name="records", fields = option_model_to_graphql_fields(recordFieldsToQuery))
-        var_params = Variable(name='params', type='SearchParams!')
-        operation = Operation(
-            type='query',
-            name='search',
-            variables=[var_params],
-            queries=[
-                Query(
-                    name='search',
-                    arguments=[
-                        Argument(name='input', value=Argument(name='parameters', value=var_params))
-                    ],
-                    fields=[
-                        Field(name='entities', fields=[
-                            'id',
-                            'hits',
-                            recordFields
-                        ])
-                    ]
-                )
-            ]
-        )
-        return self.gql(operation.render(), variables={'params': searchParams})
+        if self.validate_search_params:
+            searchParams = self.search_params_validator(searchParams)
+        selection, query = self._measure(self._render_search, recordFieldsToQuery, operation='search', phase='render')
+        if self.result_cache is None:
+            return self.gql(query, variables={'params': searchParams})
+        searchParams = params_of(searchParams)
+        key = ResultCache.key_for(selection, searchParams)
+        if self.hooks is None:
+            return self.result_cache.get_or_compute(key, lambda: self.gql(query, variables={'params': searchParams}), searchParams)
+        computed = False
+        def compute():
+            nonlocal computed
+            computed = True
+            return self.gql(query, variables={'params': searchParams})
+        result = self.result_cache.get_or_compute(key, compute, searchParams)
+        self.hooks.on_cache('search', not computed)
+        return result
+
+    def search_entities(self, recordFieldsToQuery, searchParams):
+        """
+        Perform a search query and decode the entities into the compact Entity class of the schema.
+
+        Raises GraphQLResponseError if the response contains errors.
+
+        See also: StructFactory
+        """
+        result = self.search(recordFieldsToQuery, searchParams)
+        if result.get('errors'):
+            raise GraphQLResponseError(result['errors'])
+        decode = self.structs.decoder('Entity')
+        return self._measure(lambda entities: [decode(entity) for entity in entities], result['data']['search']['entities'],
+            operation='search', phase='convert')
+
+    def arrow_adapter(self, recordFieldsToQuery, batch_size=64*1024):
+        """
+        Get the ArrowAdapter to flatten search results with the record fields into Arrow tables.
+
+        The adapters are created once per selection and batch size.
+
+        Requires the `arrow` extra: pip install tilores-sdk[arrow]
+        """
+        key = (selection_of(recordFieldsToQuery), batch_size)
+        if key not in self._arrow_adapters:
+            from tilores.columnar import ArrowAdapter
+            self._arrow_adapters[key] = ArrowAdapter(self.schema, key[0], batch_size=batch_size)
+        return self._arrow_adapters[key]
+
+    def search_arrow(self, recordFieldsToQuery, searchParams):
+        """
+        Perform a search query and flatten the records of all entities into an Arrow table.
+
+        Raises GraphQLResponseError if the response contains errors.
+
+        See also: ArrowAdapter
+        """
+        result = self.search(recordFieldsToQuery, searchParams)
+        if result.get('errors'):
+            raise GraphQLResponseError(result['errors'])
+        adapter = self.arrow_adapter(recordFieldsToQuery)
+        return self._measure(adapter.table, result['data']['search']['entities'], operation='search', phase='convert')
+
+    def search_record_batches(self, recordFieldsToQuery, searchParams, batch_size=64*1024):
+        """
+        Perform a search query and incrementally flatten the streamed entities into Arrow record batches.
+
+        At most one batch of records is held in memory, see `search_stream`.
+        Requires the `arrow` and `streaming` extras.
+
+        Yields:
+            RecordBatches of at most `batch_size` records.
+        """
+        adapter = self.arrow_adapter(recordFieldsToQuery, batch_size=batch_size)
+        yield from adapter.record_batches(self.search_stream(recordFieldsToQuery, searchParams))
+
+    def search_stream(self, recordFieldsToQuery, searchParams, records=False, model=None):
+        """
+        Perform a search query and incrementally parse the response, yielding one entity or record at a time.
+
+        Only a single entity (or record) is held in memory at any time, which keeps
+        the memory flat for searches returning large entities. GraphQL errors are
+        raised as GraphQLResponseError after all entities were yielded.
+
+        Args:
+            recordFieldsToQuery: The record fields to query, see `search`.
+            searchParams: Search parameters to use in the query.
+            records: Whether to yield tuples of the entity ID and a single record instead of whole entities.
+            model: An optional pydantic model or callable to convert each entity or record with,
+                e.g. `api.structs.decoder('Entity')`.
+
+        Requires the `streaming` extra: pip install tilores-sdk[streaming]
+        """
+        query = self.documents.get('search', selection_of(recordFieldsToQuery))
+        if self.validate_search_params:
+            searchParams = self.search_params_validator(searchParams)
+        response = self.send_gql({'query': query, 'variables': {'params': searchParams}}, stream=True)
+        with response:
+            response.raw.decode_content = True
+            if records:
+                yield from iter_items(response.raw, 'data.search.entities.item.records', id_path='data.search.entities.item.id', model=model)
+            else:
+                yield from iter_items(response.raw, 'data.search.entities', model=model)
+
+    def search_batch(self, recordFieldsToQuery, searchParamsList, batch_size=50):
+        """
+        Perform many search queries with as few requests as possible.
+
+        The searches are sent in batches of up to `batch_size` aliased search
+        queries per GraphQL operation.
+
+        Args:
+            recordFieldsToQuery: The record fields to query, see `search`.
+            searchParamsList: A list of search parameters.
+            batch_size: The maximum number of searches per request.
+
+        Returns:
+            A list with one result per search parameters in input order. Each
+            result has the same shape as the result of `search`, including the
+            errors that belong to that search.
+        """
+        assert batch_size > 0, f'Batch size must be positive, got: {batch_size!r}'
+        selection = selection_of(recordFieldsToQuery)
+        if self.validate_search_params:
+            searchParamsList = self.search_params_validator.validate_many(searchParamsList)
+        searchParamsList = list(searchParamsList)
+        results = []
+        for start in range(0, len(searchParamsList), batch_size):
+            batch = searchParamsList[start:start + batch_size]
+            query = self.documents.get('search_batch', selection, len(batch))
+            result = self.gql(query, variables={f'params_{i}': params for i, params in enumerate(batch)})
+            results.extend(split_batch_result(result, len(batch)))
+        return results
+
+    def submit(self, records, **options):
+        """
+        Submit records to the Tilores instance.
+
+        Args:
+            records: An iterable of record dicts or RecordInput models, or the path to a JSON lines file.
+            options: See `submit_stream`.
+
+        Returns:
+            A list with a ChunkResult per submitted chunk in input order.
+        """
+        return sorted(self.submit_stream(records, **options), key=lambda result: result.index)
+
+    def submit_stream(self, records, max_records=1000, max_bytes=4*1024*1024, concurrency=4, validate=True, **retry_options):
+        """
+        Submit a stream of records in concurrent chunks and yield a ChunkResult per chunk as it completes.
+
+        The golden record cache is cleared before and after each chunk is submitted, as its records may change any entity.
+
+        Args:
+            records: An iterable of record dicts or RecordInput models, or the path to a JSON lines file, consumed lazily.
+            max_records: The maximum number of records per chunk.
+            max_bytes: The maximum JSON size of the records per chunk.
+            concurrency: The maximum number of chunks in flight.
+            validate: Whether to validate the records against the RecordInput type before submitting them.
+            retry_options: The max_retries, backoff and max_backoff for throttled or failed chunks.
+        """
+        from tilores import submit as submission
+        return submission.submit_stream(self, records, max_records=max_records, max_bytes=max_bytes,
+            concurrency=concurrency, validate=validate, **retry_options)
+
+    def match_file(self, input, output, **options):
+        """
+        Match the rows of a CSV, JSON lines or Parquet file and write the matching entity IDs per row.
+
+        The job checkpoints its progress and resumes after an interruption.
+
+        Args:
+            input: The path of the file with the rows to match.
+            output: The path of the JSON lines or CSV file to write the results to.
+            options: See `tilores.match.MatchJob`.
+
+        Returns:
+            The final MatchReport.
+        """
+        from tilores.match import match_file
+        return match_file(self, input, output, **options)
+
+    def map_search(self, recordFieldsToQuery, searchParamsIter, processes=None, postprocess=None, **options):
+        """
+        Perform searches and post-process their results in a pool of worker processes, yielding the results in input order.
+
+        Use it for CPU-bound post-processing, e.g. converting or aggregating the records,
+        which threads cannot scale beyond one core.
+
+        Args:
+            recordFieldsToQuery: The record fields to query, see `search`.
+            searchParamsIter: An iterable of search parameters, consumed lazily.
+            processes: The number of worker processes, by default the number of CPUs.
+            postprocess: An optional picklable function to apply to each search result in the workers.
+            options: See `tilores.multiprocess.map_search`.
+        """
+        return map_search(self, recordFieldsToQuery, searchParamsIter, processes=processes, postprocess=postprocess, **options)
+
+    def golden_records(self, entityIDs, insights, batch_size=100, concurrency=4, cache=True):
+        """
+        Retrieve the golden records of many entities, as defined by a RecordInsights query.
+
+        Args:
+            entityIDs: The IDs of the entities.
+            insights: The RecordInsights defining the golden record.
+            batch_size: The maximum number of entities per request.
+            concurrency: The maximum number of requests in flight.
+            cache: Whether to serve and store the golden records from the client's golden record cache.
+                Disable it for one-off exports of many entities to keep the memory flat.
+
+        Returns:
+            A dict of the entity IDs to their golden record, the result of the insights
+            query, or None for entities that do not exist.
+        """
+        return dict(self.iter_golden_records(entityIDs, insights, batch_size=batch_size, concurrency=concurrency, cache=cache))
+
+    def iter_golden_records(self, entityIDs, insights, batch_size=100, concurrency=4, cache=True):
+        """
+        Retrieve the golden records of many entities and yield them as soon as their batch completed.
+
+        The entity IDs are consumed lazily and at most `concurrency` batches of
+        `batch_size` aliased entity queries are in flight at any time. GraphQL
+        errors are raised as GraphQLResponseError.
+
+        Yields:
+            Tuples of entity ID and golden record, see `golden_records`.
+        """
+        assert batch_size > 0, f'Batch size must be positive, got: {batch_size!r}'
+        assert concurrency > 0, f'Concurrency must be positive, got: {concurrency!r}'
+        insights_key = insights.render()
+        insights_alias = insights.alias or insights.name
+        queries = {}
+        def fetch(batch):
+            if len(batch) not in queries:
+                queries[len(batch)] = entities_operation(['id', insights], len(batch), name='golden_records').render()
+            result = self.gql(queries[len(batch)], variables={f'id_{i}': entity_id for i, entity_id in enumerate(batch)})
+            if result.get('errors'):
+                raise GraphQLResponseError(result['errors'])
+            golden_records = []
+            for i, entity_id in enumerate(batch):
+                entity = result['data'][f'entity_{i}']['entity']
+                golden_records.append((entity_id, None if entity is None else entity[insights_alias]))
+            return golden_records
+
+        missing = object()
+        def batches():
+            cached = []
+            batch = []
+            for entity_id in entityIDs:
+                golden_record = self._golden_records.get((insights_key, entity_id), missing) if cache else missing
+                hit = golden_record is not missing
+                if cache and self.hooks is not None:
+                    self.hooks.on_cache('golden_records', hit)
+                if hit:
+                    cached.append((entity_id, golden_record))
+                    # hits are passed on in batches as well instead of waiting for the next uncached batch
+                    if len(cached) == batch_size:
+                        yield cached, []
+                        cached = []
+                    continue
+                batch.append(entity_id)
+                if len(batch) == batch_size:
+                    yield cached, batch
+                    cached = []
+                    batch = []
+            if cached or batch:
+                yield cached, batch
+
+        def fetch_batch(item):
+            cached, batch = item
+            generation = self._golden_records_generation
+            return cached, fetch(batch) if batch else [], generation
+
+        for cached, fetched, generation in bounded_map(fetch_batch, batches(), concurrency):
+            yield from cached
+            # golden records fetched while records were submitted might already be stale
+            store = cache and generation == self._golden_records_generation
+            for entity_id, golden_record in fetched:
+                if store:
+                    self._golden_records[(insights_key, entity_id)] = golden_record
+                yield entity_id, golden_record
+
+    def invalidate_golden_records(self):
+        """Clear the golden record cache, called for every submitted chunk, as its records may change any entity."""
+        self._golden_records_generation += 1
+        self._golden_records.clear()
+
+    def iter_entity_edges(self, IDs, by_record=False, batch_size=100, concurrency=4):
+        """
+        Retrieve the edges of many entities in concurrent batches of aliased entity queries.
+
+        Args:
+            IDs: The entity IDs, or record IDs if `by_record` is set.
+            by_record: Whether to look up the entities of the record IDs.
+
+        Yields:
+            Tuples of the requested ID and the entity with its `id` and `edges`,
+            or None if it does not exist, in the order of completion.
+        """
+        assert batch_size > 0, f'Batch size must be positive, got: {batch_size!r}'
+        query = 'entityByRecord' if by_record else 'entity'
+        queries = {}
+        def fetch(batch):
+            if len(batch) not in queries:
+                queries[len(batch)] = entities_operation(['id', 'edges'], len(batch), name='entity_edges', query=query).render()
+            result = self.gql(queries[len(batch)], variables={f'id_{i}': ID for i, ID in enumerate(batch)})
+            if result.get('errors'):
+                raise GraphQLResponseError(result['errors'])
+            return [(ID, result['data'][f'entity_{i}']['entity']) for i, ID in enumerate(batch)]
+
+        def batches():
+            pending = iter(IDs)
+            while batch := list(itertools.islice(pending, batch_size)):
+                yield batch
+
+        for entities in bounded_map(fetch, batches(), concurrency):
+            yield from entities
+
+    def entity_graph(self, entityIDs, batch_size=100, concurrency=4):
+        """
+        Build the graph of the records of many entities connected by their edges.
+
+        Returns:
+            An EntityGraph, entities that do not exist are skipped.
+        """
+        graph = EntityGraph()
+        seen = set()
+        for _, entity in self.iter_entity_edges(entityIDs, batch_size=batch_size, concurrency=concurrency):
+            if entity is not None and entity['id'] not in seen:
+                seen.add(entity['id'])
+                graph.add_entity(entity['id'], entity['edges'])
+        return graph
+
+    def record_graph(self, recordIDs, max_depth=None, max_nodes=None, batch_size=100, concurrency=4):
+        """
+        Build the graph of the records reachable from the given records, e.g. to provide connected records as context.
+
+        The entities of the records are fetched in concurrent batches and
+        traversed breadth-first. As edges never connect records of different
+        entities, a single round of requests reaches all connected records.
+
+        Args:
+            recordIDs: The record IDs to start from.
+            max_depth: The maximum number of edges between a start record and an included one.
+            max_nodes: The maximum number of records to include.
+
+        Returns:
+            An EntityGraph with the visited records and the edges between them.
+        """
+        recordIDs = list(recordIDs)
+        graph = EntityGraph()
+        seen = set()
+        for _, entity in self.iter_entity_edges(dict.fromkeys(recordIDs), by_record=True, batch_size=batch_size, concurrency=concurrency):
+            if entity is not None and entity['id'] not in seen:
+                seen.add(entity['id'])
+                graph.add_entity(entity['id'], entity['edges'])
+        if max_depth is None and max_nodes is None:
+            return graph
+        return graph.subgraph(graph.bfs(recordIDs, max_depth=max_depth, max_nodes=max_nodes))
 
     def entity_edges(self, entityID):
         """
         Searches for the edges of a single entity.
         """
-        var_entity_id = Variable(name='entityID', type='ID!')
-        operation = Operation(
-            type='query',
-            name='get_edges',
-            variables=[var_entity_id],
-            queries=[
-                Query(
-                    name='entity',
-                    arguments=[
-                        Argument(name='input', value=Argument(name='id', value=var_entity_id))
-                    ],
-                    fields=[
-                        Field(name='entity', fields=[
-                            'edges'
-                        ])
-                    ]
-                )
-            ]
-        )
-        return self.gql(operation.render(), variables={'entityID': entityID})
\ No newline at end of file
+        query = self.documents.get('entity_edges')
+        return self.gql(query, variables={'entityID': entityID})
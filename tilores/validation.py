@@ -0,0 +1,150 @@
+from graphql import GraphQLEnumType, GraphQLInputObjectType, GraphQLList, GraphQLNonNull
+import datetime
+import sys
+import unicodedata
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y%m%d', '%Y/%m/%d', '%d.%m.%Y')
+
+class SearchParamsValidator:
+    """
+    Validates and normalizes search parameters, compiled once from the SearchParams input type.
+
+    Each field is compiled into a coercion function, so that validating a set
+    of parameters is a single pass of dict lookups. Unknown fields and values
+    that cannot be coerced to their type raise an AssertionError.
+
+    With `normalize`, strings are trimmed, their inner whitespace collapsed and
+    non-ASCII ones brought into the Unicode normal form, empty values are
+    dropped and dates are formatted as ISO 8601. Equal searches thereby get
+    equal parameters, which e.g. the ResultCache keys on.
+    """
+
+    def __init__(self, search_params, normalize=True, unicode_form='NFC', date_fields=(), date_formats=DATE_FORMATS):
+        """
+        Args:
+            search_params: The SearchParams fields as returned by `TiloresAPI.search_params`.
+            normalize: Whether to canonicalize the values, see above.
+            unicode_form: The Unicode normal form for strings, see `unicodedata.normalize`.
+            date_fields: The names of string fields holding dates, whose values are parsed with
+                `date_formats` and formatted as ISO 8601 (YYYY-MM-DD). Date objects are formatted
+                in any string field.
+            date_formats: The accepted `strptime` formats of the `date_fields`, tried in order.
+        """
+        self.normalize = normalize
+        self.unicode_form = unicode_form
+        self.date_fields = frozenset(date_fields)
+        self.date_formats = tuple(date_formats)
+        self.coercers = {name: self.compile(graphql_type, name) for name, graphql_type in search_params}
+        self.required = frozenset(name for name, graphql_type in search_params if isinstance(graphql_type, GraphQLNonNull))
+
+    def __call__(self, params):
+        """Get the validated (and normalized) copy of the parameters as a dict."""
+        if not isinstance(params, dict):
+            # pydantic is imported if and only if models could have been created
+            pydantic = sys.modules.get('pydantic')
+            if pydantic is None or not isinstance(params, pydantic.BaseModel):
+                # converted into an AssertionError naming the parameter for nested input objects
+                raise TypeError(f'expected a dict or a pydantic model, got {type(params).__name__}')
+            params = params.model_dump(exclude_none=True)
+        coercers = self.coercers
+        validated = {}
+        for name, value in params.items():
+            coerce = coercers.get(name)
+            assert coerce is not None, f'Search parameter {name!r} not present in SearchParams fields: {sorted(coercers)!r}'
+            if value is None:
+                continue
+            try:
+                value = coerce(value)
+            except (TypeError, ValueError) as e:
+                raise AssertionError(f'Invalid value for search parameter {name!r}: {e}') from e
+            if value is not None:
+                validated[name] = value
+        if self.required:
+            missing = self.required - validated.keys()
+            assert not missing, f'Search parameters are missing the required fields: {sorted(missing)!r}'
+        return validated
+
+    def validate_many(self, params_iter):
+        """Lazily validate many parameters."""
+        return map(self, params_iter)
+
+    def key(self, params):
+        """Get a hashable key of the validated parameters, equal for equivalent searches."""
+        return tuple(sorted(self(params).items(), key=lambda item: item[0]))
+
+    def compile(self, graphql_type, name):
+        """Build the coercion function for a GraphQL input type."""
+        if isinstance(graphql_type, GraphQLNonNull):
+            return self.compile(graphql_type.of_type, name)
+        if isinstance(graphql_type, GraphQLList):
+            coerce_item = self.compile(graphql_type.of_type, name)
+            return lambda value: [coerce_item(item) for item in (value if isinstance(value, (list, tuple)) else [value])]
+        if isinstance(graphql_type, GraphQLInputObjectType):
+            return SearchParamsValidator([(field_name, field.type) for field_name, field in graphql_type.fields.items()], normalize=self.normalize, unicode_form=self.unicode_form,
+                date_fields=self.date_fields, date_formats=self.date_formats)
+        if isinstance(graphql_type, GraphQLEnumType):
+            values = frozenset(graphql_type.values)
+            def coerce_enum(value):
+                if value not in values:
+                    raise ValueError(f'{value!r} is none of {sorted(values)!r}')
+                return value
+            return coerce_enum
+        match graphql_type.name:
+            case 'String' | 'ID':
+                return self.compile_string(name in self.date_fields)
+            case 'Int':
+                return coerce_int
+            case 'Float':
+                return coerce_float
+            case 'Boolean':
+                return coerce_bool
+        return lambda value: value
+
+    def compile_string(self, is_date):
+        normalize = self.normalize
+        unicode_form = self.unicode_form
+        date_formats = self.date_formats
+        def coerce_string(value):
+            if type(value) is not str:
+                if isinstance(value, (datetime.date, datetime.datetime)):
+                    return value.isoformat()
+                if isinstance(value, (bool, dict, list, tuple, set)):
+                    raise TypeError(f'expected a string, got {type(value).__name__}')
+                value = str(value)
+            if not normalize:
+                return value
+            if not value.isascii():
+                value = unicodedata.normalize(unicode_form, value)
+            value = ' '.join(value.split())
+            if not value:
+                return None
+            if is_date:
+                value = parse_date(value, date_formats)
+            return value
+        return coerce_string
+
+def parse_date(value, date_formats):
+    """Format a date string in any of the formats as ISO 8601 date."""
+    for date_format in date_formats:
+        try:
+            return datetime.datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f'{value!r} does not match any of the date formats {list(date_formats)!r}')
+
+def coerce_int(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise TypeError(f'expected an integer, got {value!r}')
+    return int(value)
+
+def coerce_float(value):
+    if isinstance(value, bool):
+        raise TypeError(f'expected a number, got {value!r}')
+    return float(value)
+
+def coerce_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise TypeError(f'expected a boolean, got {value!r}')